@@ -0,0 +1,57 @@
+"""
+Compares gzip with zlib and a preset dictionary for EMM payloads, see utils.CompressionEngine.
+The dictionary is trained on samples separate from the measured payloads.
+"""
+
+import json
+import random
+import timeit
+import zlib
+
+from payloads import pulse, session, report
+
+import utils
+
+
+def main() -> None:
+    training = [pulse(random.choice((1, 4, 12))) for _ in range(40)]
+    training += [json.dumps(session()).encode("utf-8") for _ in range(40)]
+
+    dictionary = utils.train_preset_dictionary(training)
+    print(f"dictionary {len(dictionary)} bytes, id {zlib.adler32(dictionary):08x}")
+
+    cases = {
+        "session": [json.dumps(session()).encode("utf-8") for _ in range(50)],
+        "pulse 1 device": [pulse(1) for _ in range(50)],
+        "pulse 12 devices": [pulse(12) for _ in range(50)],
+        "initial 48 devices": [pulse(48) for _ in range(10)],
+    }
+
+    engines = {}
+
+    for level in (1, 6, 9):
+        engines[f"gzip L{level}"] = utils.CompressionEngine(utils.CompressionEngine.GZIP, level=level)
+
+    engines["gzip adaptive"] = utils.CompressionEngine(utils.CompressionEngine.GZIP)
+
+    for level in (1, 6, 9):
+        engines[f"zlib-dict L{level}"] = utils.CompressionEngine(utils.CompressionEngine.ZLIB_DICT, dictionary, level)
+
+    engines["zlib-dict adaptive"] = utils.CompressionEngine(utils.CompressionEngine.ZLIB_DICT, dictionary)
+
+    for case, samples in cases.items():
+        raw_bytes = sum(map(len, samples))
+        print(f"\n{case}: avg {raw_bytes // len(samples)} B")
+
+        for name, engine in engines.items():
+            seconds = min(timeit.repeat(lambda: [engine.compress(sample) for sample in samples], number=5, repeat=5)) / 5
+            out_bytes = sum(len(engine.compress(sample)) for sample in samples)
+            report(name, raw_bytes, out_bytes, seconds, len(samples))
+
+    # The receiver decodes with the same dictionary
+    sample = cases["session"][0]
+    assert zlib.decompressobj(zdict=dictionary).decompress(engines["zlib-dict L9"].compress(sample)) == sample
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compares the per-call overhead of the SQLite helpers, see utils.get_db_connection.
+"per-call connect" is the old path that opened and tuned a new connection for every helper call,
+"per-thread connection" reuses the calling thread's long-lived connection and its statement cache.
+"""
+
+import configparser
+import os
+import sqlite3
+import tempfile
+import time
+
+from datetime import datetime
+
+# Puts the repository root on sys.path
+import payloads  # noqa: F401
+
+import utils
+
+ITERATIONS = 5000
+
+READ_SQL = "SELECT status FROM device_status WHERE device_uid = ?"
+WRITE_SQL = """
+    INSERT INTO device_status (device_uid, status, updated_at) VALUES (?, ?, ?)
+    ON CONFLICT(device_uid) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+"""
+
+
+def connect_per_call(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=20)
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.row_factory = sqlite3.Row
+
+    return conn
+
+
+def read_per_call(db_path: str) -> None:
+    conn = connect_per_call(db_path)
+
+    try:
+        conn.execute(READ_SQL, ("ab12cd34ef56",)).fetchone()
+    finally:
+        conn.close()
+
+
+def write_per_call(db_path: str) -> None:
+    conn = connect_per_call(db_path)
+
+    try:
+        with conn:
+            conn.execute(WRITE_SQL, ("ab12cd34ef56", "connected", datetime.now().isoformat()))
+    finally:
+        conn.close()
+
+
+def read_per_thread(config) -> None:
+    with utils.get_db_connection(config) as conn:
+        conn.execute(READ_SQL, ("ab12cd34ef56",)).fetchone()
+
+
+def write_per_thread(config) -> None:
+    with utils.get_db_connection(config) as conn:
+        conn.execute(WRITE_SQL, ("ab12cd34ef56", "connected", datetime.now().isoformat()))
+
+
+def measure(function, *args) -> float:
+    """Wall time per call in microseconds."""
+
+    started = time.perf_counter()
+
+    for _ in range(ITERATIONS):
+        function(*args)
+
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        config = configparser.ConfigParser()
+        config.read_dict({"AppSettings": {"FileFolder": folder + os.sep}})
+
+        utils.initialize_queue_db(config)
+        db_path = utils._get_queue_db_path(config)
+
+        print(f"{ITERATIONS} calls each")
+        print(f"  read   per-call connect       {measure(read_per_call, db_path):7.1f} us/call")
+        print(f"  read   per-thread connection  {measure(read_per_thread, config):7.1f} us/call")
+        print(f"  write  per-call connect       {measure(write_per_call, db_path):7.1f} us/call")
+        print(f"  write  per-thread connection  {measure(write_per_thread, config):7.1f} us/call")
+
+        utils.stop_db_writer()
+        utils.close_db_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares the CPU time of sending a queued session payload, see utils.GzipStreamBuilder.
+"full recompress" is the old path (json.loads, add sentTimestamp, json.dumps, gzip.compress),
+"spliced" appends sentTimestamp to the deflate fragment stored by add_to_queue.
+"""
+
+import gzip
+import json
+import time
+
+from payloads import session
+
+import utils
+
+ITERATIONS = 20000
+
+
+def full_recompress(payload_json: str, send_fields: dict) -> bytes:
+    payload = json.loads(payload_json)
+    payload.update(send_fields)
+
+    return gzip.compress(json.dumps(payload).encode("utf-8"))
+
+
+def spliced(payload_json: str, payload_deflate: bytes, send_fields: dict) -> bytes:
+    stream = utils.GzipStreamBuilder(utils.select_compression_level(len(payload_json)))
+    stream.add_precompressed(payload_deflate, payload_json)
+    stream.add_text(utils.build_payload_suffix(payload_json, send_fields))
+
+    return stream.finish()
+
+
+def measure(function, *args) -> float:
+    """Process time per call in microseconds."""
+
+    started = time.process_time()
+
+    for _ in range(ITERATIONS):
+        function(*args)
+
+    return (time.process_time() - started) / ITERATIONS * 1e6
+
+
+def main() -> None:
+    payload = session()
+    payload.update({"type": "end", "endedAt": "2025-10-10T14:00:00", "endRealPowerWh": payload["startRealPowerWh"] + 12345, "consumptionWh": 12345, "rfidTag": "04A1B2C3D4"})
+
+    payload_json = json.dumps(payload)
+    payload_deflate = utils.compress_payload_prefix(payload_json)
+    send_fields = {"sentTimestamp": "2025-10-10T14:00:05"}
+
+    old_body = full_recompress(payload_json, send_fields)
+    new_body = spliced(payload_json, payload_deflate, send_fields)
+
+    # Both bodies carry the same object
+    assert json.loads(gzip.decompress(new_body)) == json.loads(gzip.decompress(old_body))
+
+    print(f"'end' payload, {len(payload_json)} B of JSON, {ITERATIONS} iterations")
+    print(f"  full recompress  {measure(full_recompress, payload_json, send_fields):6.1f} us/item  {len(old_body)} B")
+    print(f"  spliced          {measure(spliced, payload_json, payload_deflate, send_fields):6.1f} us/item  {len(new_body)} B")
+
+
+if __name__ == "__main__":
+    main()
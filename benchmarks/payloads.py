@@ -0,0 +1,91 @@
+"""
+Synthetic EMM payloads shared by the benchmarks, shaped like the agent's real ones.
+Run the benchmarks from the repository root, e.g. `python3 benchmarks/compression_benchmark.py`.
+"""
+
+import os
+import sys
+import json
+import random
+
+# Make the repository's utils importable when a benchmark is run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+random.seed(3)
+
+
+def energy_data(charging: bool) -> dict:
+    """One controller's flattened energy meter reading."""
+
+    energy = {
+        "timestamp": 1700000000 + random.randint(0, 9999),
+        "meas_interval_sec": 10,
+        "energy_meter_info": {"type": "EM340", "serial": str(random.randint(1000000, 9999999))},
+        "energy_real_power": round(random.uniform(1e5, 1e6), 1),
+    }
+
+    for key in ("u1", "u2", "u3"):
+        energy[f"voltage_{key}"] = round(230 + random.uniform(-2, 2), 1)
+
+    for key in ("i1", "i2", "i3"):
+        energy[f"current_{key}"] = round(random.uniform(0, 32), 2) if charging else 0.0
+
+    for key in ("p1", "p2", "p3", "q1", "q2", "q3", "s1", "s2", "s3"):
+        energy[f"power_{key}"] = round(random.uniform(0, 7000), 1) if charging else 0.0
+
+    for key in ("pf1", "pf2", "pf3", "thd_u1", "thd_u2", "thd_u3", "thd_i1", "thd_i2", "thd_i3"):
+        energy[key] = round(random.random(), 3)
+
+    return energy
+
+
+def controller(device_uid: str) -> dict:
+    """One controller's entry of a telemetry pulse."""
+
+    charging = random.random() < 0.4
+
+    return {
+        "device_uid": device_uid,
+        "connected_state": "connected" if charging else "disconnected",
+        "iec_61851_state": "C2" if charging else "A1",
+        "connected_time_sec": random.randint(0, 9999),
+        "charge_time_sec": random.randint(0, 9999),
+        "energy": energy_data(charging),
+    }
+
+
+def pulse_controllers(device_count: int) -> dict:
+    """The controllers of a telemetry pulse keyed by device_uid."""
+
+    device_uids = [f"{random.getrandbits(48):012x}" for _ in range(device_count)]
+
+    return {device_uid: controller(device_uid) for device_uid in device_uids}
+
+
+def pulse(device_count: int) -> bytes:
+    """A JSON telemetry pulse for the given number of controllers."""
+
+    return json.dumps({"type": "pulse", "controllers": pulse_controllers(device_count)}).encode("utf-8")
+
+
+def session() -> dict:
+    """A charging session 'start' payload."""
+
+    return {
+        "type": "start",
+        "id": str(random.getrandbits(64)),
+        "deviceUid": f"{random.getrandbits(48):012x}",
+        "chargingPointId": random.randint(1, 999),
+        "chargingPointName": f"Point {random.randint(1, 99)}",
+        "startedAt": "2025-10-10T12:00:00",
+        "startRealPowerWh": random.randint(100000, 1000000),
+        "endRealPowerWh": None,
+        "consumptionWh": None,
+        "rfidTag": None,
+    }
+
+
+def report(name: str, raw_bytes: int, out_bytes: int, seconds: float, count: int) -> None:
+    """Prints one benchmark row: ratio, average output size and throughput."""
+
+    print(f"  {name:32s} ratio {raw_bytes / out_bytes:5.2f}  {out_bytes // count:7d} B  {raw_bytes / seconds / 1e6:7.1f} MB/s")
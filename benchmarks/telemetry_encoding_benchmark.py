@@ -0,0 +1,44 @@
+"""
+Compares the columnar MessagePack telemetry encoding with the JSON pulses, see utils.encode_columnar_telemetry.
+Both are measured as sent, after gzip, and the encode time includes the compression.
+"""
+
+import gzip
+import json
+import timeit
+
+from payloads import pulse_controllers, report
+
+import utils
+
+
+def encode_json(payload: dict) -> bytes:
+    return gzip.compress(json.dumps(payload).encode("utf-8"))
+
+
+def encode_msgpack(payload: dict) -> bytes:
+    return gzip.compress(utils.encode_columnar_telemetry(payload))
+
+
+def main() -> None:
+    encoders = {
+        "json + gzip": encode_json,
+        "columnar msgpack + gzip": encode_msgpack,
+    }
+
+    for device_count in (1, 4, 12, 48):
+        samples = [{"type": "pulse", "controllers": pulse_controllers(device_count)} for _ in range(20)]
+        raw_bytes = sum(len(json.dumps(sample).encode("utf-8")) for sample in samples)
+        print(f"\npulse {device_count} devices: avg {raw_bytes // len(samples)} B of JSON")
+
+        for name, encode in encoders.items():
+            seconds = min(timeit.repeat(lambda: [encode(sample) for sample in samples], number=5, repeat=5)) / 5
+            out_bytes = sum(len(encode(sample)) for sample in samples)
+            report(name, raw_bytes, out_bytes, seconds, len(samples))
+
+        # The local decoder reads back what was encoded
+        assert utils.decode_columnar_telemetry(utils.encode_columnar_telemetry(samples[0])) == samples[0]
+
+
+if __name__ == "__main__":
+    main()
@@ -17,29 +17,67 @@ import re
 import json
 import time
 import uuid
-import gzip
+import zlib
+import queue
 import logging
 import threading
 import paho.mqtt.client as mqtt
 
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, Any
+from typing import Dict, List, Set, Tuple, Optional, Any, Iterable, Iterator
 
 from utils import (
     load_config,
     set_logging,
     send_request,
+    configure_http_pools,
+    log_http_stats,
+    close_http_sessions,
+    create_emm_circuit_breaker,
+    CIRCUIT_OPEN,
+    TelemetryDeltaEncoder,
+    PulseCadencePolicy,
+    encode_columnar_telemetry,
+    MSGPACK_CONTENT_TYPE,
+    CompressionEngine,
+    create_compression_engine,
+    parse_metric_tolerances,
+    SessionTimerTracker,
+    EnergySampleHistory,
     initialize_queue_db,
-    get_charging_point,
+    close_db_connections,
+    stop_db_writer,
+    DB_WRITE_TIMEOUT_SECONDS,
+    DeviceRegistry,
+    load_device_states,
+    load_rfid_scans,
     get_last_known_controller_state,
     set_last_known_state,
     find_and_claim_rfid,
+    defer_rfid_pairing,
+    claim_deferred_rfid,
+    get_claimed_rfid,
+    cancel_rfid_pairing,
     get_active_session_from_queue,
     add_to_queue,
-    get_pending_queue_items,
+    iter_pending_queue_pages,
+    get_seconds_until_next_attempt,
+    claim_queue_items,
+    release_queue_items,
+    defer_if_predecessor_unsent,
+    QUEUE_WAKEUP_EVENT,
     update_queue_item_status,
+    GzipStreamBuilder,
+    build_payload_suffix,
+    select_compression_level,
+    run_queue_retention,
     update_controller_telemetry,
+    add_to_telemetry_backlog,
+    get_telemetry_backlog_batch,
+    remove_from_telemetry_backlog,
+    EnergyTimeSeriesBuffer,
+    prune_energy_timeseries,
     save_rfid_event
 )
 
@@ -50,12 +88,18 @@ from utils import (
 
 config = load_config()
 set_logging(config)
+configure_http_pools(config)
 
 # Threading control
 STOP_EVENT = threading.Event()
 TELEMETRY_LOCK = threading.Lock()
 telemetry_buffer: Dict[str, Any] = {}
 
+# Newest raw energy message by device with its arrival time, parsed once per heartbeat tick.
+# A newer message replaces an unread one, the replaced messages are counted as skipped
+pending_energy_messages: Dict[str, Tuple[float, bytes]] = {}
+ENERGY_MESSAGE_STATS: Dict[str, int] = {"received": 0, "skipped": 0, "parsed": 0, "failed": 0}
+
 DEVICE_LOCKS: Dict[str, threading.Lock] = {}
 DEVICE_LOCKS_REGISTRY_LOCK = threading.Lock()
 
@@ -67,6 +111,10 @@ def get_device_lock(device_uid: str) -> threading.Lock:
 
         return DEVICE_LOCKS[device_uid]
 
+# Enqueue-to-send latency of the session queue, updated by the sender
+QUEUE_LATENCY_LOCK = threading.Lock()
+QUEUE_LATENCY_STATS: Dict[str, float] = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0}
+
 # Thread pools
 event_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="EV-Event")
 
@@ -81,12 +129,96 @@ EMM_HOST = config["EmmSettings"]["Host"]
 EMM_API_KEY = config["EmmSettings"]["ApiKey"]
 EMM_SESSION_ENDPOINT = config["EmmSettings"].get("SessionEndpoint", "/api/v2/public/charging-session")
 EMM_TELEMETRY_ENDPOINT = config["EmmSettings"].get("TelemetryEndpoint", "/api/v2/public/controller-telemetry")
+EMM_SESSION_BATCH_ENDPOINT = config["EmmSettings"].get("SessionBatchEndpoint", "/api/v2/public/charging-session/batch")
 EMM_HEADERS = {
     "Content-Type": "application/json",
     "Content-Encoding": "gzip",
     "Authorization": f"Bearer {EMM_API_KEY}",
 }
 
+# Telemetry pulses in the columnar MessagePack encoding, switched off at runtime if EMM answers 415
+EMM_MSGPACK_HEADERS = {**EMM_HEADERS, "Content-Type": MSGPACK_CONTENT_TYPE}
+telemetry_binary_enabled = config["EmmSettings"].get("TelemetryEncoding", "json").lower() == "msgpack"
+
+# Compresses telemetry bodies, sessions keep their spliced gzip stream (see GzipStreamBuilder)
+EMM_COMPRESSION = create_compression_engine(config)
+
+# Shared by every EMM sender, while it's open the senders skip EMM instead of waiting on timeouts
+EMM_CIRCUIT_BREAKER = create_emm_circuit_breaker(config)
+
+# Delta pulses only carry the metrics that changed since the last pulse EMM acknowledged
+TELEMETRY_DELTA_ENCODER: Optional[TelemetryDeltaEncoder] = None
+
+if config["EmmSettings"].get("TelemetryDeltaEnabled", "false").lower() == "true":
+    TELEMETRY_DELTA_ENCODER = TelemetryDeltaEncoder(
+        keyframe_interval=int(config["EmmSettings"].get("TelemetryKeyframeInterval", 30)),
+        tolerances=parse_metric_tolerances(config["EmmSettings"].get("TelemetryTolerances", "")),
+    )
+
+# Session queue batching - QueueBatchSize=1 sends every queued item in its own request
+QUEUE_BATCH_SIZE = max(1, int(config["AppSettings"].get("QueueBatchSize", 1)))
+QUEUE_BATCH_MAX_BYTES = int(config["AppSettings"].get("QueueBatchMaxBytes", 262144))
+
+# Switched off at runtime if EMM doesn't support the batch endpoint
+queue_batch_enabled = QUEUE_BATCH_SIZE > 1
+
+# Session queue sender lanes - sessions are spread over the lanes and sent concurrently
+QUEUE_SENDER_LANES = max(1, int(config["AppSettings"].get("QueueSenderLanes", 3)))
+QUEUE_LANE_DEPTH = max(1, int(config["AppSettings"].get("QueueLaneDepth", 20)))
+QUEUE_LEASE_SECONDS = int(config["AppSettings"].get("QueueLeaseSeconds", 120))
+
+# Telemetry pulse interval and the on-disk backlog of pulses that couldn't be delivered
+TELEMETRY_INTERVAL = int(config["AppSettings"].get("TelemetryIntervalSeconds", 10))
+TELEMETRY_BACKLOG_ENABLED = config["AppSettings"].get("TelemetryBacklogEnabled", "true").lower() == "true"
+TELEMETRY_BACKLOG_BATCH_SIZE = max(1, int(config["AppSettings"].get("TelemetryBacklogBatchSize", 60)))
+
+# Set while the backlog may hold pulses, a backlog from before a restart is checked too
+TELEMETRY_BACKLOG_PENDING = threading.Event()
+TELEMETRY_BACKLOG_PENDING.set()
+TELEMETRY_BACKLOG_WAKEUP = threading.Event()
+
+# Idle devices pulse rarely, state transitions and large power changes wake the heartbeat for a pulse right away
+PULSE_CADENCE = PulseCadencePolicy(
+    active_interval=TELEMETRY_INTERVAL,
+    idle_interval=int(config["AppSettings"].get("TelemetryIdleIntervalSeconds", 300)),
+    power_change_threshold=float(config["AppSettings"].get("TelemetryPowerChangeWatts", 1000)),
+)
+TELEMETRY_PULSE_WAKEUP = threading.Event()
+
+# Energy metric with the active power in W, if empty the power is derived from the energy counter
+TELEMETRY_POWER_METRIC = config["AppSettings"].get("TelemetryPowerMetric", "")
+CURRENT_POWER: Dict[str, float] = {}
+ENERGY_COUNTER_SAMPLES: Dict[str, Tuple[float, float]] = {}
+
+# Shortest span the power is derived from the energy counter over, in seconds
+ENERGY_COUNTER_MIN_SECONDS = 5
+
+# The start of a metric's object and the number after "value": in a raw energy message
+ENERGY_METRIC_OBJECT = re.compile(rb'\s*:\s*\{')
+ENERGY_VALUE_NUMBER = re.compile(rb'\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)')
+
+# Recent raw energy messages per device, session boundaries read the meter from them instead of the REST API
+ENERGY_SAMPLES = EnergySampleHistory(
+    max_samples=int(config["AppSettings"].get("EnergySampleHistory", 30)),
+    max_age=float(config["AppSettings"].get("EnergySampleMaxAgeSeconds", 30)),
+)
+
+# Local history of the energy metrics, flushed to the time series tables on every pulse
+ENERGY_TIMESERIES = EnergyTimeSeriesBuffer()
+
+# IEC 61851 states in which a vehicle is connected and charging
+CONNECTED_VEHICLE_STATES = ["B1", "B2", "C1", "C2", "D1", "D2"]
+CHARGING_VEHICLE_STATES = ["C1", "C2"]
+
+# Controllers and charging points by device UID, the event path never calls the REST API for them
+DEVICE_REGISTRY = DeviceRegistry(config)
+
+# Session timers are computed from the MQTT state transitions, the REST API is only
+# read for devices that need a resync and for one drift check per device and interval
+SESSION_TIMERS = SessionTimerTracker(CONNECTED_VEHICLE_STATES, CHARGING_VEHICLE_STATES)
+TIMER_AUDIT_INTERVAL = int(config["AppSettings"].get("TimerAuditIntervalSeconds", 900))
+TIMER_DRIFT_TOLERANCE = int(config["AppSettings"].get("TimerDriftToleranceSeconds", 15))
+
 # MQTT topics
 # the "+" sign is a wildcard for any UID of the controller
 TOPIC_IEC_61851_STATE = "charging_controllers/+/data/iec_61851_state"
@@ -108,18 +240,24 @@ def ts() -> str: return datetime.now().strftime("%d-%m-%Y %H:%M:%S")
 
 
 def initialize_telemetry_metadata():
-    """Fetches static data from the charger API once."""
+    """Loads the device registry from the charger API and sends the static data to EMM."""
     logging.info("Initializing controller metadata")
 
-    url = f"http://{REST_API_HOST}:{REST_API_PORT}/api/v1.0/charging-controllers"
-    response = send_request(url, "GET")
+    DEVICE_REGISTRY.refresh()
+    send_telemetry_metadata()
 
-    if response:
-        controllers = response.json()
 
+def send_telemetry_metadata():
+    """
+    Fills the static data of every controller in the memory buffer from the
+    device registry and sends it to EMM as an 'initial' telemetry message.
+    """
+
+    controllers = DEVICE_REGISTRY.controllers()
+
+    if controllers:
         for device_uid, info in controllers.items():
-            charging_point_url = f"http://{REST_API_HOST}:{REST_API_PORT}/api/v1.0/charging-points"
-            charging_point_id, charging_point_name = get_charging_point(device_uid, charging_point_url)
+            charging_point_id, charging_point_name = DEVICE_REGISTRY.get_charging_point(device_uid)
             
             with TELEMETRY_LOCK:
                 telemetry_buffer[device_uid] = {
@@ -132,7 +270,8 @@ def initialize_telemetry_metadata():
                     "position": info["position"],
                     "charging_point_id": charging_point_id,
                     "charging_point_name": charging_point_name,
-                    "energy": {} # Will be filled by MQTT
+                    # Filled by MQTT, kept when the metadata is refreshed
+                    "energy": telemetry_buffer.get(device_uid, {}).get("energy", {})
                 }
 
         try:
@@ -142,14 +281,7 @@ def initialize_telemetry_metadata():
             }
             payload_json = json.dumps(payload)
 
-            compressed_data = gzip.compress(payload_json.encode("utf-8"))
-
-            emm_response = send_request(
-                url=f"{EMM_HOST}{EMM_TELEMETRY_ENDPOINT}",
-                method="POST",
-                headers=EMM_HEADERS,
-                data=compressed_data
-            )
+            emm_response = send_emm_telemetry(payload_json.encode("utf-8"), EMM_HEADERS)
 
             if not emm_response:
                 logging.warning(f"Failed to send initial telemetry data for device to EMM")
@@ -178,12 +310,98 @@ def flatten_energy_data(raw_energy: Dict[str, Any]) -> Dict[str, Any]:
     return cleaned
 
 
+def update_current_power(device_uid: str, energy_data: Dict[str, Any]) -> Optional[float]:
+    """
+    Updates the current active power of a device from its flattened energy data. Uses
+    TELEMETRY_POWER_METRIC if the controller reports it, otherwise the rate of change
+    of the energy_real_power counter (Wh) over at least 5 seconds.
+
+    Args:
+        device_uid: Charging controller ID
+        energy_data: The flattened energy data
+    Returns:
+        The current power in W, None if it isn't known yet
+    """
+
+    power = energy_data.get(TELEMETRY_POWER_METRIC) if TELEMETRY_POWER_METRIC else None
+
+    if isinstance(power, (int, float)):
+        CURRENT_POWER[device_uid] = float(power)
+        return CURRENT_POWER[device_uid]
+
+    counter = energy_data.get("energy_real_power")
+
+    if not isinstance(counter, (int, float)):
+        return CURRENT_POWER.get(device_uid)
+
+    now = time.monotonic()
+    previous = ENERGY_COUNTER_SAMPLES.get(device_uid)
+
+    if previous is None:
+        ENERGY_COUNTER_SAMPLES[device_uid] = (now, counter)
+
+    elif now - previous[0] >= ENERGY_COUNTER_MIN_SECONDS:
+        CURRENT_POWER[device_uid] = max(0.0, (counter - previous[1]) * 3600 / (now - previous[0]))
+        ENERGY_COUNTER_SAMPLES[device_uid] = (now, counter)
+
+    return CURRENT_POWER.get(device_uid)
+
+
+def read_power_fields(payload: bytes) -> Dict[str, float]:
+    """
+    Reads TELEMETRY_POWER_METRIC, or the energy counter if it isn't set, from a raw energy
+    message with a substring search instead of parsing the JSON. About 2-3.5 us on a 1.2 kB
+    message, where json.loads() takes about 19 us.
+
+    Args:
+        payload: The raw JSON payload of the energy message, {"metric": {..., "value": 1.5, ...}}
+    Returns:
+        The found field by metric name, in the flattened form update_current_power() takes
+    """
+
+    metric = TELEMETRY_POWER_METRIC or "energy_real_power"
+    key = b'"' + metric.encode("utf-8") + b'"'
+
+    start = payload.find(key)
+    if start < 0:
+        return {}
+
+    # The value must be inside the metric's own object
+    metric_object = ENERGY_METRIC_OBJECT.match(payload, start + len(key))
+    if metric_object is None:
+        return {}
+
+    value = payload.find(b'"value"', metric_object.end(), payload.find(b"}", metric_object.end()))
+    if value < 0:
+        return {}
+
+    match = ENERGY_VALUE_NUMBER.match(payload, value + len(b'"value"'))
+
+    return {metric: float(match.group(1))} if match else {}
+
+
+def is_power_check_due(device_uid: str, now: float) -> bool:
+    """
+    True if a new energy message can change the device's current power. A reported power
+    metric can change with every message, a power derived from the energy counter only
+    once ENERGY_COUNTER_MIN_SECONDS have passed since its last counter sample.
+    """
+
+    if TELEMETRY_POWER_METRIC:
+        return True
+
+    previous = ENERGY_COUNTER_SAMPLES.get(device_uid)
+
+    return previous is None or now - previous[0] >= ENERGY_COUNTER_MIN_SECONDS
+
+
 def on_telemetry_message(client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage):
     """
     Callback function executed when an MQTT telemetry message (energy JSON) is received.
-    Parses the comprehensive energy metrics from the charger—including voltages, 
-    currents, and power levels—and updates the in-memory buffer to keep the 
-    real-time dashboard data current without disk I/O.
+    Keeps the raw payload as the device's newest message and adds it to the short history
+    used for session boundaries. Only the power is read here, when it can have changed,
+    and a large power change wakes the heartbeat to pulse this device right away.
+    The parsing and flattening happens in apply_pending_energy_messages() on the heartbeat thread.
 
     Args:
         client: The MQTT client instance.
@@ -194,22 +412,73 @@ def on_telemetry_message(client: mqtt.Client, userdata: Any, message: mqtt.MQTTM
         None
     """
 
-    # Extract device_uid from the message topic
-    pattern = r"/([^/]+)/"
-    match = re.search(pattern, message.topic)
-    device_uid = match.group(1) if match else "unknown_device"
+    received_at = time.time()
+    ENERGY_SAMPLES.add(message.topic, message.payload, received_at)
 
-    if device_uid == "unknown_device":
+    # Extract device_uid from the message topic, charging_controllers/<device_uid>/data/energy
+    topic_parts = message.topic.split("/", 2)
+
+    if len(topic_parts) < 3 or not topic_parts[1]:
         logging.error(f"Could not extract device UID from topic: {message.topic}, skipping")
         return
-    
-    try:
-        raw_data = json.loads(message.payload.decode("utf-8"))
-        
-        # Flatten the data before storing it
-        energy_data = flatten_energy_data(raw_data)
+
+    device_uid = topic_parts[1]
+
+    with TELEMETRY_LOCK:
+        ENERGY_MESSAGE_STATS["received"] += 1
+
+        if device_uid in pending_energy_messages:
+            ENERGY_MESSAGE_STATS["skipped"] += 1
+
+        pending_energy_messages[device_uid] = (received_at, message.payload)
+
+    if not is_power_check_due(device_uid, time.monotonic()):
+        return
+
+    power = update_current_power(device_uid, read_power_fields(message.payload))
+
+    if power is not None and PULSE_CADENCE.observe_power(device_uid, power):
+        TELEMETRY_PULSE_WAKEUP.set()
+
+
+def apply_pending_energy_messages(device_uids: Optional[Iterable[str]] = None) -> None:
+    """
+    Parses the newest energy message of each device received since the last call,
+    updates the in-memory buffer with it and adds it to the energy time series
+    with its arrival time, one sample per device and heartbeat tick.
+
+    Args:
+        device_uids: Only parse the messages of these devices, all devices if None
+    Returns:
+        None
+    """
+
+    global pending_energy_messages
+
+    with TELEMETRY_LOCK:
+        if device_uids is None:
+            pending, pending_energy_messages = pending_energy_messages, {}
+        else:
+            pending = {device_uid: pending_energy_messages.pop(device_uid) for device_uid in device_uids if device_uid in pending_energy_messages}
+
+    for device_uid, (received_at, payload) in pending.items():
+        try:
+            # Flatten the data before storing it
+            energy_data = flatten_energy_data(json.loads(payload.decode("utf-8")))
+
+        except Exception as e:
+            logging.error(f"Error parsing telemetry JSON: {e}")
+
+            with TELEMETRY_LOCK:
+                ENERGY_MESSAGE_STATS["failed"] += 1
+
+            continue
+
+        ENERGY_TIMESERIES.add(device_uid, energy_data, received_at)
 
         with TELEMETRY_LOCK:
+            ENERGY_MESSAGE_STATS["parsed"] += 1
+
             if device_uid in telemetry_buffer:
                 # Update only the energy key, preserving static metadata
                 telemetry_buffer[device_uid]["energy"] = energy_data
@@ -217,81 +486,335 @@ def on_telemetry_message(client: mqtt.Client, userdata: Any, message: mqtt.MQTTM
                 # If metadata hasn't loaded yet, create a skeleton
                 telemetry_buffer[device_uid] = {"energy": energy_data}
 
-    except Exception as e:
-        logging.error(f"Error parsing telemetry JSON: {e}")
+
+def log_energy_message_stats() -> None:
+    """Logs how many energy messages were received, parsed, failed to parse and skipped because a newer one replaced them."""
+
+    with TELEMETRY_LOCK:
+        stats = dict(ENERGY_MESSAGE_STATS)
+
+    if stats["received"]:
+        logging.info(
+            f"Energy messages: {stats['received']} received, {stats['parsed']} parsed, {stats['failed']} failed, "
+            f"{stats['skipped']} skipped ({stats['skipped'] / stats['received']:.1%})"
+        )
+
+
+def resync_session_timers(device_uid: str) -> None:
+    """
+    Reads the state and session timers of a controller from the REST API and
+    replaces the locally computed values with them.
+
+    Args:
+        device_uid: Charging controller ID
+    Returns:
+        None
+    """
+
+    timer_url = f"http://{REST_API_HOST}:{REST_API_PORT}/api/v1.0/charging-controllers/{device_uid}/data?param_list=iec_61851_state,connected_time_sec,charge_time_sec"
+    timer_response = send_request(timer_url, "GET")
+
+    if timer_response is None:
+        return
+
+    try:
+        api_data = timer_response.json()
+
+        drifted = SESSION_TIMERS.resync(
+            device_uid,
+            api_data["iec_61851_state"],
+            api_data["connected_time_sec"],
+            api_data["charge_time_sec"],
+            tolerance=TIMER_DRIFT_TOLERANCE,
+        )
+
+        if drifted:
+            logging.warning(f"Session timers of {device_uid} drifted from the controller, resynced from the REST API")
+
+    except (ValueError, KeyError, TypeError) as e:
+        logging.error(f"Failed to parse session timers of {device_uid}: {e}")
 
 
 def telemetry_heartbeat_worker():
     """
     Worker function executed in a background thread to manage telemetry delivery.
-    Periodically aggregates technical data from the memory buffer with session 
-    timers retrieved from the REST API, persists the unified state to the 
-    local database, and transmits the pulse to the EMM system.
+    On every tick, parses the new energy messages and aggregates technical data from
+    the memory buffer with session timers computed from the MQTT state transitions,
+    persists the unified state to the local database, and transmits the pulse to the
+    EMM system, either in full or delta-encoded against the last acknowledged pulse.
+    Pulses that can't be delivered are kept in the telemetry backlog.
+    A state transition or a large power change wakes the heartbeat right away, such an
+    early wake-up only handles the triggered devices.
 
     Returns:
         None
     """
     
-    while not STOP_EVENT.wait(timeout=10):
-        # Create a local copy to minimize lock time
-        with TELEMETRY_LOCK:
-            current_snapshot = list(telemetry_buffer.items())
+    next_tick = time.monotonic() + TELEMETRY_INTERVAL
+
+    while not STOP_EVENT.is_set():
+        # Sleep until the next tick, out-of-band pulses wake the heartbeat early
+        TELEMETRY_PULSE_WAKEUP.wait(timeout=max(0.0, next_tick - time.monotonic()))
+        TELEMETRY_PULSE_WAKEUP.clear()
+
+        if STOP_EVENT.is_set():
+            break
+
+        captured_at = int(time.time())
+
+        # An early wake-up only pulses the triggered devices, the maintenance runs on the regular tick
+        if time.monotonic() < next_tick:
+            triggered_devices = PULSE_CADENCE.triggered_devices()
+            apply_pending_energy_messages(triggered_devices)
+
+            with TELEMETRY_LOCK:
+                current_snapshot = [(device_uid, telemetry_buffer[device_uid]) for device_uid in triggered_devices if device_uid in telemetry_buffer]
+
+        else:
+            next_tick = time.monotonic() + TELEMETRY_INTERVAL
+
+            # Refresh the device registry when it's due, a changed configuration is sent to EMM again
+            try:
+                if DEVICE_REGISTRY.refresh_due() and DEVICE_REGISTRY.refresh():
+                    logging.info("Controller or charging point configuration changed, resending the metadata to EMM")
+                    send_telemetry_metadata()
+
+            except Exception as e:
+                logging.error(f"Error refreshing the device registry: {e}", exc_info=True)
+
+            # Parse the new energy messages and write them to the local time series
+            apply_pending_energy_messages()
+            ENERGY_TIMESERIES.flush(config)
+
+            # Create a local copy to minimize lock time
+            with TELEMETRY_LOCK:
+                current_snapshot = list(telemetry_buffer.items())
+
+            # Resync the timers of devices that are new or may have missed transitions,
+            # and check at most one other device per tick for drift
+            audited = False
+
+            for device_uid, _ in current_snapshot:
+                try:
+                    if SESSION_TIMERS.needs_resync(device_uid):
+                        resync_session_timers(device_uid)
+
+                    elif not audited and TIMER_AUDIT_INTERVAL > 0 and SESSION_TIMERS.audit_due(device_uid, TIMER_AUDIT_INTERVAL):
+                        resync_session_timers(device_uid)
+                        audited = True
+
+                except Exception as e:
+                    logging.error(f"Error resyncing session timers for {device_uid}: {e}", exc_info=True)
 
         # Build the batch of technical data
         batch_payload = {}
 
         for device_uid, cached_data in current_snapshot:
             try:
-                # Fetch connected and charge time data from REST API
-                timer_url = f"http://{REST_API_HOST}:{REST_API_PORT}/api/v1.0/charging-controllers/{device_uid}/data?param_list=iec_61851_state,connected_time_sec,charge_time_sec"
-                timer_response = send_request(timer_url, "GET")
+                # Connected and charge time are computed from the MQTT state transitions
+                timers = SESSION_TIMERS.snapshot(device_uid)
 
-                if timer_response is None:
+                if timers is None:
                     continue
 
-                api_data = timer_response.json()
                 connected_state = get_last_known_controller_state(device_uid, config)
 
                 pulse = {
                     "device_uid": device_uid,
                     "connected_state": connected_state,
-                    "iec_61851_state": api_data["iec_61851_state"],
-                    "connected_time_sec": api_data["connected_time_sec"],
-                    "charge_time_sec": api_data["charge_time_sec"],
+                    "iec_61851_state": timers["iec_61851_state"],
+                    "connected_time_sec": timers["connected_time_sec"],
+                    "charge_time_sec": timers["charge_time_sec"],
                     "energy": cached_data.get("energy", {})
                 }
 
                 # Update SQLite per controller (important for local persistence)
                 update_controller_telemetry(config, device_uid, json.dumps(pulse))
 
-                batch_payload[device_uid] = pulse
+                # Only the devices that are due go to EMM, idle ones are sent less often
+                if PULSE_CADENCE.is_due(device_uid, timers["iec_61851_state"]):
+                    batch_payload[device_uid] = pulse
+                    PULSE_CADENCE.mark_pulsed(device_uid, CURRENT_POWER.get(device_uid))
                 
             except Exception as e:
                 logging.error(f"Error gathering telemetry for {device_uid}: {e}", exc_info=True)
 
-        # Send the entire batch if we have data
-        if batch_payload:
-            try:
+        if not batch_payload:
+            continue
+
+        # Pulses that can't be delivered go to the backlog, they're uploaded once EMM is back
+        try:
+            delivered = EMM_CIRCUIT_BREAKER.allow_request() and send_telemetry_pulse(batch_payload)
+
+            if not delivered and TELEMETRY_BACKLOG_ENABLED:
+                add_to_telemetry_backlog(config, captured_at, batch_payload)
+                TELEMETRY_BACKLOG_PENDING.set()
+
+            elif delivered and TELEMETRY_BACKLOG_PENDING.is_set():
+                TELEMETRY_BACKLOG_WAKEUP.set()
+
+        except Exception as e:
+            logging.error(f"Error in telemetry heartbeat thread: {e}", exc_info=True)
+
+
+def send_emm_telemetry(body: bytes, headers: Dict[str, str]):
+    """
+    Compresses a telemetry body with the configured engine and posts it to EMM.
+    If EMM answers HTTP 415 to a body compressed with the preset dictionary, the body is resent
+    once with gzip. Only if EMM accepts the gzip body the dictionary was the problem and the engine
+    switches to gzip for good, otherwise the 415 rejects the body format and is returned as is.
+
+    Args:
+        body: The uncompressed request body
+        headers: The request headers, the engine's Content-Encoding is added to them
+    Returns:
+        The EMM response, None if the request failed or was skipped
+    """
+
+    global EMM_COMPRESSION
+
+    compression = EMM_COMPRESSION
+
+    emm_response = send_request(
+        url=f"{EMM_HOST}{EMM_TELEMETRY_ENDPOINT}",
+        method="POST",
+        headers={**headers, **compression.headers},
+        data=compression.compress(body),
+        circuit_breaker=EMM_CIRCUIT_BREAKER,
+    )
+
+    # Telemetry skipped by the circuit breaker is handled like any undelivered pulse
+    if emm_response is CIRCUIT_OPEN:
+        return None
+
+    if emm_response is None or emm_response.status_code != 415 or compression.method != CompressionEngine.ZLIB_DICT:
+        return emm_response
+
+    gzip_compression = CompressionEngine(CompressionEngine.GZIP, level=compression.level)
+
+    gzip_response = send_request(
+        url=f"{EMM_HOST}{EMM_TELEMETRY_ENDPOINT}",
+        method="POST",
+        headers={**headers, **gzip_compression.headers},
+        data=gzip_compression.compress(body),
+        circuit_breaker=EMM_CIRCUIT_BREAKER,
+    )
+
+    if gzip_response is CIRCUIT_OPEN:
+        return None
+
+    if gzip_response is not None and gzip_response.status_code != 415:
+        logging.warning("EMM doesn't accept the compression dictionary (HTTP 415), falling back to gzip.")
+        EMM_COMPRESSION = gzip_compression
+
+    return gzip_response
+
+
+def send_telemetry_pulse(batch_payload: Dict[str, Any]) -> bool:
+    """
+    Sends the pulses of all controllers to EMM, delta-encoded and in the columnar
+    MessagePack encoding if enabled.
+
+    Args:
+        batch_payload: The full pulses keyed by device_uid.
+    Returns:
+        True if EMM accepted the pulse, False otherwise.
+    """
+
+    payload = {
+        "type": "pulse",
+        "controllers": batch_payload
+    }
+
+    if TELEMETRY_DELTA_ENCODER is not None:
+        encoded_payload = {
+            device_uid: TELEMETRY_DELTA_ENCODER.encode(device_uid, pulse)
+            for device_uid, pulse in batch_payload.items()
+        }
+
+        payload = {
+            "type": "pulse",
+            "encoding": "delta",
+            "controllers": encoded_payload
+        }
+
+    global telemetry_binary_enabled
+
+    emm_response = None
+
+    if telemetry_binary_enabled:
+        emm_response = send_emm_telemetry(encode_columnar_telemetry(payload), EMM_MSGPACK_HEADERS)
+
+        # EMM doesn't understand the binary encoding, send JSON from now on
+        if emm_response is not None and emm_response.status_code == 415:
+            logging.warning("EMM doesn't accept binary telemetry (HTTP 415), falling back to JSON pulses.")
+            telemetry_binary_enabled = False
+
+    if not telemetry_binary_enabled:
+        payload_json = json.dumps(payload)
+        emm_response = send_emm_telemetry(payload_json.encode("utf-8"), EMM_HEADERS)
+
+    if not emm_response:
+        logging.warning("Failed to send telemetry batch to EMM")
+        return False
+
+    if TELEMETRY_DELTA_ENCODER is not None:
+        # EMM has applied the pulse, the next deltas are relative to it
+        for device_uid, pulse in batch_payload.items():
+            TELEMETRY_DELTA_ENCODER.acknowledge(device_uid, pulse, encoded_payload[device_uid])
+
+    return True
+
+
+def telemetry_backlog_worker():
+    """
+    Worker function executed in a background thread that uploads the telemetry backlog
+    collected during an EMM outage. It's woken by the heartbeat once a live pulse gets
+    through again and sends the stored pulses oldest first in compressed batches.
+
+    Returns:
+        None
+    """
+
+    while not STOP_EVENT.is_set():
+        # The timeout also covers a backlog left over from before a restart
+        TELEMETRY_BACKLOG_WAKEUP.wait(timeout=300)
+        TELEMETRY_BACKLOG_WAKEUP.clear()
+
+        try:
+            while not STOP_EVENT.is_set() and EMM_CIRCUIT_BREAKER.is_closed():
+                backlog = get_telemetry_backlog_batch(config, TELEMETRY_BACKLOG_BATCH_SIZE)
+
+                if not backlog:
+                    TELEMETRY_BACKLOG_PENDING.clear()
+                    break
+
                 payload = {
-                    "type": "pulse",
-                    "controllers": batch_payload
+                    "type": "backlog",
+                    "pulses": [
+                        {
+                            "captured_at": datetime.fromtimestamp(entry["captured_at"]).isoformat(),
+                            "resolution_sec": entry["resolution"],
+                            "controllers": entry["controllers"],
+                        }
+                        for entry in backlog
+                    ]
                 }
 
-                payload_json = json.dumps(payload)
-                compressed_data = gzip.compress(payload_json.encode("utf-8"))
+                emm_response = send_emm_telemetry(json.dumps(payload).encode("utf-8"), EMM_HEADERS)
 
-                emm_response = send_request(
-                    url=f"{EMM_HOST}{EMM_TELEMETRY_ENDPOINT}",
-                    method="POST",
-                    headers=EMM_HEADERS,
-                    data=compressed_data,
-                )
-                
                 if not emm_response:
-                    logging.warning("Failed to send telemetry batch to EMM")
+                    logging.warning("Failed to upload the telemetry backlog to EMM, retrying after the next delivered pulse")
+                    break
 
-            except Exception as e:
-                logging.error(f"Error in telemetry heartbeat thread: {e}", exc_info=True)
+                remove_from_telemetry_backlog(config, [entry["id"] for entry in backlog]).result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+                logging.info(f"Uploaded {len(backlog)} backlogged telemetry pulses to EMM")
+
+                # Add a small delay between requests to avoid hammering the API
+                STOP_EVENT.wait(timeout=1)
+
+        except Exception as e:
+            logging.error(f"Error in telemetry backlog thread: {e}", exc_info=True)
 
 
 ##########################################################
@@ -305,7 +828,126 @@ def telemetry_heartbeat_worker():
 ##################################################
 
 
-def handle_vehicle_event_logic(vehicle_state: str, topic: str, message_ts: str) -> None:
+def get_event_energy_data(device_uid: str, received_at: float) -> Optional[Dict[str, Any]]:
+    """
+    Reads the energy meter at the time of a vehicle event from the recent MQTT energy
+    messages, interpolated between the samples around it. The REST API is only called
+    if there's no sample close enough to the event.
+
+    Args:
+        device_uid: Charging controller ID
+        received_at: Unix time the MQTT message of the event arrived, with sub-second precision
+    Returns:
+        The energy data in the REST API form, {"energy": {...}}, None if it couldn't be read
+    """
+
+    energy = ENERGY_SAMPLES.at(TOPIC_ENERGY.replace("+", device_uid), received_at)
+
+    if energy is not None:
+        return {"energy": energy}
+
+    logging.info(f"No recent energy message from {device_uid}, reading the energy from the REST API")
+
+    energy_url = f"http://{REST_API_HOST}:{REST_API_PORT}/api/v1.0/charging-controllers/{device_uid}/data?param_list=energy"
+    energy_response = send_request(url=energy_url, method="GET")
+    
+    if energy_response is None:
+        logging.warning(f"Could not get energy data for {device_uid}, skipping MQTT message processing")
+        return None
+
+    try:
+        return energy_response.json()
+    except json.JSONDecodeError:
+        logging.error(f"Failed to parse energy data JSON for {device_uid}: {energy_response.text}")
+        return None
+
+
+def queue_rfid_pairing(charging_session_id: str, device_uid: str, charging_point_name: Optional[str], rfid_tag: str, rfid_ts: str, vehicle_state: str) -> None:
+    """
+    Queues the 'rfid' record that adds an RFID tag to an already started charging session.
+
+    Args:
+        charging_session_id: The charging session the tag belongs to
+        device_uid: Charging controller ID
+        charging_point_name: Name of the charging point
+        rfid_tag: The claimed RFID tag
+        rfid_ts: ISO timestamp of the scan
+        vehicle_state: The IEC 61851 state of the event the pairing was started by
+    Returns:
+        None
+    """
+
+    # Create a payload and save it to the database queue
+    data_to_save = {
+        "type": "rfid",
+        "id": charging_session_id,
+        "deviceUid": device_uid,
+        "chargingPointName": charging_point_name,
+        "rfidTag": rfid_tag,
+        "rfidTimestamp": rfid_ts,
+        "iec61851State": vehicle_state
+    }
+
+    add_to_queue(config, charging_session_id, device_uid, data_to_save, "rfid").result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+    logging.info(f"RFID {rfid_tag} found for session {charging_session_id} and queued for device {device_uid}")
+
+
+def pair_rfid_when_scanned(charging_session_id: str, device_uid: str, charging_point_name: Optional[str], paired_ts: str, vehicle_state: str) -> None:
+    """
+    Pairs the RFID tag closest to paired_ts with a started charging session. If the tag
+    hasn't been scanned yet, the pairing is deferred and an event worker claims the tag
+    and queues the 'rfid' record once the scan arrives, the calling worker never waits for it.
+
+    The claim and the 'rfid' record are made under the device lock, the session's 'end' is
+    built under the same lock, so the end either carries the tag or is queued after the 'rfid' record.
+
+    Args:
+        charging_session_id: The charging session to pair
+        device_uid: Charging controller ID
+        charging_point_name: Name of the charging point
+        paired_ts: ISO timestamp the scan should be close to
+        vehicle_state: The IEC 61851 state of the event
+    Returns:
+        None
+    """
+
+    def on_scan() -> None:
+        # Called on the MQTT network thread, the claim is left to the event workers
+        event_executor.submit(complete_rfid_pairing, charging_session_id, device_uid, charging_point_name, vehicle_state)
+
+    with get_device_lock(device_uid):
+        # The session is already paired, e.g. a repeated B -> C transition
+        if get_claimed_rfid(config, charging_session_id)[0]:
+            return
+
+        rfid_tag, rfid_ts = defer_rfid_pairing(config, charging_session_id, paired_ts, on_scan)
+
+        if rfid_tag and rfid_ts:
+            queue_rfid_pairing(charging_session_id, device_uid, charging_point_name, rfid_tag, rfid_ts, vehicle_state)
+
+
+def complete_rfid_pairing(charging_session_id: str, device_uid: str, charging_point_name: Optional[str], vehicle_state: str) -> None:
+    """
+    Claims the RFID tag of a deferred pairing after its scan arrived and queues the 'rfid' record.
+    Nothing is claimed if the session ended in the meantime.
+
+    Args:
+        charging_session_id: The charging session to pair
+        device_uid: Charging controller ID
+        charging_point_name: Name of the charging point
+        vehicle_state: The IEC 61851 state of the event that deferred the pairing
+    Returns:
+        None
+    """
+
+    with get_device_lock(device_uid):
+        rfid_tag, rfid_ts = claim_deferred_rfid(config, charging_session_id)
+
+        if rfid_tag and rfid_ts:
+            queue_rfid_pairing(charging_session_id, device_uid, charging_point_name, rfid_tag, rfid_ts, vehicle_state)
+
+
+def handle_vehicle_event_logic(vehicle_state: str, topic: str, message_ts: str, received_at: Optional[float] = None) -> None:
     """
     Perfoms the heavy lifting operations of vehicle status change - REST API, DB operations, RFID pairing.
     This functions runs in its own thread seperate from the MQTT loop.
@@ -313,7 +955,8 @@ def handle_vehicle_event_logic(vehicle_state: str, topic: str, message_ts: str)
     Args:
         vehicle_state: The IEC 61851 state received in the MQTT payload.
         topic: The MQTT message topic.
-        message_ts: The MQTT message arrival ISO timestamp.
+        message_ts: The MQTT message arrival ISO timestamp, in whole seconds as sent to EMM.
+        received_at: The precise Unix arrival time the energy reading is taken at, message_ts if not set.
 
     Returns:
         None
@@ -333,11 +976,8 @@ def handle_vehicle_event_logic(vehicle_state: str, topic: str, message_ts: str)
     
     with device_lock:
         # Check if this is a critical state transition
-        connected_vehicle_states = ["B1", "B2", "C1", "C2", "D1", "D2"]
-        charging_vehicle_states = ["C1", "C2"]
-
-        is_connected_event = vehicle_state in connected_vehicle_states
-        is_charging_event = vehicle_state in charging_vehicle_states
+        is_connected_event = vehicle_state in CONNECTED_VEHICLE_STATES
+        is_charging_event = vehicle_state in CHARGING_VEHICLE_STATES
 
         last_vehicle_state = get_last_known_controller_state(device_uid, config)
 
@@ -371,23 +1011,17 @@ def handle_vehicle_event_logic(vehicle_state: str, topic: str, message_ts: str)
         elif is_session_end:
             set_last_known_state(device_uid, "disconnected", config)
 
-    # Get the starting energy data from the API
-    energy_url = f"http://{REST_API_HOST}:{REST_API_PORT}/api/v1.0/charging-controllers/{device_uid}/data?param_list=energy"
-    energy_response = send_request(url=energy_url, method="GET")
-    
-    if energy_response is None:
-        logging.warning(f"Could not get energy data for {device_uid}, skipping MQTT message processing")
-        return
+    # Get the energy data at the transition
+    if received_at is None:
+        received_at = datetime.fromisoformat(message_ts).timestamp()
 
-    try:
-        energy_data = energy_response.json()
-    except json.JSONDecodeError:
-        logging.error(f"Failed to parse energy data JSON for {device_uid}: {energy_response.text}")
+    energy_data = get_event_energy_data(device_uid, received_at)
+
+    if energy_data is None:
         return
 
-    # Get the charging point ID and name
-    charging_point_url = f"http://{REST_API_HOST}:{REST_API_PORT}/api/v1.0/charging-points"
-    charging_point_id, charging_point_name = get_charging_point(device_uid, charging_point_url)
+    # Get the charging point ID and name from the device registry
+    charging_point_id, charging_point_name = DEVICE_REGISTRY.get_charging_point(device_uid)
 
     # =============================
     # Scenario 1: EV got plugged-in
@@ -418,10 +1052,14 @@ def handle_vehicle_event_logic(vehicle_state: str, topic: str, message_ts: str)
             "iec61851State": vehicle_state
         }
 
-        # Add to SQLite queue for reliable transmission
-        add_to_queue(config, charging_session_id, device_uid, data_to_save, "start")
+        # Add to SQLite queue for reliable transmission, wait for the commit so later events of the session find it
+        add_to_queue(config, charging_session_id, device_uid, data_to_save, "start").result(timeout=DB_WRITE_TIMEOUT_SECONDS)
         logging.info(f"Charging session {charging_session_id} started and queued for device {device_uid}")
 
+        # An RFID scanned just after the plug-in is paired when it arrives, without holding this worker
+        if not rfid_tag:
+            pair_rfid_when_scanned(charging_session_id, device_uid, charging_point_name, message_ts, vehicle_state)
+
     # =========================================================
     # Scenario 2: EV started charging (B -> C state transition)
     elif is_power_flow_start:
@@ -435,22 +1073,7 @@ def handle_vehicle_event_logic(vehicle_state: str, topic: str, message_ts: str)
             # Only try to claim RFID if the session doesn't have one yet
             if not start_payload.get("rfidTag"):
                 # We use the message_ts since the user could have had the EV plugged-in long before using RFID card
-                rfid_tag, rfid_ts = find_and_claim_rfid(config, charging_session_id, message_ts)
-
-                if rfid_tag and rfid_ts:
-                    # Create a payload and save it to the database queue
-                    data_to_save = {
-                        "type": "rfid",
-                        "id": charging_session_id,
-                        "deviceUid": device_uid,
-                        "chargingPointName": charging_point_name,
-                        "rfidTag": rfid_tag,
-                        "rfidTimestamp": rfid_ts,
-                        "iec61851State": vehicle_state
-                    }
-
-                    add_to_queue(config, charging_session_id, device_uid, data_to_save, "rfid")
-                    logging.info(f"RFID {rfid_tag} found for session {charging_session_id} and queued for device {device_uid}")
+                pair_rfid_when_scanned(charging_session_id, device_uid, charging_point_name, message_ts, vehicle_state)
 
 
     # ============================
@@ -484,34 +1107,43 @@ def handle_vehicle_event_logic(vehicle_state: str, topic: str, message_ts: str)
             current_energy = energy_data["energy"]["energy_real_power"]["value"]
             consumption = int(round(max(0, current_energy - start_real_power)))
 
-            # Prefer RFID from current start event
-            final_rfid_tag = start_payload.get("rfidTag")
-            final_rfid_ts = start_payload.get("rfidTimestamp")
-
-            # If we didn't have a tag at the start, check the buffer again
-            # for any tag scanned DURING the session (Plug -> Scan scenario)
-            if not final_rfid_tag:
-                final_rfid_tag, final_rfid_ts = find_and_claim_rfid(config, charging_session_id, start_ts)
-
-            data_to_update = {
-                "type": "end",
-                "id": charging_session_id,
-                "deviceUid": device_uid,
-                "chargingPointName": start_payload.get("chargingPointName"),
-                "rfidTag": final_rfid_tag,
-                "rfidTimestamp": final_rfid_ts,
-                "startRealPowerWh": start_real_power,
-                "endRealPowerWh": energy_data["energy"]["energy_real_power"]["value"],
-                "consumptionWh": consumption,
-                "startTimestamp": start_payload.get("startTimestamp"),
-                "startEnergyTimestamp": start_payload.get("startEnergyTimestamp"),
-                "endTimestamp": message_ts,
-                "endEnergyTimestamp": energy_data["energy"]["timestamp"],
-                "duration": duration,
-                "iec61851State": vehicle_state
-            }
+            # Under the device lock a pairing worker can't claim a tag between the lookup and the queued 'end'
+            with get_device_lock(device_uid):
+                # A scan arriving from now on must not be paired with the ended session
+                cancel_rfid_pairing(config, charging_session_id)
+
+                # Prefer RFID from current start event, then a tag paired during the session
+                final_rfid_tag = start_payload.get("rfidTag")
+                final_rfid_ts = start_payload.get("rfidTimestamp")
+
+                if not final_rfid_tag:
+                    final_rfid_tag, final_rfid_ts = get_claimed_rfid(config, charging_session_id)
+
+                # If we still have no tag, check the buffer again
+                # for any tag scanned DURING the session (Plug -> Scan scenario)
+                if not final_rfid_tag:
+                    final_rfid_tag, final_rfid_ts = find_and_claim_rfid(config, charging_session_id, start_ts)
+
+                data_to_update = {
+                    "type": "end",
+                    "id": charging_session_id,
+                    "deviceUid": device_uid,
+                    "chargingPointName": start_payload.get("chargingPointName"),
+                    "rfidTag": final_rfid_tag,
+                    "rfidTimestamp": final_rfid_ts,
+                    "startRealPowerWh": start_real_power,
+                    "endRealPowerWh": energy_data["energy"]["energy_real_power"]["value"],
+                    "consumptionWh": consumption,
+                    "startTimestamp": start_payload.get("startTimestamp"),
+                    "startEnergyTimestamp": start_payload.get("startEnergyTimestamp"),
+                    "endTimestamp": message_ts,
+                    "endEnergyTimestamp": energy_data["energy"]["timestamp"],
+                    "duration": duration,
+                    "iec61851State": vehicle_state
+                }
+
+                add_to_queue(config, charging_session_id, device_uid, data_to_update, "end").result(timeout=DB_WRITE_TIMEOUT_SECONDS)
 
-            add_to_queue(config, charging_session_id, device_uid, data_to_update, "end")
             logging.info(f"Charging session {charging_session_id} ended and queued for device {device_uid}")
 
         except (ValueError, KeyError) as e:
@@ -538,89 +1170,503 @@ def on_vehicle_status_changed(client: mqtt.Client, userdata: Any, message: mqtt.
         logging.info(f"Message received from topic {message.topic}: {vehicle_state}")
 
         topic = message.topic
-        message_ts = datetime.now().replace(microsecond=0).isoformat()
+
+        # The payloads keep whole seconds, the energy reading is interpolated at the precise arrival time
+        received_at = time.time()
+        message_ts = datetime.fromtimestamp(received_at).replace(microsecond=0).isoformat()
+
+        # Keep the session timers running from the transition, without any I/O,
+        # and let the heartbeat send the new state right away
+        match = re.search(r"/([^/]+)/", topic)
+        if match:
+            SESSION_TIMERS.on_state(match.group(1), vehicle_state)
+            PULSE_CADENCE.trigger(match.group(1))
+            TELEMETRY_PULSE_WAKEUP.set()
         
         # Offload the slow logic to the background
-        event_executor.submit(handle_vehicle_event_logic, vehicle_state, topic, message_ts)
+        event_executor.submit(handle_vehicle_event_logic, vehicle_state, topic, message_ts, received_at)
         
     except Exception as e:
         logging.error(f"Error submitting vehicle event to executor: {e}")
 
 
+def _get_send_fields() -> Dict[str, Any]:
+    """
+    Returns the fields added to every queued payload at the moment of sending.
+
+    Returns:
+        A dictionary with the charger's current time as 'sentTimestamp'.
+    """
+
+    return {"sentTimestamp": datetime.now().replace(microsecond=0).isoformat()}
+
+
+def _send_queue_item(item: Dict[str, Any]) -> bool:
+    """
+    Sends a single queued charging session event to EMM and records the result in the queue.
+
+    Args:
+        item: A queued item as returned by iter_pending_queue_items().
+    Returns:
+        True if the item is done with (sent or discarded), False if it wasn't delivered.
+    """
+
+    charging_session_id = item["charging_session_id"]
+    device_uid = item["device_uid"]
+    session_type = item["type"]
+    attempts = item["attempts"]
+
+    logging.info(f"Attempting to send queued item (ID: {charging_session_id}, Type: {session_type}, Attempts: {attempts}) for device {device_uid}.")
+
+    target_url = f"{EMM_HOST}{EMM_SESSION_ENDPOINT}"
+
+    # The payload was compressed when queued, only the per-send fields are compressed here
+    stream = GzipStreamBuilder(select_compression_level(len(item["payload_json"])))
+    stream.add_precompressed(item["payload_deflate"], item["payload_json"])
+    stream.add_text(build_payload_suffix(item["payload_json"], _get_send_fields()))
+    compressed_data = stream.finish()
+
+    # Send to EMM API
+    emm_response = send_request(
+        url=target_url,
+        method="POST",
+        headers=EMM_HEADERS,
+        data=compressed_data,
+        circuit_breaker=EMM_CIRCUIT_BREAKER,
+    )
+
+    # Nothing was sent, the item keeps its attempts and the lane releases its lease
+    if emm_response is CIRCUIT_OPEN:
+        logging.info(f"EMM circuit is open, queued item (ID: {charging_session_id}, Type: {session_type}) is left for a later pass.")
+        return False
+
+    return _record_queue_item_result(item, emm_response.status_code if emm_response is not None else None)
+
+
+def _record_queue_item_result(item: Dict[str, Any], status_code: Optional[int]) -> bool:
+    """
+    Marks a queued item as sent, failed or unrecoverable based on the HTTP status EMM returned for it.
+
+    Args:
+        item: A queued item as returned by iter_pending_queue_items().
+        status_code: The HTTP status code for this item, None if the request didn't get a response.
+    Returns:
+        True if the item is done with (sent or discarded), False if it will be retried.
+    """
+
+    queue_db_id = item["queue_db_id"]
+    charging_session_id = item["charging_session_id"]
+    device_uid = item["device_uid"]
+    session_type = item["type"]
+
+    if status_code is not None and status_code < 400:
+        latency = _record_send_latency(item)
+        logging.info(f"Successfully sent queued item (ID: {charging_session_id}, Type: {session_type}) for device {device_uid} to EMM (queued for {latency:.3f}s).")
+        update_queue_item_status(config, queue_db_id, "sent").result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+
+        return True
+
+    if status_code == 404:
+        # If we got 404 response from EMM we stop resending the item
+        logging.error(f"Server returned 404 for queued item (ID: {charging_session_id}, Type: {session_type}) for device {device_uid}. Discarding this item to unblock queue.")
+        update_queue_item_status(config, queue_db_id, "failed_unrecoverable").result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+
+        return True
+
+    # For regular network errors or 500 errors keep trying
+    logging.warning(f"Failed to send queued item (ID: {charging_session_id}, Type: {session_type}) for device {device_uid} to EMM.")
+    update_queue_item_status(config, queue_db_id, "failed", increment_attempts=True).result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+
+    return False
+
+
+def _build_queue_batches(pending_items: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Groups the pending queue items into batches limited by QUEUE_BATCH_SIZE items
+    and QUEUE_BATCH_MAX_BYTES of uncompressed JSON. A batch always holds at least one item,
+    so a single oversized payload is still sent on its own. A batch never holds two events of
+    the same session, a later event goes into a later batch, which isn't sent if its predecessor failed.
+
+    Args:
+        pending_items: Queued items as returned by iter_pending_queue_items().
+    Returns:
+        An iterator of batches, each batch being a list of queued items.
+    """
+
+    current_batch: List[Dict[str, Any]] = []
+    current_sessions = set()
+    current_bytes = 0
+
+    for item in pending_items:
+        item_bytes = len(item["payload_json"])
+
+        if current_batch and (
+            len(current_batch) >= QUEUE_BATCH_SIZE
+            or current_bytes + item_bytes > QUEUE_BATCH_MAX_BYTES
+            or item["charging_session_id"] in current_sessions
+        ):
+            yield current_batch
+            current_batch = []
+            current_sessions = set()
+            current_bytes = 0
+
+        current_batch.append(item)
+        current_sessions.add(item["charging_session_id"])
+        current_bytes += item_bytes
+
+    if current_batch:
+        yield current_batch
+
+
+def _send_queue_batch(batch: List[Dict[str, Any]]) -> Optional[bool]:
+    """
+    Sends several queued charging session events to EMM in one compressed request.
+    EMM answers with a result for every item, each queue row is then marked individually.
+
+    Args:
+        batch: Queued items as returned by iter_pending_queue_items().
+    Returns:
+        True if every item is done with, False if any item wasn't delivered,
+        None if EMM doesn't support the batch endpoint and the items should be sent one by one.
+    """
+
+    send_fields = _get_send_fields()
+
+    logging.info(f"Attempting to send a batch of {len(batch)} queued items to EMM.")
+
+    # Splice the pre-compressed payloads into {"type": "batch", "items": [...]}
+    stream = GzipStreamBuilder(select_compression_level(sum(len(item["payload_json"]) for item in batch)))
+    stream.add_text('{"type": "batch", "items": [')
+
+    for index, item in enumerate(batch):
+        stream.add_precompressed(item["payload_deflate"], item["payload_json"])
+        stream.add_text(build_payload_suffix(item["payload_json"], send_fields) + (", " if index < len(batch) - 1 else ""))
+
+    stream.add_text("]}")
+    compressed_data = stream.finish()
+
+    emm_response = send_request(
+        url=f"{EMM_HOST}{EMM_SESSION_BATCH_ENDPOINT}",
+        method="POST",
+        headers=EMM_HEADERS,
+        data=compressed_data,
+        circuit_breaker=EMM_CIRCUIT_BREAKER,
+    )
+
+    # Nothing was sent, the items keep their attempts and the lane releases their lease
+    if emm_response is CIRCUIT_OPEN:
+        logging.info(f"EMM circuit is open, a batch of {len(batch)} queued items is left for a later pass.")
+        return False
+
+    # The batch endpoint isn't available on this EMM instance, let the caller fall back to single items
+    if emm_response is not None and emm_response.status_code in (404, 405):
+        logging.warning(f"EMM doesn't support batch uploads (HTTP {emm_response.status_code}), falling back to sending queued items one by one.")
+        return None
+
+    # The whole request failed, none of the items got through
+    if emm_response is None or emm_response.status_code >= 400:
+        for item in batch:
+            _record_queue_item_result(item, None)
+
+        return False
+
+    # Map the per-item results by the session ID and event type
+    results: Dict[Tuple[str, str], int] = {}
+
+    try:
+        for result in emm_response.json().get("results", []):
+            results[(result["id"], result["type"])] = int(result["status"])
+
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logging.error(f"Failed to parse per-item results from EMM batch response: {e}")
+
+    delivered = True
+
+    for item in batch:
+        # Items missing from the response are treated as failed and retried later
+        delivered = _record_queue_item_result(item, results.get((item["charging_session_id"], item["type"]))) and delivered
+
+    return delivered
+
+
+def _record_send_latency(item: Dict[str, Any]) -> float:
+    """
+    Records how long a successfully sent item waited in the queue, from being queued to being accepted by EMM.
+
+    Args:
+        item: A queued item as returned by iter_pending_queue_items().
+    Returns:
+        The enqueue-to-send latency in seconds.
+    """
+
+    latency = max(0.0, (datetime.now() - datetime.fromisoformat(item["created_at"])).total_seconds())
+
+    with QUEUE_LATENCY_LOCK:
+        QUEUE_LATENCY_STATS["count"] += 1
+        QUEUE_LATENCY_STATS["total_seconds"] += latency
+        QUEUE_LATENCY_STATS["max_seconds"] = max(QUEUE_LATENCY_STATS["max_seconds"], latency)
+        QUEUE_LATENCY_STATS["last_seconds"] = latency
+
+    return latency
+
+
+def _send_lane_items(items: List[Dict[str, Any]]) -> None:
+    """
+    Sends the items picked up by a sender lane, either in batch requests or one by one.
+    Items whose earlier session events weren't delivered yet are deferred instead of being sent,
+    so after a failure the lane skips only the later events of that session and goes on with
+    the other sessions. If EMM becomes unreachable during the pass, the leases of the items
+    left over are released right away.
+
+    Args:
+        items: Leased queue items of one lane, in queue order.
+    Returns:
+        None
+    """
+
+    global queue_batch_enabled
+
+    ready_items: List[Dict[str, Any]] = []
+
+    # Sessions with an undelivered event in an earlier batch of this pass
+    failed_sessions: Set[str] = set()
+
+    def release_leftover_items() -> None:
+        # Only the items still leased are released, the ones already sent, failed or deferred keep their state
+        release_queue_items(config, [item["queue_db_id"] for item in items]).result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+
+    for item in items:
+        # EMM went down during this pass, the remaining items are picked up again once the breaker lets requests through
+        if not EMM_CIRCUIT_BREAKER.is_closed():
+            release_leftover_items()
+            return
+
+        # Predecessors sent by this lane before the item, in an earlier batch, keep the session's order
+        ready_ids = tuple(ready_item["queue_db_id"] for ready_item in ready_items) if queue_batch_enabled else ()
+
+        if defer_if_predecessor_unsent(config, item["queue_db_id"], item["charging_session_id"], item["type"], ready_ids):
+            continue
+
+        if queue_batch_enabled:
+            ready_items.append(item)
+            continue
+
+        # A failed item stays unsent, its session's later events in this lane are deferred behind it
+        _send_queue_item(item)
+
+        # Add a small delay between sending items to avoid hammering the API
+        if item is not items[-1] and STOP_EVENT.wait(timeout=1):
+            return
+
+    for batch in _build_queue_batches(ready_items):
+        if not EMM_CIRCUIT_BREAKER.is_closed():
+            release_leftover_items()
+            return
+
+        # The predecessor was counted on to go out in an earlier batch of this pass, check whether it did
+        batch = [
+            item for item in batch
+            if item["charging_session_id"] not in failed_sessions
+            or not defer_if_predecessor_unsent(config, item["queue_db_id"], item["charging_session_id"], item["type"])
+        ]
+
+        if not batch:
+            continue
+
+        delivered = _send_queue_batch(batch) if queue_batch_enabled else None
+
+        if delivered is not None:
+            if not delivered:
+                failed_sessions.update(item["charging_session_id"] for item in batch)
+
+            continue
+
+        # EMM doesn't know the batch endpoint, send the rest of the items one by one from now on
+        queue_batch_enabled = False
+
+        for item in batch:
+            if not _send_queue_item(item):
+                failed_sessions.add(item["charging_session_id"])
+
+            if STOP_EVENT.wait(timeout=1):
+                return
+
+
+def _queue_lane_worker(lane_queue: queue.Queue) -> None:
+    """
+    Worker function of one sender lane. Sends the items assigned to the lane by the dispatcher
+    strictly in order, so the events of one charging session never overtake each other,
+    while other lanes deliver other sessions concurrently.
+
+    Args:
+        lane_queue: The lane's queue of leased items, None stops the lane.
+    Returns:
+        None
+    """
+
+    while True:
+        item = lane_queue.get()
+
+        if item is None:
+            lane_queue.task_done()
+            break
+
+        items = [item]
+        stop_lane = False
+
+        # In batch mode pick up the other items already waiting in this lane
+        while queue_batch_enabled and len(items) < QUEUE_BATCH_SIZE:
+            try:
+                next_item = lane_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if next_item is None:
+                stop_lane = True
+                break
+
+            items.append(next_item)
+
+        try:
+            # Items left over at shutdown keep their lease and are sent again after it expires
+            if not STOP_EVENT.is_set():
+                _send_lane_items(items)
+
+        except Exception as e:
+            logging.error(f"Error in session sender lane: {e}", exc_info=True)
+
+        finally:
+            for _ in range(len(items) + stop_lane):
+                lane_queue.task_done()
+
+        if stop_lane:
+            break
+
+        # Add a small delay between requests to avoid hammering the API
+        STOP_EVENT.wait(timeout=1)
+
+
 def send_queued_data_worker():
     base_sleep = int(config["AppSettings"].get("QueueCheckIntervalSeconds", 30))
     max_sleep = int(config["AppSettings"].get("MaxQueueCheckIntervalSeconds", 300))
     current_sleep = base_sleep
 
-    while not STOP_EVENT.wait(timeout=current_sleep):
-        try:
-            pending_items = get_pending_queue_items(config)
+    # Every lane sends its items sequentially, separate lanes run concurrently
+    lanes: List[queue.Queue] = [queue.Queue() for _ in range(QUEUE_SENDER_LANES)]
 
-            if not pending_items:
-                # Queue is empty, sleep longer next time
-                current_sleep = min(current_sleep * 2, max_sleep)
-                continue
+    for index, lane in enumerate(lanes):
+        threading.Thread(target=_queue_lane_worker, args=(lane,), name=f"Queue-Lane-{index}", daemon=True).start()
 
-            # If we get here, work was found. Reset the sleep interval for the next idle cycle.
-            current_sleep = base_sleep
+    while not STOP_EVENT.is_set():
+        # Clear the signal before draining, items queued during the drain set it again
+        QUEUE_WAKEUP_EVENT.clear()
+        lanes_full = False
+
+        # Don't lease any items while EMM is unreachable, the breaker probes it once the reset timeout passes
+        if not EMM_CIRCUIT_BREAKER.allow_request():
+            STOP_EVENT.wait(timeout=max(1, EMM_CIRCUIT_BREAKER.seconds_until_probe()))
+            continue
+
+        try:
+            handled_items = 0
 
-            for item in pending_items:
+            # The queue is read lazily page by page, rows queued during the drain are picked up too
+            for page in iter_pending_queue_pages(config):
                 if STOP_EVENT.is_set():
                     break
 
-                queue_db_id = item["queue_db_id"]
-                charging_session_id = item["charging_session_id"]
-                device_uid = item["device_uid"]
-                payload: Dict = item["payload"]
-                session_type = item["type"]
-                attempts = item["attempts"]
+                assigned: List[Tuple[queue.Queue, Dict[str, Any]]] = []
+                lane_sizes = {id(lane): lane.qsize() for lane in lanes}
 
-                # Add the charger's current time to the payload at the moment of sending
-                item["payload"]["sentTimestamp"] = datetime.now().replace(microsecond=0).isoformat()
+                for item in page:
+                    # All the events of one session go through the same lane, which keeps them in order
+                    lane = lanes[zlib.crc32(item["charging_session_id"].encode("utf-8")) % len(lanes)]
 
-                logging.info(f"Attempting to send queued item (ID: {charging_session_id}, Type: {session_type}, Attempts: {attempts}) for device {device_uid}.")
+                    # Leave the item for the next pass if its lane already has enough work
+                    if lane_sizes[id(lane)] >= QUEUE_LANE_DEPTH:
+                        lanes_full = True
+                        continue
 
-                target_url = f"{EMM_HOST}{EMM_SESSION_ENDPOINT}"
+                    lane_sizes[id(lane)] += 1
+                    assigned.append((lane, item))
 
-                payload_json = json.dumps(payload)
-                compressed_data = gzip.compress(payload_json.encode("utf-8"))
+                # The lease makes sure no other pass picks the items up while they're being sent,
+                # the whole page is leased in one write
+                claimed_ids = claim_queue_items(config, [item["queue_db_id"] for _, item in assigned], QUEUE_LEASE_SECONDS)
 
-                # Send to EMM API
-                emm_response = send_request(
-                    url=target_url,
-                    method="POST",
-                    headers=EMM_HEADERS,
-                    data=compressed_data,
-                )
+                for lane, item in assigned:
+                    if item["queue_db_id"] in claimed_ids:
+                        lane.put(item)
+                        handled_items += 1
 
-                if emm_response is not None and emm_response.status_code < 400:
-                    logging.info(f"Successfully sent queued item (ID: {charging_session_id}, Type: {session_type}) for device {device_uid} to EMM.")
-                    update_queue_item_status(config, queue_db_id, "sent")
+                if all(lane_sizes[id(lane)] >= QUEUE_LANE_DEPTH for lane in lanes):
+                    break
 
-                elif emm_response is not None and emm_response.status_code == 404:
-                    # If we got 404 response from EMM we stop resending the item
-                    logging.error(f"Server returned 404 for queued item (ID: {charging_session_id}, Type: {session_type}) for device {device_uid}. Discarding this item to unblock queue.")
-                    update_queue_item_status(config, queue_db_id, "failed_unrecoverable")
+            # Let the lanes finish their work before the next pass
+            for lane in lanes:
+                lane.join()
 
-                else:
-                    # For regular network errors or 500 errors keep trying
-                    logging.warning(f"Failed to send queued item (ID: {charging_session_id}, Type: {session_type}) for device {device_uid} to EMM.")
-                    update_queue_item_status(config, queue_db_id, "failed", increment_attempts=True)
+            if handled_items == 0:
+                # Queue is empty, the safety net interval grows up to the maximum
+                current_sleep = min(current_sleep * 2, max_sleep)
+            else:
+                # If we get here, work was found. Reset the sleep interval for the next idle cycle.
+                current_sleep = base_sleep
+
+                with QUEUE_LATENCY_LOCK:
+                    if QUEUE_LATENCY_STATS["count"]:
+                        logging.info(
+                            f"Queue drained ({handled_items} items), enqueue-to-send latency: "
+                            f"avg {QUEUE_LATENCY_STATS['total_seconds'] / QUEUE_LATENCY_STATS['count']:.3f}s, "
+                            f"max {QUEUE_LATENCY_STATS['max_seconds']:.3f}s, last {QUEUE_LATENCY_STATS['last_seconds']:.3f}s"
+                        )
+
+            # Items skipped because of full lanes are picked up by another pass right away
+            if lanes_full:
+                continue
 
-                # Add a small delay between sending items to avoid hammering the API
-                if STOP_EVENT.wait(timeout=1):
-                    break
+            # Don't oversleep a failed item that is scheduled for a retry
+            seconds_until_due = get_seconds_until_next_attempt(config)
 
-            # After processing a batch, wait for the base interval before checking again.
-            if STOP_EVENT.wait(timeout=base_sleep):
-                break
+            if seconds_until_due is not None:
+                current_sleep = max(1, min(current_sleep, int(seconds_until_due) + 1))
 
         except Exception as e:
             logging.error(f"Error in session sender thread: {e}", exc_info=True)
 
+        # Sleep until add_to_queue() signals a new item, the timeout is only a safety net for scheduled retries
+        QUEUE_WAKEUP_EVENT.wait(timeout=current_sleep)
+
+    # Stop the lanes
+    for lane in lanes:
+        lane.put(None)
+
     logging.info("Sender thread stopped")
 
 
+def queue_retention_worker():
+    """
+    Worker function executed in a background thread that periodically archives
+    old rows from the queue database, prunes the energy time series, compacts
+    the database file and logs the HTTP connection reuse and energy message stats.
+
+    Returns:
+        None
+    """
+
+    interval = int(config["AppSettings"].get("RetentionIntervalSeconds", 3600))
+
+    while not STOP_EVENT.wait(timeout=interval):
+        try:
+            prune_energy_timeseries(config)
+            run_queue_retention(config)
+            log_http_stats()
+            log_energy_message_stats()
+
+        except Exception as e:
+            logging.error(f"Error in queue retention thread: {e}", exc_info=True)
+
+
 #########################################################
 ############# CHARGING SESSION LOGIC CHANGE #############
 #########################################################
@@ -705,6 +1751,12 @@ def on_connect(client: mqtt.Client, userdata: Any, flags, rc: int):
 
         client.subscribe([(TOPIC_IEC_61851_STATE, 0), (TOPIC_ENERGY, 0), (TOPIC_RFID, 0)])
 
+        # State transitions may have been missed while disconnected from the broker
+        SESSION_TIMERS.mark_for_resync()
+
+        # The controllers may have been reconfigured or restarted in the meantime
+        DEVICE_REGISTRY.invalidate()
+
         logging.info(f"Subscribed to MQTT topics")
 
     else:
@@ -715,6 +1767,8 @@ if __name__ == "__main__":
     print(f"[{ts()}] Script started")
 
     initialize_queue_db(config)
+    load_device_states(config)
+    load_rfid_scans(config)
     initialize_telemetry_metadata()
 
     # MQTT client
@@ -730,6 +1784,8 @@ if __name__ == "__main__":
     # Background daemons
     threading.Thread(target=send_queued_data_worker, daemon=True).start()
     threading.Thread(target=telemetry_heartbeat_worker, daemon=True).start()
+    threading.Thread(target=telemetry_backlog_worker, daemon=True).start()
+    threading.Thread(target=queue_retention_worker, daemon=True).start()
 
     try:
         while True:
@@ -739,18 +1795,38 @@ if __name__ == "__main__":
         logging.info("Script terminated by user")
     
         STOP_EVENT.set()
+        QUEUE_WAKEUP_EVENT.set()
+        TELEMETRY_BACKLOG_WAKEUP.set()
+        TELEMETRY_PULSE_WAKEUP.set()
         event_executor.shutdown(wait=True)
         
         mqtt_client.disconnect()
         mqtt_client.loop_stop()
     
         logging.info("MQTT client disconnected and loop stopped")
+
+        stop_db_writer()
+        close_db_connections()
+
+        log_http_stats()
+        log_energy_message_stats()
+        close_http_sessions()
     
     except Exception as e:
         logging.critical(f"An unhandled error occurred in the main loop: {e}", exc_info=True)
         
         STOP_EVENT.set()
+        QUEUE_WAKEUP_EVENT.set()
+        TELEMETRY_BACKLOG_WAKEUP.set()
+        TELEMETRY_PULSE_WAKEUP.set()
         event_executor.shutdown(wait=True)
     
         mqtt_client.disconnect()
-        mqtt_client.loop_stop()
\ No newline at end of file
+        mqtt_client.loop_stop()
+
+        stop_db_writer()
+        close_db_connections()
+
+        log_http_stats()
+        log_energy_message_stats()
+        close_http_sessions()
\ No newline at end of file
@@ -26,10 +26,11 @@ config = (
 ############# SET LOGGING #############
 #######################################
 
-from utils import set_logging
+from utils import set_logging, configure_http_pools
 import logging
 
 set_logging(config)
+configure_http_pools(config)
 
 ###########################################
 ############# END SET LOGGING #############
@@ -0,0 +1,26 @@
+import os
+import sys
+import configparser
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+
+
+@pytest.fixture
+def config(tmp_path):
+    """A minimal agent configuration whose database lives in a temporary folder."""
+
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read_dict({
+        "AppSettings": {"FileFolder": str(tmp_path) + os.sep},
+        "EmmSettings": {"Host": "http://127.0.0.1:9", "ApiKey": "test"},
+    })
+
+    yield config
+
+    utils.stop_db_writer()
+    utils.close_db_connections()
@@ -0,0 +1,129 @@
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import utils
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    status = 200
+
+    def do_POST(self):
+        self.send_response(self.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(("127.0.0.1", 0), _StatusHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{httpd.server_port}"
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _breaker(**kwargs):
+    return utils.CircuitBreaker("test", "http://127.0.0.1:9/", failure_threshold=2, reset_timeout=0.05, **kwargs)
+
+
+def _wait_for_probe(breaker):
+    deadline = time.monotonic() + 5
+
+    while breaker.state == breaker.HALF_OPEN and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _open(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.state == breaker.OPEN
+
+
+def test_skipped_request_returns_the_circuit_open_marker():
+    breaker = _breaker()
+    _open(breaker)
+
+    assert utils.send_request("http://127.0.0.1:9/", "POST", circuit_breaker=breaker) is utils.CIRCUIT_OPEN
+
+
+def test_probe_runs_in_the_background(monkeypatch):
+    breaker = _breaker()
+    _open(breaker)
+    release = threading.Event()
+
+    def slow_send_request(*args, **kwargs):
+        release.wait(5)
+        return None
+
+    monkeypatch.setattr(utils, "send_request", slow_send_request)
+    time.sleep(0.06)
+
+    started = time.monotonic()
+    assert not breaker.allow_request()
+    assert time.monotonic() - started < 0.5
+    assert breaker.state == breaker.HALF_OPEN
+
+    release.set()
+    _wait_for_probe(breaker)
+
+    assert breaker.state == breaker.OPEN
+
+
+def test_probe_error_doesnt_leave_the_circuit_half_open(monkeypatch):
+    breaker = _breaker()
+    _open(breaker)
+
+    def broken_send_request(*args, **kwargs):
+        raise ValueError("unexpected")
+
+    monkeypatch.setattr(utils, "send_request", broken_send_request)
+    time.sleep(0.06)
+
+    breaker.allow_request()
+    _wait_for_probe(breaker)
+
+    assert breaker.state == breaker.OPEN
+
+
+def test_successful_probe_closes_the_circuit(monkeypatch):
+    breaker = _breaker()
+    _open(breaker)
+
+    monkeypatch.setattr(utils, "send_request", lambda *args, **kwargs: type("Answer", (), {"status_code": 405})())
+    time.sleep(0.06)
+
+    breaker.allow_request()
+    _wait_for_probe(breaker)
+
+    assert breaker.is_closed()
+
+
+def test_server_error_for_one_payload_isnt_a_host_failure(server):
+    breaker = _breaker()
+    _StatusHandler.status = 500
+
+    for _ in range(3):
+        assert utils.send_request(f"{server}/", "POST", circuit_breaker=breaker).status_code == 500
+
+    assert breaker.is_closed()
+
+
+def test_unavailable_host_opens_the_circuit(server):
+    breaker = _breaker()
+    _StatusHandler.status = 503
+
+    for _ in range(2):
+        utils.send_request(f"{server}/", "POST", circuit_breaker=breaker)
+
+    assert breaker.state == breaker.OPEN
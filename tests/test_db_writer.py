@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+import utils
+
+
+def _new_writer(config):
+    writer = utils.DatabaseWriter(config, max_group_size=10, max_group_delay=0.01)
+    writer.start()
+
+    return writer
+
+
+def test_commands_are_committed(config):
+    utils.initialize_queue_db(config)
+    writer = _new_writer(config)
+
+    future = writer.submit(lambda cursor: cursor.execute("SELECT 1").fetchone()[0])
+
+    assert future.result(timeout=5) == 1
+    writer.stop(5)
+
+
+def test_failing_command_does_not_affect_its_group(config):
+    writer = _new_writer(config)
+
+    def create(cursor):
+        cursor.execute("CREATE TABLE IF NOT EXISTS t (x INTEGER)")
+
+    def broken(cursor):
+        cursor.execute("INSERT INTO missing_table VALUES (1)")
+
+    writer.submit(create).result(timeout=5)
+    failed = writer.submit(broken)
+    succeeded = writer.submit(lambda cursor: cursor.execute("INSERT INTO t VALUES (1)").rowcount)
+
+    with pytest.raises(Exception):
+        failed.result(timeout=5)
+
+    assert succeeded.result(timeout=5) == 1
+    writer.stop(5)
+
+
+def test_connection_failure_fails_the_group_and_keeps_running(config, monkeypatch):
+    writer = _new_writer(config)
+    real_get_db_connection = utils.get_db_connection
+    calls = []
+
+    def flaky_get_db_connection(cfg):
+        calls.append(1)
+
+        if len(calls) == 1:
+            raise KeyError("FileFolder")
+
+        return real_get_db_connection(cfg)
+
+    monkeypatch.setattr(utils, "get_db_connection", flaky_get_db_connection)
+
+    with pytest.raises(KeyError):
+        writer.submit(lambda cursor: 1).result(timeout=5)
+
+    # The writer survived the failed group and runs the next one
+    assert writer.submit(lambda cursor: 2).result(timeout=5) == 2
+    assert writer.is_running
+    writer.stop(5)
+
+
+def test_rollback_failure_fails_the_group(config, monkeypatch):
+    writer = _new_writer(config)
+
+    def broken_commit_group(group):
+        raise RuntimeError("ROLLBACK TO failed")
+
+    monkeypatch.setattr(writer, "_commit_group", broken_commit_group)
+
+    with pytest.raises(RuntimeError):
+        writer.submit(lambda cursor: 1).result(timeout=5)
+
+    assert writer.is_running
+    writer.stop(5)
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_writer_fails_queued_commands_and_rejects_new_ones(config, monkeypatch):
+    writer = utils.DatabaseWriter(config)
+    release = threading.Event()
+
+    def dying_process_queue():
+        release.wait(5)
+        raise SystemExit
+
+    monkeypatch.setattr(writer, "_process_queue", dying_process_queue)
+    writer.start()
+
+    queued = writer.submit(lambda cursor: 1)
+    release.set()
+
+    with pytest.raises(RuntimeError):
+        queued.result(timeout=5)
+
+    writer._thread.join(5)
+
+    assert not writer.is_running
+
+    with pytest.raises(RuntimeError):
+        writer.submit(lambda cursor: 1)
+
+
+def test_submit_db_write_replaces_a_dead_writer(config):
+    utils.submit_db_write(config, lambda cursor: 1).result(timeout=5)
+    utils.stop_db_writer()
+
+    assert utils.submit_db_write(config, lambda cursor: 3).result(timeout=5) == 3
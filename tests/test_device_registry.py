@@ -0,0 +1,150 @@
+import copy
+
+import pytest
+
+import utils
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, document):
+        self._document = document
+
+    def json(self):
+        # Every response is parsed anew, like the real one
+        return copy.deepcopy(self._document)
+
+
+class FakeRestApi:
+    """Serves the controllers and charging points documents and counts the requests."""
+
+    def __init__(self):
+        self.available = True
+        self.requests = 0
+        self.controllers = {"dev1": {"device_uid": "dev1", "firmware": "1.0"}}
+        self.charging_points = {"1": {"id": "1", "charging_point_name": "CP 1", "charging_controller_device_uid": "dev1"}}
+
+    def send_request(self, url, method, **kwargs):
+        self.requests += 1
+
+        if not self.available:
+            return None
+
+        if url.endswith("/charging-controllers"):
+            return FakeResponse(self.controllers)
+
+        return FakeResponse({"charging_points": self.charging_points})
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def rest_api(monkeypatch):
+    api = FakeRestApi()
+    monkeypatch.setattr(utils, "send_request", api.send_request)
+
+    return api
+
+
+@pytest.fixture
+def registry(config, clock, rest_api):
+    config["RestApi"] = {"Host": "127.0.0.1", "Port": "5000"}
+    config["AppSettings"]["DeviceRegistryTtlSeconds"] = "300"
+
+    registry = utils.DeviceRegistry(config, clock=clock)
+    registry.refresh()
+
+    return registry
+
+
+def _heartbeat_tick(registry):
+    # The agent's heartbeat refreshes a due registry and resends the metadata if it changed
+    return registry.refresh_due() and registry.refresh()
+
+
+def test_lookups_are_served_from_memory(registry, rest_api):
+    requests = rest_api.requests
+
+    assert registry.get_controller("dev1")["firmware"] == "1.0"
+    assert registry.get_charging_point("dev1") == ("1", "CP 1")
+    assert rest_api.requests == requests
+
+
+def test_registry_is_refreshed_when_the_ttl_expires(registry, clock):
+    clock.advance(299)
+    assert not registry.refresh_due()
+
+    clock.advance(1)
+    assert registry.refresh_due()
+
+    registry.refresh()
+    assert not registry.refresh_due()
+
+
+def test_reconnect_invalidates_the_registry(registry, clock):
+    # The rate limit applies to invalidations too
+    registry.invalidate()
+    assert not registry.refresh_due()
+
+    clock.advance(utils.DEVICE_REGISTRY_MIN_REFRESH_SECONDS)
+    assert registry.refresh_due()
+
+
+def test_unknown_controller_refreshes_at_most_every_30_seconds(registry, rest_api, clock):
+    clock.advance(utils.DEVICE_REGISTRY_MIN_REFRESH_SECONDS)
+    requests = rest_api.requests
+
+    # The first miss refreshes right away, the following ones within the rate limit don't
+    assert registry.get_controller("dev2") is None
+    assert registry.get_charging_point("dev2") == (None, None)
+    assert rest_api.requests == requests + 2
+
+    # A controller added in the meantime is found once the rate limit has passed
+    rest_api.controllers["dev2"] = {"device_uid": "dev2", "firmware": "1.0"}
+    clock.advance(utils.DEVICE_REGISTRY_MIN_REFRESH_SECONDS - 1)
+    assert registry.get_controller("dev2") is None
+
+    clock.advance(1)
+    assert registry.get_controller("dev2") == {"device_uid": "dev2", "firmware": "1.0"}
+    assert rest_api.requests == requests + 4
+
+
+def test_failed_refresh_keeps_the_cached_devices(registry, rest_api, clock):
+    rest_api.available = False
+    clock.advance(300)
+
+    assert not registry.refresh()
+    assert registry.get_controller("dev1")["firmware"] == "1.0"
+
+    # Retried after the rate limit, not on every heartbeat tick
+    assert not registry.refresh_due()
+    clock.advance(utils.DEVICE_REGISTRY_MIN_REFRESH_SECONDS)
+    assert registry.refresh_due()
+
+
+def test_changed_configuration_triggers_a_metadata_resend(registry, rest_api, clock):
+    clock.advance(300)
+    assert not _heartbeat_tick(registry)
+
+    rest_api.charging_points["1"]["charging_point_name"] = "CP 1 renamed"
+    clock.advance(300)
+    assert _heartbeat_tick(registry)
+    assert registry.get_charging_point("dev1") == ("1", "CP 1 renamed")
+
+    rest_api.controllers["dev1"]["firmware"] = "1.1"
+    registry.invalidate()
+    clock.advance(utils.DEVICE_REGISTRY_MIN_REFRESH_SECONDS)
+    assert _heartbeat_tick(registry)
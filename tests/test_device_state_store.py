@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+import utils
+
+
+@pytest.fixture
+def store_config(config, monkeypatch):
+    utils.initialize_queue_db(config)
+
+    # Every test starts with a fresh process-wide store
+    monkeypatch.setattr(utils, "_DEVICE_STATE_STORE", None)
+
+    return config
+
+
+def _persisted_states(config):
+    with utils.get_db_connection(config) as conn:
+        return {row["device_uid"]: row["status"] for row in conn.execute("SELECT device_uid, status FROM device_status")}
+
+
+def test_alternating_transitions_persist_the_last_state(store_config):
+    states = ("connected", "disconnected")
+
+    for index in range(100):
+        utils.set_last_known_state("dev1", states[index % 2], store_config)
+
+        # Reads are served from memory right away, before the write is committed
+        assert utils.get_last_known_controller_state("dev1", store_config) == states[index % 2]
+
+    utils.stop_db_writer()
+
+    assert _persisted_states(store_config) == {"dev1": "disconnected"}
+
+
+def test_concurrent_transitions_keep_memory_and_database_in_step(store_config):
+    store = utils.get_device_state_store(store_config)
+
+    def toggle(device_uid, count):
+        for index in range(count):
+            store.set(device_uid, "connected" if index % 2 == 0 else "disconnected")
+
+    threads = [threading.Thread(target=toggle, args=("dev1", 100 + offset)) for offset in range(4)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    utils.stop_db_writer()
+
+    # Whichever thread wrote last, the database ends up with the state the memory holds
+    assert _persisted_states(store_config) == {"dev1": store.get("dev1")}
+
+
+def test_states_are_reloaded_after_a_restart(store_config, monkeypatch):
+    utils.set_last_known_state("dev1", "connected", store_config)
+    utils.set_last_known_state("dev2", "connected", store_config)
+    utils.set_last_known_state("dev2", "disconnected", store_config)
+
+    utils.stop_db_writer()
+
+    # A new process starts with an empty store and loads it from the table
+    monkeypatch.setattr(utils, "_DEVICE_STATE_STORE", None)
+    utils.load_device_states(store_config)
+
+    assert utils.get_last_known_controller_state("dev1", store_config) == "connected"
+    assert utils.get_last_known_controller_state("dev2", store_config) == "disconnected"
+    assert utils.get_last_known_controller_state("dev3", store_config) is None
+
+
+def test_unknown_states_are_ignored(store_config):
+    utils.set_last_known_state("dev1", "charging", store_config)
+    utils.stop_db_writer()
+
+    assert utils.get_last_known_controller_state("dev1", store_config) is None
+    assert _persisted_states(store_config) == {}
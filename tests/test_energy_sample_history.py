@@ -0,0 +1,35 @@
+import json
+
+import utils
+
+
+def _message(counter, timestamp=1700000000):
+    return json.dumps({"timestamp": timestamp, "energy_real_power": {"value": counter, "unit": "Wh"}}).encode("utf-8")
+
+
+def test_integer_counter_stays_an_integer():
+    history = utils.EnergySampleHistory()
+    history.add("dev", _message(1000, 1700000000), received_at=100.0)
+    history.add("dev", _message(1003, 1700000001), received_at=101.0)
+
+    energy = history.at("dev", 100.25)
+
+    assert energy["energy_real_power"]["value"] == 1001
+    assert isinstance(energy["energy_real_power"]["value"], int)
+
+
+def test_decimal_counter_keeps_the_meter_precision():
+    history = utils.EnergySampleHistory()
+    history.add("dev", _message(1000.5), received_at=100.0)
+    history.add("dev", _message(1001.5), received_at=101.0)
+
+    assert history.at("dev", 100.333)["energy_real_power"]["value"] == 1000.8
+
+
+def test_sub_second_times_are_interpolated():
+    history = utils.EnergySampleHistory()
+    history.add("dev", _message(1000), received_at=100.0)
+    history.add("dev", _message(2000), received_at=101.0)
+
+    assert history.at("dev", 100.1)["energy_real_power"]["value"] == 1100
+    assert history.at("dev", 100.9)["energy_real_power"]["value"] == 1900
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+import utils
+
+
+@pytest.fixture
+def timeseries_config(config):
+    utils.initialize_queue_db(config)
+
+    return config
+
+
+def _table_names(db_path):
+    conn = sqlite3.connect(db_path)
+
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+
+
+def test_time_series_has_its_own_database_file(timeseries_config):
+    folder = timeseries_config["AppSettings"]["FileFolder"]
+
+    assert "timeseries_sample" not in _table_names(os.path.join(folder, utils.QUEUE_DB_NAME))
+    assert "timeseries_sample" in _table_names(os.path.join(folder, utils.TIMESERIES_DB_NAME))
+
+
+def test_samples_within_one_second_are_all_kept(timeseries_config):
+    now = time.time()
+    buffer = utils.EnergyTimeSeriesBuffer()
+
+    buffer.add("dev1", {"p": 100.0}, now)
+    buffer.add("dev1", {"p": 300.0}, now + 0.25)
+    buffer.flush(timeseries_config).result(timeout=5)
+
+    resolution, points = utils.get_energy_history(timeseries_config, "dev1", "p", int(now) - 1, int(now) + 2, resolution=0)
+    assert resolution == 0
+    assert [point[1] for point in points] == [100.0, 300.0]
+
+    # The rollups count the same samples as the raw table
+    _, buckets = utils.get_energy_history(timeseries_config, "dev1", "p", int(now) - 60, int(now) + 60, resolution=60)
+    assert sum(bucket[3] for bucket in buckets) / len(buckets) == pytest.approx(200.0)
+
+
+def test_size_limit_trims_the_finest_tier_first(timeseries_config):
+    timeseries_config["AppSettings"]["TimeSeriesMaxMBytes"] = str(64 / 1024)
+    now = time.time()
+    buffer = utils.EnergyTimeSeriesBuffer()
+
+    for index in range(3000):
+        buffer.add("dev1", {"p": float(index), "u1": 230.0}, now - 3000 + index)
+
+    buffer.flush(timeseries_config).result(timeout=5)
+
+    assert utils.prune_energy_timeseries(timeseries_config) > 0
+
+    with utils.get_db_connection(timeseries_config) as conn:
+        assert utils._get_db_used_bytes(conn.cursor(), "timeseries") <= 64 * 1024
+        assert conn.execute("SELECT COUNT(*) FROM timeseries.timeseries_rollup WHERE resolution = 3600").fetchone()[0] > 0
+
+    # The newest raw samples are the ones left
+    _, points = utils.get_energy_history(timeseries_config, "dev1", "p", int(now) - 3600, int(now) + 1, resolution=0)
+    assert points[-1][1] == 2999.0
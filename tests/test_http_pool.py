@@ -0,0 +1,63 @@
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import utils
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+
+        with self.lock:
+            type(self).connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _KeepAliveHandler.connections = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{httpd.server_port}"
+
+    httpd.shutdown()
+    httpd.server_close()
+    utils.close_http_sessions()
+
+
+def test_concurrent_requests_count_every_connection_once(server):
+    def send(count):
+        for _ in range(count):
+            assert utils.send_request(f"{server}/status", "GET").status_code == 200
+
+    threads = [threading.Thread(target=send, args=(25,)) for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    stats = utils.get_http_stats()[utils._get_url_origin(server)]
+
+    assert stats["requests"] == 100
+    assert stats["new_connections"] == _KeepAliveHandler.connections
+    assert stats["new_connections"] <= utils.HTTP_DEFAULT_POOL_SIZE
+    assert stats["resumed_tls_sessions"] == 0
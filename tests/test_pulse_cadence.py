@@ -0,0 +1,90 @@
+import pytest
+
+import utils
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def policy():
+    return utils.PulseCadencePolicy(active_interval=10, idle_interval=300, power_change_threshold=1000)
+
+
+def test_idle_devices_pulse_at_the_idle_interval(policy, clock):
+    assert policy.is_due("dev1", "A1", clock.now)
+    policy.mark_pulsed("dev1", now=clock.now)
+
+    clock.advance(60)
+    assert not policy.is_due("dev1", "A1", clock.now)
+
+    clock.advance(240)
+    assert policy.is_due("dev1", "A1", clock.now)
+
+
+def test_active_devices_pulse_at_the_active_interval(policy, clock):
+    policy.mark_pulsed("dev1", now=clock.now)
+
+    clock.advance(5)
+    assert not policy.is_due("dev1", "C2", clock.now)
+
+    # Within the half second of slack for the heartbeat's timer jitter
+    clock.advance(4.6)
+    assert policy.is_due("dev1", "C2", clock.now)
+    assert not policy.is_due("dev1", "A1", clock.now)
+
+
+def test_idle_interval_is_never_shorter_than_the_active_interval():
+    policy = utils.PulseCadencePolicy(active_interval=10, idle_interval=5, power_change_threshold=1000)
+
+    assert policy.interval("A1") == policy.interval("C2") == 10
+
+
+def test_trigger_makes_the_device_due_until_it_pulsed(policy, clock):
+    policy.mark_pulsed("dev1", now=clock.now)
+    policy.trigger("dev1")
+
+    assert policy.triggered_devices() == {"dev1"}
+    assert policy.is_due("dev1", "A1", clock.now)
+
+    policy.mark_pulsed("dev1", now=clock.now)
+
+    assert policy.triggered_devices() == set()
+    assert not policy.is_due("dev1", "A1", clock.now)
+
+
+def test_power_change_above_the_threshold_triggers_once(policy, clock):
+    # No pulse yet, nothing to compare against
+    assert not policy.observe_power("dev1", 5000)
+
+    policy.mark_pulsed("dev1", watts=2000, now=clock.now)
+
+    assert not policy.observe_power("dev1", 3000)
+    assert not policy.observe_power("dev1", 1000)
+    assert policy.observe_power("dev1", 3001)
+
+    # Already due, further changes don't report another trigger
+    assert not policy.observe_power("dev1", 7000)
+    assert policy.is_due("dev1", "C2", clock.now)
+
+
+def test_mark_pulsed_moves_the_power_baseline(policy, clock):
+    policy.mark_pulsed("dev1", watts=2000, now=clock.now)
+    assert policy.observe_power("dev1", 3500)
+
+    policy.mark_pulsed("dev1", watts=3500, now=clock.now)
+    assert not policy.observe_power("dev1", 4000)
+
+    # A pulse without a power reading keeps the previous baseline
+    policy.mark_pulsed("dev1", now=clock.now)
+    assert policy.observe_power("dev1", 4600)
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import utils
+
+
+def _queue_events(config, count):
+    for index in range(count):
+        utils.add_to_queue(config, f"session-{index}", "dev", {"index": index}, "start").result(timeout=5)
+
+
+def _reschedule(config, queue_db_id, next_attempt_at):
+    def write(cursor):
+        cursor.execute("UPDATE charging_session SET next_attempt_at = ? WHERE id = ?", (next_attempt_at, queue_db_id))
+
+    utils.submit_db_write(config, write).result(timeout=5)
+
+
+def test_pages_hand_out_every_due_item_once(config):
+    utils.initialize_queue_db(config)
+    _queue_events(config, 7)
+
+    pages = list(utils.iter_pending_queue_pages(config, page_size=3))
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert len({item["queue_db_id"] for page in pages for item in page}) == 7
+
+
+def test_item_deferred_during_the_pass_waits_for_the_next_pass(config):
+    utils.initialize_queue_db(config)
+    _queue_events(config, 4)
+
+    pages = utils.iter_pending_queue_pages(config, page_size=2)
+    first_page = next(pages)
+
+    # Deferred behind a predecessor, due again before the pass reaches the end of the queue
+    _reschedule(config, first_page[0]["queue_db_id"], (datetime.now() - timedelta(microseconds=1)).isoformat())
+
+    rest = [item["queue_db_id"] for page in pages for item in page]
+
+    assert first_page[0]["queue_db_id"] not in rest
+    assert len(rest) == 2
+
+
+def test_claim_queue_items_leases_a_page_at_once(config):
+    utils.initialize_queue_db(config)
+    _queue_events(config, 3)
+
+    queue_db_ids = [item["queue_db_id"] for item in utils.iter_pending_queue_items(config)]
+
+    assert utils.claim_queue_items(config, queue_db_ids, 60) == set(queue_db_ids)
+
+    # Leased items are neither due nor claimable until the lease expires
+    assert utils.claim_queue_items(config, queue_db_ids, 60) == set()
+    assert list(utils.iter_pending_queue_items(config)) == []
+
+
+def test_released_items_are_due_again_right_away(config):
+    utils.initialize_queue_db(config)
+    _queue_events(config, 3)
+
+    queue_db_ids = [item["queue_db_id"] for item in utils.iter_pending_queue_items(config)]
+    utils.claim_queue_items(config, queue_db_ids, 60)
+
+    # The first item was sent before EMM went down, the other two are released
+    utils.update_queue_item_status(config, queue_db_ids[0], "sent").result(timeout=5)
+    utils.release_queue_items(config, queue_db_ids).result(timeout=5)
+
+    due_items = list(utils.iter_pending_queue_items(config))
+
+    assert [item["queue_db_id"] for item in due_items] == queue_db_ids[1:]
+    assert utils.claim_queue_items(config, queue_db_ids, 60) == set(queue_db_ids[1:])
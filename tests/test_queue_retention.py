@@ -0,0 +1,125 @@
+import gzip
+import json
+import os
+import sqlite3
+
+from concurrent.futures import Future
+from datetime import datetime
+
+import pytest
+
+import utils
+
+
+def _add_finished_session(config, session_id, created_at):
+    def write(cursor):
+        for session_type in ("start", "end"):
+            cursor.execute("""
+                INSERT INTO charging_session (charging_session_id, device_uid, payload, type, status, created_at)
+                VALUES (?, 'dev', '{}', ?, 'sent', ?)
+            """, (session_id, session_type, created_at))
+
+    utils.submit_db_write(config, write).result(timeout=5)
+
+
+def _archive_files(config):
+    folder = os.path.join(config["AppSettings"]["FileFolder"], "archive")
+
+    return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+
+def test_removed_rows_are_archived_after_the_commit(config):
+    utils.initialize_queue_db(config)
+    _add_finished_session(config, "old", "2020-01-01T00:00:00")
+
+    result = utils.run_queue_retention(config)
+
+    assert result["session_rows"] == 2
+
+    files = _archive_files(config)
+    assert len(files) == 1 and files[0].endswith(".jsonl.gz")
+
+    with gzip.open(os.path.join(config["AppSettings"]["FileFolder"], "archive", files[0]), "rt") as file:
+        rows = [json.loads(line) for line in file]
+
+    assert {row["type"] for row in rows} == {"start", "end"}
+
+
+def test_failed_delete_writes_no_archive(config, monkeypatch):
+    utils.initialize_queue_db(config)
+    _add_finished_session(config, "old", "2020-01-01T00:00:00")
+
+    def failing_submit(cfg, command):
+        # Run the command like the writer would, then fail the commit
+        with utils.get_db_connection(cfg) as conn:
+            command(conn.cursor())
+            conn.rollback()
+
+        future = Future()
+        future.set_exception(RuntimeError("commit failed"))
+
+        return future
+
+    monkeypatch.setattr(utils, "submit_db_write", failing_submit)
+
+    with pytest.raises(RuntimeError):
+        utils.run_queue_retention(config)
+
+    assert _archive_files(config) == []
+
+
+def test_size_limit_counts_only_the_queue_tables(config):
+    config["AppSettings"]["QueueMaxSizeMBytes"] = str(64 / 1024)
+    utils.initialize_queue_db(config)
+    _add_finished_session(config, "recent", datetime.now().isoformat())
+
+    def fill_backlog(cursor):
+        # The telemetry backlog has its own quota, its size must not remove sessions
+        for index in range(100):
+            cursor.execute(
+                "INSERT INTO telemetry_backlog (captured_at, resolution, payload) VALUES (?, 10, ?)",
+                (1700000000 + index, os.urandom(2000))
+            )
+
+    utils.submit_db_write(config, fill_backlog).result(timeout=5)
+
+    assert utils.run_queue_retention(config)["session_rows"] == 0
+
+
+def test_size_limit_removes_the_oldest_finished_sessions(config):
+    config["AppSettings"]["QueueMaxSizeMBytes"] = str(128 / 1024)
+    utils.initialize_queue_db(config)
+
+    def fill_sessions(cursor):
+        for index in range(1000):
+            for session_type in ("start", "end"):
+                cursor.execute("""
+                    INSERT INTO charging_session (charging_session_id, device_uid, payload, type, status, created_at)
+                    VALUES (?, 'dev', ?, ?, 'sent', ?)
+                """, (f"s{index:03d}", json.dumps({"noise": os.urandom(50).hex()}), session_type, datetime.now().isoformat()))
+
+    utils.submit_db_write(config, fill_sessions).result(timeout=5)
+
+    assert utils.run_queue_retention(config)["session_rows"] > 0
+
+    with utils.get_db_connection(config) as conn:
+        assert utils._get_queue_data_bytes(conn.cursor()) <= 128 * 1024
+        assert conn.execute("SELECT MAX(charging_session_id) FROM charging_session").fetchone()[0] == "s999"
+
+
+def test_queue_size_estimate_without_dbstat(config):
+    utils.initialize_queue_db(config)
+    _add_finished_session(config, "recent", datetime.now().isoformat())
+
+    class NoDbstatCursor:
+        def __init__(self, cursor):
+            self._cursor = cursor
+
+        def execute(self, sql, *args):
+            if "dbstat" in sql:
+                raise sqlite3.OperationalError("no such table: dbstat")
+
+            return self._cursor.execute(sql, *args)
+
+    with utils.get_db_connection(config) as conn:
+        assert utils._get_queue_data_bytes(NoDbstatCursor(conn.cursor())) == 2 * (2 + utils.QUEUE_ROW_OVERHEAD_BYTES)
@@ -0,0 +1,99 @@
+import utils
+
+
+def _index(config):
+    utils.initialize_queue_db(config)
+    index = utils.RfidScanIndex(config)
+    index.load()
+
+    return index
+
+
+def test_claims_the_nearest_scan_in_the_window(config):
+    index = _index(config)
+
+    index.add("early", "2025-10-10T12:00:00").result(timeout=5)
+    index.add("near", "2025-10-10T12:00:50").result(timeout=5)
+    index.add("late", "2025-10-10T12:03:00").result(timeout=5)
+
+    assert index.claim("s1", "2025-10-10T12:01:00") == ("near", "2025-10-10T12:00:50")
+    assert index.claim("s2", "2025-10-10T12:01:00") == ("early", "2025-10-10T12:00:00")
+
+    # The remaining scan is outside the pairing window
+    assert index.claim("s3", "2025-10-10T12:01:00") == (None, None)
+
+
+def test_duplicate_scan_is_ignored(config):
+    index = _index(config)
+
+    assert index.add("tag", "2025-10-10T12:00:00") is not None
+    assert index.add("tag", "2025-10-10T12:00:00") is None
+
+
+def test_add_notifies_a_deferred_session_without_claiming(config):
+    index = _index(config)
+    notified = []
+
+    assert index.claim_or_defer("s1", "2025-10-10T12:00:00", timeout=5, on_scan=lambda: notified.append("s1")) == (None, None)
+
+    index.add("tag", "2025-10-10T12:00:03").result(timeout=5)
+
+    # The adding thread only notifies, the scan is still unclaimed until the session claims it
+    assert notified == ["s1"]
+    assert index.claimed_scan("s1") == (None, None)
+
+    assert index.claim_deferred("s1") == ("tag", "2025-10-10T12:00:03")
+    assert index.claimed_scan("s1") == ("tag", "2025-10-10T12:00:03")
+
+
+def test_only_the_nearest_deferred_session_is_notified(config):
+    index = _index(config)
+    notified = []
+
+    index.claim_or_defer("far", "2025-10-10T12:00:00", timeout=5, on_scan=lambda: notified.append("far"))
+    index.claim_or_defer("near", "2025-10-10T12:00:40", timeout=5, on_scan=lambda: notified.append("near"))
+
+    index.add("tag", "2025-10-10T12:00:45").result(timeout=5)
+
+    assert notified == ["near"]
+
+
+def test_cancelled_pairing_claims_nothing(config):
+    index = _index(config)
+
+    index.claim_or_defer("s1", "2025-10-10T12:00:00", timeout=5, on_scan=lambda: None)
+    index.add("tag", "2025-10-10T12:00:03").result(timeout=5)
+
+    # The session ended before the notified worker ran, the scan stays available
+    index.cancel_deferred("s1")
+
+    assert index.claim_deferred("s1") == (None, None)
+    assert index.claim("s2", "2025-10-10T12:00:00") == ("tag", "2025-10-10T12:00:03")
+
+
+def test_claims_survive_a_reload(config):
+    index = _index(config)
+
+    index.add("tag", "2025-10-10T12:00:00").result(timeout=5)
+    index.claim("s1", "2025-10-10T12:00:10")
+
+    # Wait for the claim to be written before reading the table again
+    utils.submit_db_write(config, lambda cursor: None).result(timeout=5)
+    index.load()
+
+    assert index.claimed_scan("s1") == ("tag", "2025-10-10T12:00:00")
+    assert index.claim("s2", "2025-10-10T12:00:10") == (None, None)
+
+
+def test_scans_for_the_same_time_go_to_different_sessions(config):
+    index = _index(config)
+    notified = []
+
+    for session_id in ("s1", "s2", "s3"):
+        index.claim_or_defer(session_id, "2025-10-10T12:00:00", timeout=5, on_scan=lambda session_id=session_id: notified.append(session_id))
+
+    index.add("tag1", "2025-10-10T12:00:01").result(timeout=5)
+    index.add("tag2", "2025-10-10T12:00:01").result(timeout=5)
+
+    assert len(set(notified)) == 2
+    assert {index.claim_deferred(session_id)[0] for session_id in notified} == {"tag1", "tag2"}
@@ -0,0 +1,114 @@
+import pytest
+
+import utils
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 5000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def timers(clock):
+    tracker = utils.SessionTimerTracker(["B1", "B2", "C1", "C2"], ["C2"], clock=clock)
+
+    # Synced while idle, so the local values can be trusted
+    tracker.resync("dev1", "A1", 0, 0)
+
+    return tracker
+
+
+def _times(timers):
+    snapshot = timers.snapshot("dev1")
+
+    return snapshot["connected_time_sec"], snapshot["charge_time_sec"]
+
+
+def test_new_connection_resets_both_timers(timers, clock):
+    timers.resync("dev1", "C2", 600, 500)
+
+    timers.on_state("dev1", "A1")
+    clock.advance(30)
+    timers.on_state("dev1", "B1")
+
+    assert _times(timers) == (0, 0)
+
+    clock.advance(12)
+    assert _times(timers) == (12, 0)
+
+
+def test_charge_time_accumulates_only_while_charging(timers, clock):
+    timers.on_state("dev1", "B1")
+    clock.advance(10)
+    timers.on_state("dev1", "C2")
+    clock.advance(100)
+    timers.on_state("dev1", "B2")
+    clock.advance(20)
+    timers.on_state("dev1", "C2")
+    clock.advance(50)
+
+    assert _times(timers) == (180, 150)
+
+
+def test_timers_freeze_while_disconnected(timers, clock):
+    timers.on_state("dev1", "C2")
+    clock.advance(90)
+    timers.on_state("dev1", "A1")
+
+    clock.advance(3600)
+
+    # The values of the last session stay until the next connection
+    assert _times(timers) == (90, 90)
+    assert timers.snapshot("dev1")["iec_61851_state"] == "A1"
+
+
+def test_state_reported_late_is_anchored_at_its_report_time(timers, clock):
+    timers.on_state("dev1", "C2", at=clock.now - 5)
+
+    assert _times(timers) == (5, 5)
+
+
+def test_resync_reports_drift_past_the_tolerance(timers, clock):
+    timers.on_state("dev1", "C2")
+    clock.advance(100)
+
+    assert not timers.resync("dev1", "C2", 110, 95, tolerance=15)
+    assert _times(timers) == (110, 95)
+
+    clock.advance(100)
+
+    # The controller's values replace the local ones, even when they drifted
+    assert timers.resync("dev1", "C2", 260, 200, tolerance=15)
+    assert _times(timers) == (260, 200)
+
+
+def test_unknown_and_flagged_devices_need_a_resync(timers, clock):
+    timers.on_state("dev2", "C2")
+
+    assert timers.needs_resync("dev2")
+    assert not timers.needs_resync("dev1")
+
+    # A first resync doesn't count as drift, there was nothing to compare against
+    assert not timers.resync("dev2", "C2", 400, 300, tolerance=0)
+
+    timers.mark_for_resync()
+    assert timers.needs_resync("dev1") and timers.needs_resync("dev2")
+
+
+def test_audit_is_due_after_the_interval(timers, clock):
+    assert not timers.audit_due("dev1", 900)
+
+    clock.advance(900)
+    assert timers.audit_due("dev1", 900)
+    assert timers.audit_due("unknown", 900)
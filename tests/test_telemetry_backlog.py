@@ -0,0 +1,146 @@
+import gzip
+import json
+import os
+
+import pytest
+
+import utils
+
+
+@pytest.fixture
+def backlog_config(config):
+    # A 20 kB quota, filled by a few dozen pulses
+    config["AppSettings"]["TelemetryBacklogMaxMBytes"] = str(20 / 1024)
+    config["AppSettings"]["TelemetryIntervalSeconds"] = "10"
+    utils.initialize_queue_db(config)
+
+    return config
+
+
+@pytest.fixture
+def downsampling_runs(monkeypatch):
+    runs = []
+    downsample = utils._downsample_telemetry_backlog
+
+    def counting_downsample(cursor, target_resolution):
+        runs.append(target_resolution)
+        return downsample(cursor, target_resolution)
+
+    monkeypatch.setattr(utils, "_downsample_telemetry_backlog", counting_downsample)
+
+    return runs
+
+
+def _pulse(device_uid):
+    # Random text doesn't compress, so every pulse adds a predictable number of bytes
+    return {device_uid: {"iec_61851_state": "C2", "noise": os.urandom(200).hex()}}
+
+
+def _stored_bytes(config):
+    with utils.get_db_connection(config) as conn:
+        return conn.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM telemetry_backlog").fetchone()[0]
+
+
+def _add_pulses(config, count):
+    # Every pulse comes from another controller, merging them barely shrinks the backlog
+    for index in range(count):
+        utils.add_to_telemetry_backlog(config, 1700000000 + index * 10, _pulse(f"dev{index}")).result(timeout=5)
+
+
+def _compact(config, previous_bytes, backlog_bytes):
+    db_path = utils._get_queue_db_path(config)
+    quota_bytes = utils._get_telemetry_backlog_quota(config)
+
+    def write(cursor):
+        return utils._compact_telemetry_backlog(cursor, db_path, previous_bytes, backlog_bytes, quota_bytes)
+
+    return utils.submit_db_write(config, write).result(timeout=5)
+
+
+def _insert_rows(config, fill_ratio):
+    # Stored without going through the compaction, until the backlog is filled to the ratio
+    quota_bytes = utils._get_telemetry_backlog_quota(config)
+
+    def write(cursor):
+        index = 0
+
+        while utils._get_telemetry_backlog_bytes(cursor) < quota_bytes * fill_ratio:
+            payload = gzip.compress(json.dumps(_pulse(f"dev{index}")).encode("utf-8"))
+            cursor.execute(
+                "INSERT INTO telemetry_backlog (captured_at, resolution, payload) VALUES (?, 10, ?)",
+                (1700000000 + index * 10, payload)
+            )
+            index += 1
+
+        return utils._get_telemetry_backlog_bytes(cursor)
+
+    return utils.submit_db_write(config, write).result(timeout=5)
+
+
+def test_downsampling_runs_when_a_fill_ratio_is_crossed(backlog_config, downsampling_runs):
+    quota_bytes = utils._get_telemetry_backlog_quota(backlog_config)
+    stored_bytes = _insert_rows(backlog_config, 0.7)
+
+    # Below the ratio before and after the insert
+    _compact(backlog_config, int(quota_bytes * 0.4), int(quota_bytes * 0.45))
+    assert downsampling_runs == []
+
+    _compact(backlog_config, int(quota_bytes * 0.45), stored_bytes)
+    assert downsampling_runs == [60]
+
+    # Still above the ratio, the step isn't repeated for every insert
+    stored_bytes = _stored_bytes(backlog_config)
+    assert stored_bytes > quota_bytes * 0.5
+
+    _compact(backlog_config, stored_bytes, stored_bytes + 200)
+    assert downsampling_runs == [60]
+
+
+def test_backlog_stays_within_its_quota(backlog_config, downsampling_runs):
+    _add_pulses(backlog_config, 200)
+
+    assert _stored_bytes(backlog_config) <= utils._get_telemetry_backlog_quota(backlog_config)
+    assert len(downsampling_runs) < 20
+
+
+def test_downsampling_repeats_on_the_timer(backlog_config, downsampling_runs, monkeypatch):
+    stored_bytes = _insert_rows(backlog_config, 0.7)
+    _compact(backlog_config, stored_bytes, stored_bytes)
+
+    # Above the ratio without a crossing, the step runs once its interval has passed
+    monkeypatch.setattr(utils, "TELEMETRY_BACKLOG_COMPACT_INTERVAL_SECONDS", 0)
+    stored_bytes = _stored_bytes(backlog_config)
+    _compact(backlog_config, stored_bytes, stored_bytes)
+
+    assert downsampling_runs == [60, 60]
+
+
+def test_tracked_size_follows_inserts_and_removals(backlog_config):
+    _add_pulses(backlog_config, 80)
+
+    db_path = utils._get_queue_db_path(backlog_config)
+    assert utils._TELEMETRY_BACKLOG_BYTES[db_path] == _stored_bytes(backlog_config)
+
+    batch = utils.get_telemetry_backlog_batch(backlog_config, 5)
+    utils.remove_from_telemetry_backlog(backlog_config, [entry["id"] for entry in batch]).result(timeout=5)
+
+    assert utils._TELEMETRY_BACKLOG_BYTES[db_path] == _stored_bytes(backlog_config)
+
+
+def test_downsampled_rows_keep_the_latest_pulse_per_controller(backlog_config):
+    for index, state in enumerate(("A1", "B1", "C2")):
+        utils.add_to_telemetry_backlog(backlog_config, 1700000040 + index, {"dev1": {"iec_61851_state": state}}).result(timeout=5)
+
+    utils.add_to_telemetry_backlog(backlog_config, 1700000045, {"dev2": {"iec_61851_state": "A1"}}).result(timeout=5)
+
+    def write(cursor):
+        # The older half of the four raw rows falls into one minute bucket
+        return utils._downsample_telemetry_backlog(cursor, 60)
+
+    utils.submit_db_write(backlog_config, write).result(timeout=5)
+
+    rows = utils.get_telemetry_backlog_batch(backlog_config, 10)
+
+    assert rows[0]["resolution"] == 60
+    assert rows[0]["controllers"] == {"dev1": {"iec_61851_state": "B1"}}
+    assert [row["resolution"] for row in rows[1:]] == [10, 10]
@@ -0,0 +1,85 @@
+import pytest
+
+import utils
+
+
+@pytest.fixture
+def encoder():
+    return utils.TelemetryDeltaEncoder(keyframe_interval=4, tolerances={"u1": 0.5})
+
+
+def _send(encoder, device_uid, pulse):
+    # Encode the pulse and let EMM accept it
+    encoded = encoder.encode(device_uid, pulse)
+    encoder.acknowledge(device_uid, pulse, encoded)
+
+    return encoded
+
+
+def test_keyframes_follow_the_interval(encoder):
+    pulse = {"iec_61851_state": "C2", "energy": {"u1": 230.0}}
+
+    keyframes = [_send(encoder, "aa", pulse)["keyframe"] for _ in range(9)]
+
+    assert keyframes == [True, False, False, False, True, False, False, False, True]
+
+
+def test_first_pulse_of_every_device_is_a_keyframe(encoder):
+    _send(encoder, "aa", {"energy": {"u1": 230.0}})
+
+    assert encoder.encode("bb", {"energy": {"u1": 230.0}}) == {"keyframe": True, "energy": {"u1": 230.0}}
+
+
+def test_reset_forces_a_keyframe(encoder):
+    pulse = {"energy": {"u1": 230.0}}
+    _send(encoder, "aa", pulse)
+
+    encoder.reset("aa")
+
+    assert encoder.encode("aa", pulse)["keyframe"] is True
+
+
+def test_values_within_the_tolerance_do_not_drift(encoder):
+    _send(encoder, "aa", {"energy": {"u1": 230.0}})
+
+    # Every step is within the tolerance, but the base stays at the acknowledged 230.0
+    assert _send(encoder, "aa", {"energy": {"u1": 230.3}}) == {"keyframe": False}
+    assert _send(encoder, "aa", {"energy": {"u1": 230.6}}) == {"keyframe": False, "energy": {"u1": 230.6}}
+
+    # The base moved to the sent value, the next small step is within the tolerance again
+    assert _send(encoder, "aa", {"energy": {"u1": 230.9}}) == {"keyframe": False}
+
+
+def test_removed_metrics_are_listed_once_acknowledged(encoder):
+    _send(encoder, "aa", {"energy": {"u1": 230.0, "i1": 16.0}})
+
+    assert _send(encoder, "aa", {"energy": {"u1": 230.0}}) == {"keyframe": False, "removed": ["i1"]}
+
+    # Once EMM accepted the removal, the metric isn't listed again
+    assert _send(encoder, "aa", {"energy": {"u1": 230.0}}) == {"keyframe": False}
+
+    # A metric coming back is sent as a change
+    assert _send(encoder, "aa", {"energy": {"u1": 230.0, "i1": 8.0}}) == {"keyframe": False, "energy": {"i1": 8.0}}
+
+
+def test_base_advances_only_on_acknowledge(encoder):
+    _send(encoder, "aa", {"iec_61851_state": "B1", "energy": {"u1": 230.0}})
+
+    changed = {"iec_61851_state": "C2", "energy": {"u1": 232.0}}
+    expected = {"keyframe": False, "iec_61851_state": "C2", "energy": {"u1": 232.0}}
+
+    # EMM didn't accept the delta, the next pulse is still encoded against the old base
+    assert encoder.encode("aa", changed) == expected
+    assert encoder.encode("aa", changed) == expected
+
+    encoder.acknowledge("aa", changed, expected)
+
+    assert encoder.encode("aa", changed) == {"keyframe": False}
+
+
+def test_unacknowledged_keyframe_is_repeated(encoder):
+    pulse = {"energy": {"u1": 230.0}}
+
+    # Without an acknowledged snapshot there is nothing to encode a delta against
+    assert encoder.encode("aa", pulse)["keyframe"] is True
+    assert encoder.encode("aa", pulse)["keyframe"] is True
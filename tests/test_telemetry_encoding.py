@@ -0,0 +1,74 @@
+import pytest
+
+import utils
+
+
+@pytest.mark.parametrize("value", [
+    None, True, False, 0, 127, 128, -1, -32, -33, -129, 65535, 65536, 2 ** 32, 2 ** 40, -(2 ** 40),
+    0.1, -230.5, "", "a" * 31, "ž" * 40, "x" * 70000, b"\x00\x01", list(range(20)),
+    {"key": [1, {"nested": None}], "other": "value"}, {str(index): index for index in range(20)},
+])
+def test_msgpack_round_trip(value):
+    assert utils.msgpack_unpack(utils.msgpack_pack(value)) == value
+
+
+def test_msgpack_rejects_trailing_bytes():
+    with pytest.raises(ValueError):
+        utils.msgpack_unpack(utils.msgpack_pack(1) + b"\x00")
+
+
+def test_columnar_round_trip_restores_the_pulse():
+    payload = {
+        "type": "pulse",
+        "controllers": {
+            "aa": {"iec_61851_state": "C2", "charge_time_sec": 120, "energy": {"u1": 230.1, "i1": 16.25}},
+            "bb": {"iec_61851_state": "A1", "energy": {"u1": 229.9}},
+        },
+    }
+
+    assert utils.decode_columnar_telemetry(utils.encode_columnar_telemetry(payload)) == payload
+
+
+def test_columnar_keeps_none_apart_from_absent_keys():
+    payload = {
+        "type": "pulse",
+        "encoding": "delta",
+        "controllers": {
+            "aa": {"keyframe": False, "rfid_tag": None, "energy": {"i1": None}},
+            "bb": {"keyframe": False, "energy": {"i1": 12.5}},
+        },
+    }
+
+    decoded = utils.decode_columnar_telemetry(utils.encode_columnar_telemetry(payload))
+
+    assert decoded["controllers"]["aa"] == {"keyframe": False, "rfid_tag": None, "energy": {"i1": None}}
+    assert "rfid_tag" not in decoded["controllers"]["bb"]
+
+
+def test_delta_sends_a_field_that_changed_to_none():
+    encoder = utils.TelemetryDeltaEncoder(keyframe_interval=10)
+    pulse = {"iec_61851_state": "C2", "rfid_tag": "TAG1", "energy": {"u1": 230.0, "i1": 16.0}}
+
+    encoder.acknowledge("aa", pulse, encoder.encode("aa", pulse))
+
+    changed = {"iec_61851_state": "C2", "rfid_tag": None, "energy": {"u1": 230.0, "i1": None}}
+    delta = encoder.encode("aa", changed)
+
+    assert delta == {"keyframe": False, "rfid_tag": None, "energy": {"i1": None}}
+
+    # The receiver sees the cleared fields after the columnar encoding too
+    payload = {"type": "pulse", "encoding": "delta", "controllers": {"aa": delta}}
+    assert utils.decode_columnar_telemetry(utils.encode_columnar_telemetry(payload))["controllers"]["aa"] == delta
+
+    encoder.acknowledge("aa", changed, delta)
+    assert encoder.encode("aa", changed) == {"keyframe": False}
+
+
+def test_delta_tolerance_and_removed_metrics():
+    encoder = utils.TelemetryDeltaEncoder(keyframe_interval=10, tolerances={"u1": 0.5})
+    pulse = {"energy": {"u1": 230.0, "i1": 16.0}}
+
+    encoder.acknowledge("aa", pulse, encoder.encode("aa", pulse))
+
+    assert encoder.encode("aa", {"energy": {"u1": 230.4}}) == {"keyframe": False, "removed": ["i1"]}
+    assert encoder.encode("aa", {"energy": {"u1": 231.0, "i1": 16.0}}) == {"keyframe": False, "energy": {"u1": 231.0}}
@@ -0,0 +1,108 @@
+#######################################
+# Train the EMM compression dictionary
+#
+# Builds a zlib preset dictionary from the charging sessions and controller
+# telemetry stored in the local database and writes it to the file set by
+# [EmmSettings] CompressionDictionaryFile (or the path given as an argument).
+#
+# Usage: python3 train_compression_dictionary.py [output_file]
+#
+# EMM has to be given the same file before CompressionMethod=zlib-dict is enabled.
+#######################################
+
+
+#######################################
+############# LOAD CONFIG #############
+#######################################
+
+from utils import load_config
+
+config = (
+    load_config()  # Loads config from /data/user-app/charging_data/charging_data.conf
+)
+
+###########################################
+############# END LOAD CONFIG #############
+###########################################
+
+
+#######################################
+############# SET LOGGING #############
+#######################################
+
+from utils import set_logging
+import logging
+
+set_logging(config)
+
+###########################################
+############# END SET LOGGING #############
+###########################################
+
+
+################################################
+############# TRAIN THE DICTIONARY #############
+################################################
+
+import os
+import sys
+import zlib
+
+from utils import (
+    collect_compression_samples,
+    train_preset_dictionary,
+    initialize_queue_db,
+    PRESET_DICTIONARY_MAX_BYTES,
+)
+
+
+def train_compression_dictionary(output_path: str) -> bool:
+    """
+    Train the preset dictionary from the local database and write it to a file.
+    The file is replaced atomically, a running agent never reads a partial dictionary.
+
+    Args:
+        output_path: Where to write the dictionary
+    Returns:
+        True if the dictionary was written, False otherwise
+    """
+
+    initialize_queue_db(config)
+    samples = collect_compression_samples(config)
+
+    if not samples:
+        logging.error("No charging sessions or telemetry in the local database, can't train a compression dictionary.")
+        return False
+
+    dictionary = train_preset_dictionary(samples, PRESET_DICTIONARY_MAX_BYTES)
+
+    temp_path = f"{output_path}.tmp"
+
+    with open(temp_path, "wb") as dictionary_file:
+        dictionary_file.write(dictionary)
+        dictionary_file.flush()
+        os.fsync(dictionary_file.fileno())
+
+    os.replace(temp_path, output_path)
+
+    logging.info(
+        f"Compression dictionary written to {output_path}: {len(dictionary)} bytes from {len(samples)} samples, "
+        f"X-Compression-Dictionary {zlib.adler32(dictionary):08x}"
+    )
+
+    return True
+
+
+####################################################
+############# END TRAIN THE DICTIONARY #############
+####################################################
+
+
+if __name__ == "__main__":
+    output_path = sys.argv[1] if len(sys.argv) > 1 else config["EmmSettings"].get("CompressionDictionaryFile", "")
+
+    if not output_path:
+        print("Set [EmmSettings] CompressionDictionaryFile or pass the output file as an argument.")
+        sys.exit(1)
+
+    sys.exit(0 if train_compression_dictionary(output_path) else 1)
@@ -62,6 +62,9 @@ import requests
 
 Response = requests.models.Response
 
+# Keep-alive session, so all script downloads share one connection to EMM
+http_session = requests.Session()
+
 
 def send_request_standalone(
     url: str,
@@ -99,7 +102,7 @@ def send_request_standalone(
 
     try:
         # Send the API request
-        response = requests.request(
+        response = http_session.request(
             method=method,
             url=url,
             headers=headers,
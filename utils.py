@@ -1,8 +1,9 @@
 import os
 import time
+import random
 
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Dict, List, Set, Tuple, Optional, Any, Iterator, Callable, Union
 
 
 # Helper function for getting the current timestamp
@@ -105,11 +106,272 @@ def set_logging(config) -> None:
 ############# SEND API REQUEST #############
 ############################################
 
+import ssl
 import requests
+import threading
+import urllib3
+
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
 
 Response = requests.models.Response
 
 
+class _CircuitOpen:
+    """Type of the CIRCUIT_OPEN marker."""
+
+    def __repr__(self) -> str:
+        return "CIRCUIT_OPEN"
+
+
+# Returned by send_request() instead of a response when the circuit breaker skipped the request,
+# nothing was sent, so the caller shouldn't count it as a failed delivery
+CIRCUIT_OPEN = _CircuitOpen()
+
+# Answers of a gateway in front of a host that is down, any other answer comes from the host itself
+HOST_DOWN_STATUS_CODES = (502, 503, 504)
+
+# Default number of keep-alive connections kept open per host
+HTTP_DEFAULT_POOL_SIZE = 4
+
+# One pooled session per scheme://host:port, created on first use
+_HTTP_SESSIONS: Dict[str, requests.Session] = {}
+_HTTP_POOL_SIZES: Dict[str, int] = {}
+_HTTP_STATS: Dict[str, Dict[str, float]] = {}
+_HTTP_LOCK = threading.Lock()
+
+# Connections opened by the request running on the current thread, a connection
+# is always opened by the thread that sends the request over it
+_HTTP_THREAD = threading.local()
+
+
+def _get_url_origin(url: str) -> str:
+    """
+    Normalise a URL to its scheme://host:port origin, used as the pool key.
+    """
+
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+
+    return f"{parts.scheme}://{parts.hostname}:{port}"
+
+
+def configure_http_pools(config) -> None:
+    """
+    Set the keep-alive pool size for the local REST API and the EMM host.
+    Must be called before the first request to the host to take effect.
+
+    Args:
+        config: Dictionary containing configuration values
+    """
+
+    rest_origin = _get_url_origin(f"http://{config['RestApi']['Host']}:{config['RestApi']['Port']}")
+    emm_origin = _get_url_origin(config["EmmSettings"]["Host"])
+
+    with _HTTP_LOCK:
+        _HTTP_POOL_SIZES[rest_origin] = int(config["RestApi"].get("PoolSize", HTTP_DEFAULT_POOL_SIZE))
+        _HTTP_POOL_SIZES[emm_origin] = int(config["EmmSettings"].get("PoolSize", HTTP_DEFAULT_POOL_SIZE))
+
+
+class _TlsSessionContext(ssl.SSLContext):
+    """
+    TLS context shared by all the connections to one host. A new connection resumes the
+    TLS session of the last response received, so the server skips the certificate
+    exchange and key agreement of a full handshake.
+    """
+
+    tls_session: Optional[ssl.SSLSession] = None
+
+    def wrap_socket(self, sock, *args, **kwargs):
+        if kwargs.get("session") is None:
+            kwargs["session"] = self.tls_session
+
+        return super().wrap_socket(sock, *args, **kwargs)
+
+
+def _create_tls_session_context() -> _TlsSessionContext:
+    """
+    A certificate and hostname verifying client context with urllib3's defaults.
+    """
+
+    context = _TlsSessionContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.options |= ssl.OP_NO_COMPRESSION
+
+    return context
+
+
+def _count_thread_connection(resumed_tls_session: bool = False) -> None:
+    """
+    Account a connection opened by the current thread against its running request.
+    """
+
+    _HTTP_THREAD.new_connections = getattr(_HTTP_THREAD, "new_connections", 0) + 1
+
+    if resumed_tls_session:
+        _HTTP_THREAD.resumed_tls_sessions = getattr(_HTTP_THREAD, "resumed_tls_sessions", 0) + 1
+
+
+class _PooledHTTPConnection(urllib3.connection.HTTPConnection):
+    def connect(self) -> None:
+        super().connect()
+        _count_thread_connection()
+
+
+class _PooledHTTPSConnection(urllib3.connection.HTTPSConnection):
+    def connect(self) -> None:
+        super().connect()
+        _count_thread_connection(getattr(self.sock, "session_reused", False))
+
+    def getresponse(self, *args, **kwargs):
+        # The socket is dropped from the connection if the server closes it after the response
+        sock = self.sock
+        response = super().getresponse(*args, **kwargs)
+
+        # TLS 1.3 session tickets arrive after the handshake, they are read along with the response
+        session = getattr(sock, "session", None)
+        if session is not None and isinstance(self.ssl_context, _TlsSessionContext):
+            self.ssl_context.tls_session = session
+
+        return response
+
+
+class _PooledHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _PooledHTTPConnection
+
+
+class _PooledHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _PooledHTTPSConnection
+
+
+class _PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connections count themselves when they connect and share
+    one TLS context, so that a new connection can resume an earlier TLS session.
+    """
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        kwargs.setdefault("ssl_context", _create_tls_session_context())
+        super().init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _PooledHTTPConnectionPool,
+            "https": _PooledHTTPSConnectionPool,
+        }
+
+
+def _get_http_session(origin: str) -> requests.Session:
+    """
+    Return the pooled session for the origin, creating it on first use.
+    """
+
+    with _HTTP_LOCK:
+        session = _HTTP_SESSIONS.get(origin)
+
+        if session is None:
+            pool_size = _HTTP_POOL_SIZES.get(origin, HTTP_DEFAULT_POOL_SIZE)
+
+            # Only one host is ever talked to through this session, but the pool
+            # must hold a connection for every thread sending at the same time
+            adapter = _PooledHTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            _HTTP_SESSIONS[origin] = session
+            _HTTP_STATS[origin] = {
+                "requests": 0,
+                "new_connections": 0,
+                "connecting_requests": 0,
+                "resumed_tls_sessions": 0,
+                "new_connection_seconds": 0.0,
+                "reused_seconds": 0.0,
+            }
+
+    return session
+
+
+def _record_http_stats(origin: str, new_connections: int, resumed_tls_sessions: int, elapsed: float) -> None:
+    """
+    Account one completed request against the origin's connection stats.
+    """
+
+    with _HTTP_LOCK:
+        stats = _HTTP_STATS[origin]
+        stats["requests"] += 1
+        stats["resumed_tls_sessions"] += resumed_tls_sessions
+
+        if new_connections:
+            stats["new_connections"] += new_connections
+            stats["connecting_requests"] += 1
+            stats["new_connection_seconds"] += elapsed
+        else:
+            stats["reused_seconds"] += elapsed
+
+
+def get_http_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Connection reuse stats per origin.
+
+    The handshake estimate is the difference between the average duration of
+    requests that had to open a connection and those that reused one.
+    resumed_tls_sessions counts the new connections that skipped a full TLS handshake.
+
+    Returns:
+        Dict of origin -> requests, new_connections, resumed_tls_sessions, reuse_ratio and handshake_ms
+    """
+
+    result: Dict[str, Dict[str, float]] = {}
+
+    with _HTTP_LOCK:
+        for origin, stats in _HTTP_STATS.items():
+            requests_count = stats["requests"]
+            connecting_requests = stats["connecting_requests"]
+            reused = requests_count - connecting_requests
+
+            handshake_ms = 0.0
+            if connecting_requests and reused:
+                handshake_ms = max(
+                    0.0,
+                    (stats["new_connection_seconds"] / connecting_requests - stats["reused_seconds"] / reused) * 1000,
+                )
+
+            result[origin] = {
+                "requests": requests_count,
+                "new_connections": stats["new_connections"],
+                "resumed_tls_sessions": stats["resumed_tls_sessions"],
+                "reuse_ratio": round(reused / requests_count, 3) if requests_count else 0.0,
+                "handshake_ms": round(handshake_ms, 1),
+            }
+
+    return result
+
+
+def log_http_stats() -> None:
+    """
+    Write the connection reuse stats of every origin to the log.
+    """
+
+    for origin, stats in get_http_stats().items():
+        logging.info(
+            f"HTTP pool {origin}: {stats['requests']} requests, {stats['new_connections']} new connections "
+            f"({stats['resumed_tls_sessions']} resumed TLS sessions), reuse ratio {stats['reuse_ratio']}, estimated handshake {stats['handshake_ms']} ms"
+        )
+
+
+def close_http_sessions() -> None:
+    """
+    Close every pooled session and its keep-alive connections.
+    """
+
+    with _HTTP_LOCK:
+        for session in _HTTP_SESSIONS.values():
+            session.close()
+
+        _HTTP_SESSIONS.clear()
+
+
 def send_request(
     url: str,
     method: str,
@@ -118,35 +380,48 @@ def send_request(
     data: Optional[Dict[str, Any]] = None,
     json: Optional[Dict[str, Any]] = None,
     timeout: int = 10,
-) -> Optional[Response]:
+    circuit_breaker: Optional["CircuitBreaker"] = None,
+) -> Union[Response, _CircuitOpen, None]:
     """
     Make an HTTP request with error logging. Continues execution on error.
 
     Args:
         url: The URL to send the request to
-        method: HTTP method to use (GET, POST, PUT, DELETE, PATCH)
+        method: HTTP method to use (GET, POST, PUT, DELETE, PATCH, HEAD)
         headers: Optional dictionary of HTTP headers
         params: Optional dictionary of query parameters
         data: Optional dictionary of form data
         json: Optional dictionary of JSON data
         timeout: Request timeout in seconds
+        circuit_breaker: Optional breaker guarding the host, the request is skipped while it's open
     Returns:
-        The response if successful, None if failed
+        The response if successful, None if failed, CIRCUIT_OPEN if the circuit breaker skipped it
     """
 
     # Validate the supplied method
     method = method.upper()
-    if method not in ["GET", "POST", "PUT", "DELETE", "PATCH"]:
+    if method not in ["GET", "POST", "PUT", "DELETE", "PATCH", "HEAD"]:
         logging.error(f"Invalid HTTP method: {method}")
         return None
 
+    # Don't wait on a timeout for a host that is known to be down
+    if circuit_breaker is not None and not circuit_breaker.allow_request():
+        logging.debug(f"Circuit '{circuit_breaker.name}' is open, skipping request. URL: {url}")
+        return CIRCUIT_OPEN
+
     # Set default headers if none provided
     if headers is None:
         headers = {"Content-Type": "application/json", "Accept": "application/json"}
 
     try:
-        # Send the API request
-        response = requests.request(
+        # Send the API request over the pooled keep-alive session of the host
+        origin = _get_url_origin(url)
+        session = _get_http_session(origin)
+        _HTTP_THREAD.new_connections = 0
+        _HTTP_THREAD.resumed_tls_sessions = 0
+        started = time.perf_counter()
+
+        response = session.request(
             method=method,
             url=url,
             headers=headers,
@@ -156,12 +431,27 @@ def send_request(
             timeout=timeout,
         )
 
+        _record_http_stats(
+            origin,
+            _HTTP_THREAD.new_connections,
+            _HTTP_THREAD.resumed_tls_sessions,
+            time.perf_counter() - started,
+        )
+
         # Log but don't raise for bad status codes
         if response.status_code >= 400:
             logging.error(
                 f"HTTP {response.status_code} error occurred: {response.text}. URL: {url}"
             )
 
+        # Only a gateway reporting the host down counts towards opening the circuit, any other answer,
+        # including a 500 caused by one payload, proves the host is up
+        if circuit_breaker is not None:
+            if response.status_code in HOST_DOWN_STATUS_CODES:
+                circuit_breaker.record_failure()
+            else:
+                circuit_breaker.record_success()
+
         # Return the response
         return response
 
@@ -169,17 +459,19 @@ def send_request(
         logging.error(
             f"Failed to connect to the server. Please check your internet connection: {str(err)}. URL: {url}"
         )
-        return None
 
     except requests.exceptions.Timeout as err:
         logging.error(
             f"Request timed out after {timeout} seconds: {str(err)}. URL: {url}"
         )
-        return None
 
     except requests.exceptions.RequestException as err:
         logging.error(f"Request failed: {str(err)}. URL: {url}")
-        return None
+
+    if circuit_breaker is not None:
+        circuit_breaker.record_failure()
+
+    return None
 
 
 ################################################
@@ -187,6 +479,182 @@ def send_request(
 ################################################
 
 
+################################################
+############# HTTP CIRCUIT BREAKER #############
+################################################
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker shared by every thread talking to one remote host.
+
+    Closed: requests go through, consecutive failures are counted.
+    Open: requests are skipped without touching the network until the reset timeout passes.
+    Half-open: the first caller after the timeout starts a cheap probe request in the background,
+    which either closes the circuit or opens it again with a doubled timeout. Requests are
+    skipped until the probe finished, no caller waits for it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        probe_url: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30,
+        max_reset_timeout: float = 600,
+        probe_timeout: float = 5,
+    ):
+        self.name = name
+        self.probe_url = probe_url
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max(reset_timeout, max_reset_timeout)
+        self.probe_timeout = probe_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._reset_timeout = reset_timeout
+        self._opened_until = 0.0
+
+    @property
+    def state(self) -> str:
+        """The current state, one of CLOSED, OPEN or HALF_OPEN."""
+
+        with self._lock:
+            return self._state
+
+    def is_closed(self) -> bool:
+        """True if requests are currently going through."""
+
+        return self.state == self.CLOSED
+
+    def seconds_until_probe(self) -> float:
+        """
+        Seconds until the next probe is due, 0 if the circuit is closed or the probe is already due.
+        """
+
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0.0
+
+            return max(0.0, self._opened_until - time.monotonic())
+
+    def allow_request(self) -> bool:
+        """
+        Decide whether a request may go out now. Starts the probe in a background thread
+        when the circuit is open and the reset timeout has passed.
+
+        Returns:
+            True if the request should be sent, False if it should be skipped
+        """
+
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            # Another thread is probing already, or it's too early to probe
+            if self._state == self.HALF_OPEN or time.monotonic() < self._opened_until:
+                return False
+
+            self._state = self.HALF_OPEN
+
+        try:
+            threading.Thread(target=self._probe, name=f"Circuit-Probe-{self.name}", daemon=True).start()
+
+        except RuntimeError as e:
+            logging.error(f"Could not start the probe of circuit '{self.name}': {e}")
+
+            with self._lock:
+                self._open(self._reset_timeout)
+
+        return False
+
+    def _probe(self) -> None:
+        recovered = False
+
+        try:
+            # Any answer from the host itself means it's reachable again, gateway errors mean it's still down
+            response = send_request(self.probe_url, "HEAD", timeout=self.probe_timeout)
+            recovered = response is not None and response.status_code not in HOST_DOWN_STATUS_CODES
+
+        except Exception as e:
+            logging.error(f"Probe of circuit '{self.name}' failed: {e}", exc_info=True)
+
+        finally:
+            # Never leave the circuit half-open, nothing else would probe it again
+            with self._lock:
+                if recovered:
+                    self._close()
+                else:
+                    self._open(min(self._reset_timeout * 2, self.max_reset_timeout))
+
+    def record_success(self) -> None:
+        """Reset the failure count after a request got an answer."""
+
+        with self._lock:
+            if self._state != self.CLOSED:
+                self._close()
+
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        """Count a failed request, opening the circuit once the threshold is reached."""
+
+        with self._lock:
+            self._failures += 1
+
+            if self._state == self.CLOSED and self._failures >= self.failure_threshold:
+                self._open(self.base_reset_timeout)
+
+    def _open(self, reset_timeout: float) -> None:
+        # Must be called with the lock held
+        self._state = self.OPEN
+        self._reset_timeout = reset_timeout
+        self._opened_until = time.monotonic() + reset_timeout
+
+        logging.warning(f"Circuit '{self.name}' opened after {self._failures} failures, next probe in {reset_timeout:.0f}s")
+
+    def _close(self) -> None:
+        # Must be called with the lock held
+        logging.info(f"Circuit '{self.name}' closed, host is reachable again")
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._reset_timeout = self.base_reset_timeout
+
+
+def create_emm_circuit_breaker(config) -> CircuitBreaker:
+    """
+    Create the circuit breaker guarding the EMM API, configured from [EmmSettings].
+
+    Args:
+        config: Dictionary containing configuration values
+    Returns:
+        The circuit breaker to pass to send_request() for every EMM call
+    """
+
+    emm_settings = config["EmmSettings"]
+
+    return CircuitBreaker(
+        name="EMM",
+        probe_url=emm_settings["Host"] + emm_settings.get("CircuitProbePath", "/"),
+        failure_threshold=int(emm_settings.get("CircuitFailureThreshold", 3)),
+        reset_timeout=float(emm_settings.get("CircuitResetSeconds", 30)),
+        max_reset_timeout=float(emm_settings.get("CircuitMaxResetSeconds", 600)),
+        probe_timeout=float(emm_settings.get("CircuitProbeTimeoutSeconds", 5)),
+    )
+
+
+####################################################
+############# END HTTP CIRCUIT BREAKER #############
+####################################################
+
+
 ###############################################
 ############# IS DATETIME BETWEEN #############
 ###############################################
@@ -238,428 +706,3902 @@ def get_charging_point(controller_id: str, api_url: str) -> Tuple[Optional[str],
 #####################################################
 
 
-###################################################
-############# SQLITE QUEUE MANAGEMENT #############
-###################################################
+###########################################
+############# DEVICE REGISTRY #############
+###########################################
 
-import sqlite3
-import json
 
-# The queue database file name 
-QUEUE_DB_NAME = "data_queue.db"
+# Unknown devices trigger a refresh on lookup, but not more often than this
+DEVICE_REGISTRY_MIN_REFRESH_SECONDS = 30
 
 
-def _get_queue_db_path(config) -> str:
+class DeviceRegistry:
     """
-    Constructs the full file path for the SQLite queue database.
+    In-memory index of the charging controllers and their charging points by device UID.
 
-    Args:
-        config: Dictionary containing configuration values, specifically 'AppSettings'.
-    Returns:
-        The full path to the SQLite database file.
+    Both documents are downloaded from the REST API together and indexed once, so lookups
+    on the event path never call the API. The registry is refreshed in the background when
+    its TTL expires or after invalidate(), and a lookup of an unknown device refreshes it
+    right away (rate limited), which covers controllers added after the last refresh.
     """
 
-    data_folder_path = config["AppSettings"]["FileFolder"]
-    return os.path.join(data_folder_path, QUEUE_DB_NAME)
+    def __init__(self, config, clock: Callable[[], float] = time.monotonic):
+        self.api_url = f"http://{config['RestApi']['Host']}:{config['RestApi']['Port']}/api/v1.0"
+        self.ttl = int(config["AppSettings"].get("DeviceRegistryTtlSeconds", 300))
 
+        # The monotonic clock of the TTL and the refresh rate limit, replaceable for tests
+        self._clock = clock
 
-def get_db_connection(config):
-    """
-    Returns a connection with optimized per-session settings.
-    """
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._controllers: Dict[str, Dict[str, Any]] = {}
+        self._charging_points: Dict[str, Dict[str, Any]] = {}
+        self._refreshed_at: Optional[float] = None
+        self._attempted_at: Optional[float] = None
+        self._stale = True
 
-    db_path = _get_queue_db_path(config)
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
-    # 20-second timeout to handle concurrency
-    conn = sqlite3.connect(db_path, timeout=20)
-    
-    # synchronous=NORMAL provides the best balance between performance and safety in WAL mode
-    conn.execute("PRAGMA synchronous=NORMAL;")
+    def refresh(self) -> bool:
+        """
+        Download the controllers and charging points and rebuild the index.
+        Keeps the previous index if either request fails.
 
-    # Make SQLite return dictionaries
-    conn.row_factory = sqlite3.Row
-    
-    return conn
+        Returns:
+            True if the controllers or charging points changed since the previous refresh
+        """
 
+        with self._refresh_lock:
+            self._attempted_at = self._clock()
 
-def initialize_queue_db(config) -> None:
-    """
-    Initializes the SQLite database for the charging session queue.
-    Creates the 'charging_session' table if it does not already exist.
+            controllers_response = send_request(f"{self.api_url}/charging-controllers", "GET")
+            charging_points_response = send_request(f"{self.api_url}/charging-points", "GET")
 
-    Args:
-        config: Dictionary containing configuration values, specifically 'AppSettings'.
-    Returns:
-        None
-    """
+            if controllers_response is None or charging_points_response is None:
+                logging.warning("Could not refresh the device registry, keeping the cached devices")
+                return False
 
-    db_path = _get_queue_db_path(config)
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            try:
+                controllers = controllers_response.json()
 
-    # Enable WAL mode for concurrent database writes
-    raw_conn = sqlite3.connect(db_path, timeout=20)
-    raw_conn.execute("PRAGMA journal_mode=WAL;")
-    raw_conn.commit()
-    raw_conn.close()
+                # Index the charging points by the controller they belong to
+                charging_points = {
+                    data["charging_controller_device_uid"]: data
+                    for data in charging_points_response.json()["charging_points"].values()
+                }
 
-    with get_db_connection(config) as conn:
-        cursor = conn.cursor()
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                logging.error(f"Failed to parse the device registry from the REST API: {e}")
+                return False
 
-        # 'charging_session' database table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS charging_session (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                charging_session_id TEXT NOT NULL,
-                device_uid TEXT NOT NULL,
-                payload TEXT NOT NULL,
-                type TEXT NOT NULL, -- 'start' or 'end'
-                status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'sent', 'failed'
-                attempts INTEGER DEFAULT 0,
-                last_attempt_at TEXT,
-                created_at TEXT NOT NULL,
-                UNIQUE(charging_session_id, type)
-            )
-        """)
+            with self._lock:
+                changed = self._refreshed_at is not None and (
+                    controllers != self._controllers or charging_points != self._charging_points
+                )
 
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_charging_session_id ON charging_session (charging_session_id);
-        """)
+                self._controllers = controllers
+                self._charging_points = charging_points
+                self._refreshed_at = self._clock()
+                self._stale = False
 
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_charging_session_type ON charging_session (charging_session_id, type);
-        """)
+        logging.info(f"Device registry refreshed: {len(controllers)} controllers, {len(charging_points)} charging points")
 
-        # 'rfid_event' database table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS rfid_event (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tag TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                claimed_by_session_id TEXT DEFAULT NULL,
-                created_at TEXT NOT NULL
-            )
-        """)
+        return changed
 
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_rfid_timestamp ON rfid_event (timestamp);
-        """)
+    def invalidate(self) -> None:
+        """Marks the registry for a refresh on the next refresh_due() check."""
 
-        # 'device_status' database table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS device_status (
-                device_uid TEXT PRIMARY KEY,
-                status TEXT NOT NULL, -- 'connected', 'disconnected'
-                updated_at TEXT NOT NULL
-            )
-        """)
+        self._stale = True
 
-        # 'controller_telemetry' database table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS controller_telemetry (
-                device_uid TEXT PRIMARY KEY,
-                payload TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
+    def refresh_due(self) -> bool:
+        """
+        Whether the TTL expired or the registry was invalidated. Failed refreshes
+        are retried no more often than DEVICE_REGISTRY_MIN_REFRESH_SECONDS.
+        """
 
-    logging.info(f"Initialized SQLite queue database with WAL mode")
+        now = self._clock()
 
+        if self._attempted_at is not None and now - self._attempted_at < DEVICE_REGISTRY_MIN_REFRESH_SECONDS:
+            return False
 
-def save_rfid_event(config, tag: str, timestamp: str):
-    """Stores every RFID scan into a buffer."""
+        return self._stale or self._refreshed_at is None or now - self._refreshed_at >= self.ttl
 
-    with get_db_connection(config) as conn:
-        cursor = conn.cursor()
+    def _lookup(self, index: str, device_uid: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = getattr(self, index).get(device_uid)
+            known = device_uid in self._controllers
 
-        # Avoid duplicate entries for the exact same scan
-        cursor.execute("SELECT id FROM rfid_event WHERE tag = ? AND timestamp = ?", (tag, timestamp))
-        
-        if not cursor.fetchone():
-            cursor.execute(
-                "INSERT INTO rfid_event (tag, timestamp, created_at) VALUES (?, ?, ?)",
-                (tag, timestamp, datetime.now().isoformat())
-            )
+        if entry is not None or known:
+            return entry
 
-            logging.info(f"Saved RFID scan to database: {tag} at {timestamp}")
+        # A device we don't know yet, the cached documents are out of date
+        self.invalidate()
+
+        if self.refresh_due():
+            self.refresh()
+
+            with self._lock:
+                entry = getattr(self, index).get(device_uid)
+
+        return entry
+
+    def get_controller(self, device_uid: str) -> Optional[Dict[str, Any]]:
+        """
+        The controller's info from the REST API, None if the device is unknown.
+        """
+
+        return self._lookup("_controllers", device_uid)
+
+    def get_charging_point(self, device_uid: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        The ID and name of the charging point the controller belongs to, same as get_charging_point().
+
+        Returns:
+            Tuple of the charging point ID and name, (None, None) if the device is unknown
+        """
+
+        charging_point = self._lookup("_charging_points", device_uid)
+
+        if charging_point is None:
+            return None, None
+
+        return charging_point["id"], charging_point["charging_point_name"]
+
+    def controllers(self) -> Dict[str, Dict[str, Any]]:
+        """A copy of all controllers' info by device UID."""
+
+        with self._lock:
+            return dict(self._controllers)
+
+
+###############################################
+############# END DEVICE REGISTRY #############
+###############################################
+
+
+#################################################
+############# GZIP PAYLOAD ENVELOPE #############
+#################################################
+
+import zlib
+import struct
+
+# Fixed gzip member header: deflate method, no flags, no mtime, unknown OS
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+# An empty final fixed Huffman block, closes a deflate stream
+DEFLATE_FINAL_BLOCK = b"\x03\x00"
+
+# Text shorter than this is appended as a stored (uncompressed) block, setting up a compressor costs more than it saves
+STORED_BLOCK_MAX_BYTES = 128
+
+
+def compress_payload_prefix(payload_json: str, level: int = 9) -> bytes:
+    """
+    Pre-compresses a serialized JSON object without its closing brace into a raw deflate
+    fragment that can later be spliced into a gzip stream by GzipStreamBuilder.
+    The fragment ends on a full flush, so further fields can be appended without recompressing it.
+
+    Args:
+        payload_json: The JSON object as a string, as produced by json.dumps().
+        level: The zlib compression level, it's paid once so the best ratio is the default.
+    Returns:
+        The raw deflate fragment.
+    """
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(payload_json[:-1].encode("utf-8")) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+
+def build_payload_suffix(payload_json: str, fields: Dict[str, Any]) -> str:
+    """
+    Serializes the fields that are added to a pre-compressed payload at the moment of sending,
+    including the closing brace that compress_payload_prefix() left out.
+
+    Args:
+        payload_json: The original JSON object as a string.
+        fields: The fields to add to the object.
+    Returns:
+        The JSON text that completes the object.
+    """
+
+    if not fields:
+        return "}"
+
+    separator = "" if payload_json == "{}" else ", "
+    return separator + json.dumps(fields)[1:-1] + "}"
+
+
+class GzipStreamBuilder:
+    """
+    Assembles a single gzip member from pre-compressed deflate fragments and small pieces of
+    plain text compressed on the fly. Only the running CRC32 is computed over the fragments,
+    they are never decompressed or recompressed.
+    """
+
+    def __init__(self, level: int = 6):
+        self._level = level
+        self._chunks: List[bytes] = [GZIP_HEADER]
+        self._crc = 0
+        self._size = 0
+
+    def add_precompressed(self, deflate_data: bytes, text: str) -> None:
+        """Appends a fragment from compress_payload_prefix(), text is the JSON it was created from."""
+
+        data = text[:-1].encode("utf-8")
+        self._chunks.append(deflate_data)
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+
+    def add_text(self, text: str) -> None:
+        """Compresses and appends a piece of plain text."""
+
+        data = text.encode("utf-8")
+
+        if len(data) < STORED_BLOCK_MAX_BYTES:
+            # Non-final stored block: header byte, LEN and its one's complement, raw data.
+            # Every fragment ends on a byte boundary, so the block can follow directly.
+            self._chunks.append(struct.pack("<BHH", 0, len(data), len(data) ^ 0xFFFF) + data)
+        else:
+            compressor = zlib.compressobj(self._level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self._chunks.append(compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH))
+
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+
+    def finish(self) -> bytes:
+        """Closes the deflate stream and returns the complete gzip member."""
+
+        self._chunks.append(DEFLATE_FINAL_BLOCK)
+        self._chunks.append(struct.pack("<II", self._crc & 0xFFFFFFFF, self._size & 0xFFFFFFFF))
+
+        return b"".join(self._chunks)
+
+
+#####################################################
+############# END GZIP PAYLOAD ENVELOPE #############
+#####################################################
+
+
+######################################################
+############# PAYLOAD COMPRESSION ENGINE #############
+######################################################
+
+
+import re
+from collections import Counter
+
+# Largest preset dictionary deflate can use, it only looks back 32 KiB
+PRESET_DICTIONARY_MAX_BYTES = 32 * 1024
+
+# How long a CPU load reading is reused for choosing the compression level
+CPU_LOAD_CACHE_SECONDS = 5
+
+_CPU_LOAD_CACHE: List[float] = [0.0, -CPU_LOAD_CACHE_SECONDS]
+
+
+def get_cpu_load() -> float:
+    """
+    The 1 minute load average per CPU core, 0 if the platform doesn't report it.
+    The reading is cached for a few seconds, it's checked for every compressed payload.
+    """
+
+    now = time.monotonic()
+
+    if now - _CPU_LOAD_CACHE[1] >= CPU_LOAD_CACHE_SECONDS:
+        try:
+            _CPU_LOAD_CACHE[0] = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):
+            _CPU_LOAD_CACHE[0] = 0.0
+
+        _CPU_LOAD_CACHE[1] = now
+
+    return _CPU_LOAD_CACHE[0]
+
+
+def select_compression_level(size: int) -> int:
+    """
+    Chooses the zlib level for a payload. Small payloads always get the best ratio since
+    they're cheap to compress either way, bigger ones trade ratio for CPU as the load rises.
+
+    Args:
+        size: The uncompressed payload size in bytes
+    Returns:
+        A zlib compression level between 1 and 9
+    """
+
+    load = get_cpu_load()
+
+    if load >= 1.0:
+        return 1
+
+    if size <= 16 * 1024:
+        return 9
+
+    if load >= 0.5 or size >= 1024 * 1024:
+        return 4
+
+    return 6
+
+
+def train_preset_dictionary(samples: List[bytes], max_size: int = PRESET_DICTIONARY_MAX_BYTES) -> bytes:
+    """
+    Builds a zlib preset dictionary from sample payloads. The dictionary holds the JSON keys
+    and string values that recur across the samples, most valuable last since deflate reaches
+    the end of the dictionary with the shortest distances, followed by the newest sample as
+    a template of the whole structure.
+
+    Args:
+        samples: Representative uncompressed payloads, oldest first
+        max_size: Maximum dictionary size in bytes
+    Returns:
+        The dictionary, empty if there were no samples
+    """
+
+    if not samples:
+        return b""
+
+    template = samples[-1][-(max_size // 2):]
+
+    # Score every token by the bytes it would save across all the samples
+    counts = Counter(token for sample in samples for token in set(re.findall(rb'"[^"\\]{1,64}"\s*:?\s*', sample)))
+    tokens = sorted((token for token, count in counts.items() if count > 1), key=lambda token: counts[token] * len(token))
+
+    dictionary = bytearray()
+    budget = max_size - len(template)
+
+    # The best tokens are at the end of the sorted list, keep as many of them as fit
+    for token in reversed(tokens):
+        if len(dictionary) + len(token) > budget:
+            break
+
+        dictionary[:0] = token
+
+    return bytes(dictionary) + template
+
+
+def collect_compression_samples(config, max_samples: int = 200) -> List[bytes]:
+    """
+    Reads recent charging session and controller telemetry payloads from the local database
+    as training samples for train_preset_dictionary().
+
+    Args:
+        config: Dictionary containing configuration values
+        max_samples: Maximum number of samples of each kind
+    Returns:
+        The payloads as UTF-8 bytes
+    """
+
+    with get_db_connection(config) as conn:
+        sessions = conn.execute("SELECT payload FROM charging_session ORDER BY id DESC LIMIT ?", (max_samples,)).fetchall()
+        telemetry = conn.execute("SELECT payload FROM controller_telemetry ORDER BY updated_at DESC LIMIT ?", (max_samples,)).fetchall()
+
+    # Telemetry last, the newest sample becomes the dictionary's template and pulses are sent the most
+    return [row["payload"].encode("utf-8") for row in [*reversed(sessions), *reversed(telemetry)]]
+
+
+class CompressionEngine:
+    """
+    Compresses EMM payloads with either standard gzip or zlib with a preset dictionary.
+
+    For the dictionary method a compressor is primed once per level and copied for each
+    call, which saves loading the dictionary into a new compressor every time.
+    The level is chosen per payload by select_compression_level() unless a fixed one is set.
+
+    The dictionary method produces a zlib stream (Content-Encoding: deflate) that can only
+    be read with the same dictionary, the header X-Compression-Dictionary carries its
+    Adler-32, the same ID the zlib stream header references.
+    """
+
+    GZIP = "gzip"
+    ZLIB_DICT = "zlib-dict"
+
+    def __init__(self, method: str = GZIP, dictionary: bytes = b"", level: Optional[int] = None):
+        if method == self.ZLIB_DICT and not dictionary:
+            raise ValueError("The zlib-dict compression method needs a preset dictionary")
+
+        self.method = method
+        self.dictionary = dictionary if method == self.ZLIB_DICT else b""
+        self.level = level
+
+        self._lock = threading.Lock()
+        self._templates: Dict[int, Any] = {}
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """The HTTP headers describing the compressed body."""
+
+        if self.method == self.ZLIB_DICT:
+            return {"Content-Encoding": "deflate", "X-Compression-Dictionary": f"{zlib.adler32(self.dictionary):08x}"}
+
+        return {"Content-Encoding": "gzip"}
+
+    def _get_compressor(self, level: int):
+        if self.method != self.ZLIB_DICT:
+            # 16 + MAX_WBITS writes a gzip header and trailer, a fresh compressor is as cheap as a copy
+            return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+        with self._lock:
+            template = self._templates.get(level)
+
+            if template is None:
+                template = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, zdict=self.dictionary)
+                self._templates[level] = template
+
+            return template.copy()
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress one payload.
+
+        Args:
+            data: The uncompressed payload
+        Returns:
+            The compressed payload
+        """
+
+        level = self.level if self.level is not None else select_compression_level(len(data))
+        compressor = self._get_compressor(level)
+
+        return compressor.compress(data) + compressor.flush()
+
+
+def create_compression_engine(config) -> CompressionEngine:
+    """
+    Create the compression engine for EMM payloads, configured from [EmmSettings].
+    Falls back to gzip if the dictionary method is configured but the dictionary can't be read.
+
+    Args:
+        config: Dictionary containing configuration values
+    Returns:
+        The configured CompressionEngine
+    """
+
+    emm_settings = config["EmmSettings"]
+    method = emm_settings.get("CompressionMethod", CompressionEngine.GZIP).lower()
+    level_setting = emm_settings.get("CompressionLevel", "adaptive").lower()
+    level = None if level_setting == "adaptive" else max(1, min(9, int(level_setting)))
+
+    if method == CompressionEngine.ZLIB_DICT:
+        dictionary_path = emm_settings.get("CompressionDictionaryFile", "")
+
+        try:
+            with open(dictionary_path, "rb") as dictionary_file:
+                return CompressionEngine(method, dictionary_file.read(PRESET_DICTIONARY_MAX_BYTES), level)
+
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not load the compression dictionary '{dictionary_path}', using gzip: {e}")
+
+    return CompressionEngine(CompressionEngine.GZIP, level=level)
+
+
+##########################################################
+############# END PAYLOAD COMPRESSION ENGINE #############
+##########################################################
+
+
+####################################################
+############# TELEMETRY DELTA ENCODING #############
+####################################################
+
+
+def parse_metric_tolerances(value: str) -> Dict[str, float]:
+    """
+    Parse a "metric:tolerance" comma separated list, e.g. "u1:0.5,u2:0.5,*:0".
+    The "*" entry is the tolerance of every numeric metric that isn't listed.
+
+    Args:
+        value: The raw config value
+    Returns:
+        Dict of metric name -> absolute tolerance
+    """
+
+    tolerances: Dict[str, float] = {}
+
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+
+        try:
+            metric, tolerance = entry.split(":", 1)
+            tolerances[metric.strip()] = abs(float(tolerance))
+
+        except ValueError:
+            logging.warning(f"Ignoring invalid telemetry tolerance entry: {entry}")
+
+    return tolerances
+
+
+class TelemetryDeltaEncoder:
+    """
+    Encodes telemetry pulses as the difference against the last snapshot EMM acknowledged.
+
+    Every device starts with a full keyframe. Later pulses only carry the top-level fields
+    and energy metrics that moved past their tolerance since the acknowledged snapshot,
+    plus the names of energy metrics that disappeared. A full keyframe is sent again
+    every keyframe_interval pulses, so EMM can't drift from the real state for long.
+    """
+
+    def __init__(self, keyframe_interval: int = 30, tolerances: Optional[Dict[str, float]] = None):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.tolerances = tolerances or {}
+
+        self._lock = threading.Lock()
+        self._acknowledged: Dict[str, Dict[str, Any]] = {}
+        self._pulses_since_keyframe: Dict[str, int] = {}
+
+    def _has_changed(self, key: str, old: Any, new: Any) -> bool:
+        # Booleans are ints in Python, they must never be compared with a tolerance
+        numeric = (
+            isinstance(old, (int, float)) and isinstance(new, (int, float))
+            and not isinstance(old, bool) and not isinstance(new, bool)
+        )
+
+        if numeric:
+            return abs(new - old) > self.tolerances.get(key, self.tolerances.get("*", 0.0))
+
+        return old != new
+
+    def _changed_fields(self, old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            key: value for key, value in new.items()
+            if key not in old or self._has_changed(key, old[key], value)
+        }
+
+    def encode(self, device_uid: str, pulse: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Encode the pulse of one device.
+
+        Args:
+            device_uid: Charging controller ID
+            pulse: The full pulse with a nested "energy" dict
+        Returns:
+            The full pulse with "keyframe": True, or the changed fields with "keyframe": False
+        """
+
+        with self._lock:
+            acknowledged = self._acknowledged.get(device_uid)
+            pulses = self._pulses_since_keyframe.get(device_uid, 0) + 1
+            self._pulses_since_keyframe[device_uid] = pulses
+
+        if acknowledged is None or pulses >= self.keyframe_interval:
+            return {"keyframe": True, **pulse}
+
+        old_energy = acknowledged.get("energy", {})
+        new_energy = pulse.get("energy", {})
+
+        delta: Dict[str, Any] = {"keyframe": False}
+        delta.update(self._changed_fields(
+            {key: value for key, value in acknowledged.items() if key != "energy"},
+            {key: value for key, value in pulse.items() if key != "energy"},
+        ))
+
+        changed_energy = self._changed_fields(old_energy, new_energy)
+        if changed_energy:
+            delta["energy"] = changed_energy
+
+        removed = [key for key in old_energy if key not in new_energy]
+        if removed:
+            delta["removed"] = removed
+
+        return delta
+
+    def acknowledge(self, device_uid: str, pulse: Dict[str, Any], encoded: Dict[str, Any]) -> None:
+        """
+        Remember the pulse EMM accepted as the base of the next delta.
+
+        Args:
+            device_uid: Charging controller ID
+            pulse: The full pulse that was encoded
+            encoded: What encode() returned for it
+        """
+
+        with self._lock:
+            if encoded.get("keyframe"):
+                self._acknowledged[device_uid] = pulse
+                self._pulses_since_keyframe[device_uid] = 0
+                return
+
+            acknowledged = self._acknowledged.get(device_uid)
+            if acknowledged is None:
+                return
+
+            # Only the fields that were sent move the base, values within the
+            # tolerance stay at the acknowledged value so jitter can't accumulate
+            energy = dict(acknowledged.get("energy", {}))
+            energy.update(encoded.get("energy", {}))
+            for key in encoded.get("removed", []):
+                energy.pop(key, None)
+
+            updated = {**acknowledged}
+            updated.update({key: value for key, value in encoded.items() if key not in ("keyframe", "energy", "removed")})
+            updated["energy"] = energy
+
+            self._acknowledged[device_uid] = updated
+
+    def reset(self, device_uid: Optional[str] = None) -> None:
+        """
+        Forget the acknowledged snapshots, so the next pulse is a keyframe.
+
+        Args:
+            device_uid: Charging controller ID, None resets every device
+        """
+
+        with self._lock:
+            if device_uid is None:
+                self._acknowledged.clear()
+                self._pulses_since_keyframe.clear()
+            else:
+                self._acknowledged.pop(device_uid, None)
+                self._pulses_since_keyframe.pop(device_uid, None)
+
+
+class PulseCadencePolicy:
+    """
+    Decides which devices are due for a telemetry pulse.
+
+    Idle devices (IEC 61851 state A) pulse every idle_interval seconds, every other device
+    every active_interval seconds. A device is also due right away after trigger(), which
+    the callers use for state transitions, and once its power moved by more than
+    power_change_threshold watts since its last pulse.
+    """
+
+    def __init__(self, active_interval: float, idle_interval: float, power_change_threshold: float):
+        self.active_interval = active_interval
+        self.idle_interval = max(active_interval, idle_interval)
+        self.power_change_threshold = power_change_threshold
+
+        self._lock = threading.Lock()
+        self._last_pulse: Dict[str, float] = {}
+        self._pulsed_power: Dict[str, float] = {}
+        self._triggered: set = set()
+
+    def interval(self, iec_61851_state: Optional[str]) -> float:
+        """The pulse interval of a device in the given state."""
+
+        return self.idle_interval if iec_61851_state and iec_61851_state.startswith("A") else self.active_interval
+
+    def trigger(self, device_uid: str) -> None:
+        """Make the device due for an out-of-band pulse."""
+
+        with self._lock:
+            self._triggered.add(device_uid)
+
+    def observe_power(self, device_uid: str, watts: float) -> bool:
+        """
+        Compare the current power with the power at the device's last pulse.
+
+        Returns:
+            True if the change triggered an out-of-band pulse
+        """
+
+        with self._lock:
+            pulsed_power = self._pulsed_power.get(device_uid)
+
+            if pulsed_power is None or device_uid in self._triggered:
+                return False
+
+            if abs(watts - pulsed_power) > self.power_change_threshold:
+                self._triggered.add(device_uid)
+                return True
+
+        return False
+
+    def triggered_devices(self) -> Set[str]:
+        """The devices currently due for an out-of-band pulse."""
+
+        with self._lock:
+            return set(self._triggered)
+
+    def is_due(self, device_uid: str, iec_61851_state: Optional[str], now: Optional[float] = None) -> bool:
+        """True if the device was triggered or its interval has passed since its last pulse."""
+
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            if device_uid in self._triggered:
+                return True
+
+            last_pulse = self._last_pulse.get(device_uid)
+
+        # Half a second of slack, so timer jitter doesn't push a device back by a whole heartbeat tick
+        return last_pulse is None or now - last_pulse >= self.interval(iec_61851_state) - 0.5
+
+    def mark_pulsed(self, device_uid: str, watts: Optional[float] = None, now: Optional[float] = None) -> None:
+        """Record that a pulse of the device was sent, with its power at that moment."""
+
+        with self._lock:
+            self._last_pulse[device_uid] = time.monotonic() if now is None else now
+            self._triggered.discard(device_uid)
+
+            if watts is not None:
+                self._pulsed_power[device_uid] = watts
+
+
+########################################################
+############# END TELEMETRY DELTA ENCODING #############
+########################################################
+
+
+#####################################################
+############# BINARY TELEMETRY ENCODING #############
+#####################################################
+
+
+# Content type of the binary telemetry payloads
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+# Most decimal places a float column is scaled by to send it as integers
+COLUMNAR_MAX_DECIMALS = 6
+
+# Marks a key a controller doesn't have while the columns are built, a None value is sent as an explicit null
+_ABSENT = object()
+
+
+def _msgpack_pack(value: Any, out: bytearray) -> None:
+    if value is None:
+        out.append(0xc0)
+
+    elif value is True or value is False:
+        out.append(0xc3 if value else 0xc2)
+
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -0x20 <= value < 0:
+            out.append(value & 0xff)
+        elif 0 <= value <= 0xffffffff:
+            out += struct.pack(">BB", 0xcc, value) if value <= 0xff else struct.pack(">BH", 0xcd, value) if value <= 0xffff else struct.pack(">BI", 0xce, value)
+        elif -0x80000000 <= value < 0:
+            out += struct.pack(">Bb", 0xd0, value) if value >= -0x80 else struct.pack(">Bh", 0xd1, value) if value >= -0x8000 else struct.pack(">Bi", 0xd2, value)
+        else:
+            out += struct.pack(">BQ", 0xcf, value) if value > 0 else struct.pack(">Bq", 0xd3, value)
+
+    elif isinstance(value, float):
+        out += struct.pack(">Bd", 0xcb, value)
+
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        length = len(data)
+        out += bytes([0xa0 | length]) if length < 32 else struct.pack(">BB", 0xd9, length) if length <= 0xff else struct.pack(">BH", 0xda, length) if length <= 0xffff else struct.pack(">BI", 0xdb, length)
+        out += data
+
+    elif isinstance(value, (bytes, bytearray)):
+        length = len(value)
+        out += struct.pack(">BB", 0xc4, length) if length <= 0xff else struct.pack(">BH", 0xc5, length) if length <= 0xffff else struct.pack(">BI", 0xc6, length)
+        out += value
+
+    elif isinstance(value, (list, tuple)):
+        length = len(value)
+        out += bytes([0x90 | length]) if length < 16 else struct.pack(">BH", 0xdc, length) if length <= 0xffff else struct.pack(">BI", 0xdd, length)
+        for item in value:
+            _msgpack_pack(item, out)
+
+    elif isinstance(value, dict):
+        length = len(value)
+        out += bytes([0x80 | length]) if length < 16 else struct.pack(">BH", 0xde, length) if length <= 0xffff else struct.pack(">BI", 0xdf, length)
+        for key, item in value.items():
+            _msgpack_pack(key, out)
+            _msgpack_pack(item, out)
+
+    else:
+        raise TypeError(f"Object of type {type(value).__name__} can't be packed")
+
+
+def msgpack_pack(value: Any) -> bytes:
+    """
+    Serialise JSON-like data (None, bool, int, float, str, bytes, list, dict) to MessagePack.
+    Only the standard MessagePack types are used, so any MessagePack library can read it.
+
+    Args:
+        value: The data to serialise
+    Returns:
+        The MessagePack bytes
+    """
+
+    out = bytearray()
+    _msgpack_pack(value, out)
+
+    return bytes(out)
+
+
+# Fixed width types: marker -> struct format
+_MSGPACK_FIXED = {
+    0xcc: ">B", 0xcd: ">H", 0xce: ">I", 0xcf: ">Q",
+    0xd0: ">b", 0xd1: ">h", 0xd2: ">i", 0xd3: ">q",
+    0xca: ">f", 0xcb: ">d",
+}
+
+# Length prefixed types: marker -> (struct format of the length, kind)
+_MSGPACK_SIZED = {
+    0xd9: (">B", "str"), 0xda: (">H", "str"), 0xdb: (">I", "str"),
+    0xc4: (">B", "bin"), 0xc5: (">H", "bin"), 0xc6: (">I", "bin"),
+    0xdc: (">H", "array"), 0xdd: (">I", "array"),
+    0xde: (">H", "map"), 0xdf: (">I", "map"),
+}
+
+
+def _msgpack_unpack(data: bytes, offset: int) -> Tuple[Any, int]:
+    marker = data[offset]
+    offset += 1
+
+    if marker < 0x80:
+        return marker, offset
+    if marker >= 0xe0:
+        return marker - 0x100, offset
+    if marker == 0xc0:
+        return None, offset
+    if marker in (0xc2, 0xc3):
+        return marker == 0xc3, offset
+
+    if marker in _MSGPACK_FIXED:
+        fmt = _MSGPACK_FIXED[marker]
+        return struct.unpack_from(fmt, data, offset)[0], offset + struct.calcsize(fmt)
+
+    if 0xa0 <= marker <= 0xbf:
+        kind, length = "str", marker & 0x1f
+    elif 0x90 <= marker <= 0x9f:
+        kind, length = "array", marker & 0x0f
+    elif 0x80 <= marker <= 0x8f:
+        kind, length = "map", marker & 0x0f
+    elif marker in _MSGPACK_SIZED:
+        fmt, kind = _MSGPACK_SIZED[marker]
+        length = struct.unpack_from(fmt, data, offset)[0]
+        offset += struct.calcsize(fmt)
+    else:
+        raise ValueError(f"Unsupported MessagePack type 0x{marker:02x}")
+
+    if kind == "str":
+        return data[offset:offset + length].decode("utf-8"), offset + length
+
+    if kind == "bin":
+        return bytes(data[offset:offset + length]), offset + length
+
+    if kind == "array":
+        items = []
+        for _ in range(length):
+            item, offset = _msgpack_unpack(data, offset)
+            items.append(item)
+        return items, offset
+
+    result = {}
+    for _ in range(length):
+        key, offset = _msgpack_unpack(data, offset)
+        result[key], offset = _msgpack_unpack(data, offset)
+    return result, offset
+
+
+def msgpack_unpack(data: bytes) -> Any:
+    """
+    Deserialise MessagePack bytes produced by msgpack_pack().
+
+    Args:
+        data: The MessagePack bytes
+    Returns:
+        The decoded data
+    """
+
+    value, offset = _msgpack_unpack(data, 0)
+
+    if offset != len(data):
+        raise ValueError(f"{len(data) - offset} trailing bytes after MessagePack value")
+
+    return value
+
+
+def _get_column_scale(column: List[Any]) -> Optional[int]:
+    """
+    Number of decimal places that turn every float of the column into an exact integer,
+    None if the column holds anything but floats and None or needs too many decimals.
+    """
+
+    values = [value for value in column if value is not None]
+
+    if not values or not all(type(value) is float for value in values):
+        return None
+
+    for decimals in range(COLUMNAR_MAX_DECIMALS + 1):
+        factor = 10 ** decimals
+
+        if all(round(value * factor) / factor == value for value in values):
+            return decimals
+
+    return None
+
+
+def encode_columnar_telemetry(payload: Dict[str, Any]) -> bytes:
+    """
+    Encodes a telemetry payload ({"type": ..., "controllers": {device_uid: pulse}}) as
+    MessagePack with the controllers laid out column-wise. The key schema is sent once
+    per batch, "keys" for the top-level pulse fields and "energy_keys" for the energy metrics,
+    followed by one column per key in the same order.
+    Every column holds one value per device in the order of "devices", a key the device
+    doesn't have is None. Keys that are present with a None value are listed in "nulls"
+    (column index -> device indexes), so a delta pulse can clear a field EMM still holds.
+    Float columns with few decimals (230.1 V, 16.25 A) are sent as integers scaled by
+    10 ** scale, which is both smaller and compresses far better than binary doubles,
+    "scales" holds the scale of every column or None for columns sent as they are.
+
+    Args:
+        payload: The telemetry payload, other top-level keys are copied as they are
+    Returns:
+        The MessagePack bytes
+    """
+
+    controllers = payload.get("controllers", {})
+    devices = list(controllers)
+
+    # Union of the keys in first-seen order, the controllers usually share the same keys
+    keys: Dict[str, None] = {}
+    energy_keys: Dict[str, None] = {}
+
+    for pulse in controllers.values():
+        for key, value in pulse.items():
+            if key == "energy" and isinstance(value, dict):
+                energy_keys.update(dict.fromkeys(value))
+            else:
+                keys[key] = None
+
+    rows = [[pulse.get(key, _ABSENT) for key in keys] for pulse in controllers.values()]
+
+    for row, pulse in zip(rows, controllers.values()):
+        energy = pulse.get("energy", {})
+        row += [energy.get(metric, _ABSENT) for metric in energy_keys]
+
+    columns = [list(column) for column in zip(*rows)] if rows else []
+
+    # Explicit None values, told apart from absent keys before both are packed as nil
+    nulls: Dict[int, List[int]] = {}
+
+    for index, column in enumerate(columns):
+        null_devices = [device_index for device_index, value in enumerate(column) if value is None]
+
+        if null_devices:
+            nulls[index] = null_devices
+
+        columns[index] = [None if value is _ABSENT else value for value in column]
+
+    scales = [_get_column_scale(column) for column in columns]
+
+    for index, scale in enumerate(scales):
+        if scale is not None:
+            columns[index] = [None if value is None else round(value * 10 ** scale) for value in columns[index]]
+
+    columnar = {key: value for key, value in payload.items() if key != "controllers"}
+    columnar.update({
+        "layout": "columnar",
+        "devices": devices,
+        "keys": list(keys),
+        "energy_keys": list(energy_keys),
+        "scales": scales,
+        "nulls": nulls,
+        "columns": columns,
+    })
+
+    return msgpack_pack(columnar)
+
+
+def decode_columnar_telemetry(data: bytes) -> Dict[str, Any]:
+    """
+    Decodes a payload encoded by encode_columnar_telemetry() back to the
+    {"type": ..., "controllers": {device_uid: pulse}} shape. Absent keys are left out,
+    keys listed in "nulls" are restored with a None value.
+
+    Args:
+        data: The MessagePack bytes
+    Returns:
+        The telemetry payload
+    """
+
+    columnar = msgpack_unpack(data)
+    devices = columnar.pop("devices")
+    keys = columnar.pop("keys")
+    energy_keys = columnar.pop("energy_keys", [])
+    columns = columnar.pop("columns")
+    scales = columnar.pop("scales", None) or [None] * len(columns)
+    nulls = columnar.pop("nulls", None) or {}
+    columnar.pop("layout", None)
+
+    controllers: Dict[str, Dict[str, Any]] = {device: {} for device in devices}
+
+    for index, (scale, column) in enumerate(zip(scales, columns)):
+        null_devices = set(nulls.get(index, ()))
+
+        for device_index, (device, value) in enumerate(zip(devices, column)):
+            if value is None and device_index not in null_devices:
+                continue
+
+            if scale is not None and value is not None:
+                value = value / 10 ** scale
+
+            if index < len(keys):
+                controllers[device][keys[index]] = value
+            else:
+                controllers[device].setdefault("energy", {})[energy_keys[index - len(keys)]] = value
+
+    columnar["controllers"] = controllers
+
+    return columnar
+
+
+#########################################################
+############# END BINARY TELEMETRY ENCODING #############
+#########################################################
+
+
+##################################################
+############# SESSION TIMER TRACKING #############
+##################################################
+
+
+class SessionTimerTracker:
+    """
+    Keeps the connected and charge time of every charging controller up to date from
+    the IEC 61851 state transitions, so reading the timers never needs the REST API.
+
+    Each device holds the timer values at its last anchor point and the state since then,
+    the current values are extrapolated from the monotonic clock. A new connection resets
+    both timers to 0, while the vehicle is disconnected the values of the last session stay.
+    resync() replaces the local values with the controller's own, e.g. at startup.
+    """
+
+    def __init__(self, connected_states: List[str], charging_states: List[str], clock: Callable[[], float] = time.monotonic):
+        self.connected_states = set(connected_states)
+        self.charging_states = set(charging_states)
+
+        # The monotonic clock the timers are extrapolated from, replaceable for tests
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._devices: Dict[str, Dict[str, Any]] = {}
+
+    def _advance(self, device: Dict[str, Any], now: float) -> None:
+        # Fold the time since the anchor into the base values, must be called with the lock held
+        elapsed = max(0.0, now - device["anchor"])
+
+        if device["iec_61851_state"] in self.connected_states:
+            device["connected_time_sec"] += elapsed
+
+        if device["iec_61851_state"] in self.charging_states:
+            device["charge_time_sec"] += elapsed
+
+        device["anchor"] = now
+
+    def on_state(self, device_uid: str, iec_61851_state: str, at: Optional[float] = None) -> None:
+        """
+        Record a state reported by the controller. Cheap enough for the MQTT callback.
+
+        Args:
+            device_uid: Charging controller ID
+            iec_61851_state: The reported IEC 61851 state, e.g. "B1"
+            at: Monotonic clock reading of the report, defaults to now
+        """
+
+        now = self._clock() if at is None else at
+
+        with self._lock:
+            device = self._devices.get(device_uid)
+
+            # A device seen for the first time has unknown timers until it's resynced
+            if device is None:
+                self._devices[device_uid] = {
+                    "iec_61851_state": iec_61851_state,
+                    "connected_time_sec": 0.0,
+                    "charge_time_sec": 0.0,
+                    "anchor": now,
+                    "needs_resync": True,
+                    "synced_at": None,
+                }
+                return
+
+            self._advance(device, now)
+
+            was_connected = device["iec_61851_state"] in self.connected_states
+            if not was_connected and iec_61851_state in self.connected_states:
+                device["connected_time_sec"] = 0.0
+                device["charge_time_sec"] = 0.0
+
+            device["iec_61851_state"] = iec_61851_state
+
+    def resync(self, device_uid: str, iec_61851_state: str, connected_time_sec: float, charge_time_sec: float, tolerance: float = 0) -> bool:
+        """
+        Replace the local timers with the values read from the controller.
+
+        Args:
+            device_uid: Charging controller ID
+            iec_61851_state: The IEC 61851 state reported by the controller
+            connected_time_sec: The controller's connected time
+            charge_time_sec: The controller's charge time
+            tolerance: Allowed difference in seconds before the local values count as drifted
+        Returns:
+            True if the local values had drifted past the tolerance, False otherwise
+        """
+
+        now = self._clock()
+
+        with self._lock:
+            device = self._devices.get(device_uid)
+            drifted = False
+
+            if device is not None and not device["needs_resync"]:
+                self._advance(device, now)
+                drifted = (
+                    device["iec_61851_state"] != iec_61851_state
+                    or abs(device["connected_time_sec"] - connected_time_sec) > tolerance
+                    or abs(device["charge_time_sec"] - charge_time_sec) > tolerance
+                )
+
+            self._devices[device_uid] = {
+                "iec_61851_state": iec_61851_state,
+                "connected_time_sec": float(connected_time_sec),
+                "charge_time_sec": float(charge_time_sec),
+                "anchor": now,
+                "needs_resync": False,
+                "synced_at": now,
+            }
+
+        return drifted
+
+    def mark_for_resync(self, device_uid: Optional[str] = None) -> None:
+        """
+        Flag the device, or every device if None, to be resynced, e.g. after transitions may have been missed.
+        """
+
+        with self._lock:
+            for uid, device in self._devices.items():
+                if device_uid is None or uid == device_uid:
+                    device["needs_resync"] = True
+
+    def needs_resync(self, device_uid: str) -> bool:
+        """True if the device is unknown or its local timers can't be trusted."""
+
+        with self._lock:
+            device = self._devices.get(device_uid)
+            return device is None or device["needs_resync"]
+
+    def audit_due(self, device_uid: str, interval: float) -> bool:
+        """True if the device was last resynced more than interval seconds ago."""
+
+        with self._lock:
+            device = self._devices.get(device_uid)
+            if device is None or device["synced_at"] is None:
+                return True
+
+            return self._clock() - device["synced_at"] >= interval
+
+    def snapshot(self, device_uid: str) -> Optional[Dict[str, Any]]:
+        """
+        Current state and timers of the device, computed from memory only.
+
+        Args:
+            device_uid: Charging controller ID
+        Returns:
+            Dict with iec_61851_state, connected_time_sec and charge_time_sec, None if no state was seen yet
+        """
+
+        now = self._clock()
+
+        with self._lock:
+            device = self._devices.get(device_uid)
+            if device is None:
+                return None
+
+            elapsed = max(0.0, now - device["anchor"])
+            state = device["iec_61851_state"]
+
+            connected_time = device["connected_time_sec"] + (elapsed if state in self.connected_states else 0.0)
+            charge_time = device["charge_time_sec"] + (elapsed if state in self.charging_states else 0.0)
+
+        return {
+            "iec_61851_state": state,
+            "connected_time_sec": int(connected_time),
+            "charge_time_sec": int(charge_time),
+        }
+
+
+######################################################
+############# END SESSION TIMER TRACKING #############
+######################################################
+
+
+#################################################
+############# ENERGY SAMPLE HISTORY #############
+#################################################
+
+
+from collections import deque
+from decimal import Decimal
+
+
+def _round_like(value: float, *samples: Any) -> Any:
+    """
+    Round an interpolated value to the type and precision of the samples it was computed from.
+    """
+
+    if all(isinstance(sample, int) and not isinstance(sample, bool) for sample in samples):
+        return int(round(value))
+
+    # The most decimal places any of the samples has, e.g. 2 for 1234.56
+    decimals = max((max(0, -Decimal(repr(sample)).as_tuple().exponent) for sample in samples if isinstance(sample, float)), default=0)
+
+    return round(value, decimals)
+
+
+class EnergySampleHistory:
+    """
+    Short history of the raw energy messages of every charging controller with their arrival
+    time, so the meter reading at a session boundary doesn't need the REST API.
+
+    Messages are kept as received, only the ones around a requested time are parsed.
+    The energy counter is interpolated linearly between the samples on both sides of the
+    requested time and rounded back to the meter's precision: an integer counter stays
+    an integer, a decimal one keeps the decimal places the meter reports. The other
+    metrics come from the nearest sample.
+    """
+
+    def __init__(self, max_samples: int = 30, max_age: float = 30.0):
+        self.max_samples = max_samples
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+
+    def add(self, key: str, payload: bytes, received_at: Optional[float] = None) -> None:
+        """
+        Store a raw energy message, the oldest one is dropped once the history is full.
+
+        Args:
+            key: The device's energy topic or UID
+            payload: The raw JSON payload of the message
+            received_at: Unix time the message arrived, now if not set
+        """
+
+        received_at = time.time() if received_at is None else received_at
+
+        with self._lock:
+            samples = self._samples.get(key)
+
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.max_samples)
+
+            samples.append((received_at, payload))
+
+    def at(self, key: str, timestamp: float) -> Optional[Dict[str, Any]]:
+        """
+        The energy data of the device at the given time, in the same form as the
+        'energy' object of the REST API.
+
+        Args:
+            key: The device's energy topic or UID
+            timestamp: Unix time of the reading
+        Returns:
+            The energy data, None if there's no sample within max_age of the time
+        """
+
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+
+        before = next((sample for sample in reversed(samples) if sample[0] <= timestamp), None)
+        after = next((sample for sample in samples if sample[0] > timestamp), None)
+
+        if before is not None and timestamp - before[0] > self.max_age:
+            before = None
+
+        if after is not None and after[0] - timestamp > self.max_age:
+            after = None
+
+        try:
+            if before is None or after is None:
+                nearest = before or after
+                return json.loads(nearest[1]) if nearest is not None else None
+
+            before_data = json.loads(before[1])
+            after_data = json.loads(after[1])
+
+        except ValueError as e:
+            logging.error(f"Failed to parse a stored energy message of {key}: {e}")
+            return None
+
+        fraction = (timestamp - before[0]) / (after[0] - before[0])
+        energy = dict(before_data if fraction <= 0.5 else after_data)
+
+        try:
+            start_value = before_data["energy_real_power"]["value"]
+            end_value = after_data["energy_real_power"]["value"]
+            value = _round_like(start_value + (end_value - start_value) * fraction, start_value, end_value)
+            energy["energy_real_power"] = {**energy["energy_real_power"], "value": value}
+
+            # A numeric meter timestamp is interpolated along with the counter
+            start_ts, end_ts = before_data["timestamp"], after_data["timestamp"]
+            if isinstance(start_ts, (int, float)) and isinstance(end_ts, (int, float)):
+                interpolated_ts = start_ts + (end_ts - start_ts) * fraction
+                energy["timestamp"] = round(interpolated_ts) if isinstance(start_ts, int) else interpolated_ts
+
+        except (KeyError, TypeError) as e:
+            logging.warning(f"Could not interpolate the energy of {key}, using the nearest sample: {e}")
+
+        return energy
+
+
+#####################################################
+############# END ENERGY SAMPLE HISTORY #############
+#####################################################
+
+
+###################################################
+############# SQLITE QUEUE MANAGEMENT #############
+###################################################
+
+import sqlite3
+import json
+
+from concurrent.futures import Future
+
+# The queue database file name 
+QUEUE_DB_NAME = "data_queue.db"
+
+# The energy time series live in their own file next to the queue database, attached to every
+# connection as the 'timeseries' schema, so the history never counts towards the queue's size limit
+TIMESERIES_DB_NAME = "energy_timeseries.db"
+
+# The order in which the events of one charging session must reach EMM
+QUEUE_EVENT_ORDER = {"start": 0, "rfid": 1, "end": 2}
+
+# Set by add_to_queue() whenever an item is queued, the session sender waits on it instead of polling
+QUEUE_WAKEUP_EVENT = threading.Event()
+
+
+def _get_queue_db_path(config) -> str:
+    """
+    Constructs the full file path for the SQLite queue database.
+
+    Args:
+        config: Dictionary containing configuration values, specifically 'AppSettings'.
+    Returns:
+        The full path to the SQLite database file.
+    """
+
+    data_folder_path = config["AppSettings"]["FileFolder"]
+    return os.path.join(data_folder_path, QUEUE_DB_NAME)
+
+
+def _get_timeseries_db_path(config) -> str:
+    """
+    Constructs the full file path for the SQLite energy time series database.
+
+    Args:
+        config: Dictionary containing configuration values, specifically 'AppSettings'.
+    Returns:
+        The full path to the SQLite database file.
+    """
+
+    data_folder_path = config["AppSettings"]["FileFolder"]
+    return os.path.join(data_folder_path, TIMESERIES_DB_NAME)
+
+
+# Every thread keeps its own long-lived connection per database file, see get_db_connection()
+_DB_THREAD_LOCAL = threading.local()
+
+# All open connections by (thread ident, database path), used to close them on shutdown
+_DB_CONNECTIONS: Dict[Tuple[int, str], sqlite3.Connection] = {}
+_DB_CONNECTIONS_LOCK = threading.Lock()
+
+
+def _open_db_connection(db_path: str, timeseries_db_path: str) -> sqlite3.Connection:
+    """
+    Opens a new connection to the database file, attaches the energy time series
+    database and applies the per-connection settings.
+
+    Args:
+        db_path: The full path to the SQLite database file.
+        timeseries_db_path: The full path to the energy time series database file.
+    Returns:
+        The configured connection.
+    """
+
+    # 20-second timeout to handle concurrency. The connection is only used by the thread that opened it,
+    # other threads only close it on shutdown, which needs check_same_thread disabled.
+    conn = sqlite3.connect(db_path, timeout=20, check_same_thread=False, cached_statements=256)
+
+    # synchronous=NORMAL provides the best balance between performance and safety in WAL mode
+    conn.execute("PRAGMA synchronous=NORMAL;")
+
+    # Keep temporary tables and indexes in memory instead of writing them to the flash
+    conn.execute("PRAGMA temp_store=MEMORY;")
+
+    # Truncate the WAL file back to 4 MB after checkpoints, so a burst of writes doesn't leave it large
+    conn.execute("PRAGMA journal_size_limit=4194304;")
+
+    # The settings of an attached database are set separately, the journal mode is stored in its file
+    conn.execute("ATTACH DATABASE ? AS timeseries", (timeseries_db_path,))
+    conn.execute("PRAGMA timeseries.synchronous=NORMAL;")
+    conn.execute("PRAGMA timeseries.journal_size_limit=4194304;")
+
+    # Make SQLite return dictionaries
+    conn.row_factory = sqlite3.Row
+
+    return conn
+
+
+def _prune_dead_thread_connections() -> None:
+    """
+    Closes the connections of threads that have finished (e.g. threading.Timer threads).
+    Must be called with _DB_CONNECTIONS_LOCK held.
+
+    Returns:
+        None
+    """
+
+    alive_threads = {thread.ident for thread in threading.enumerate()}
+
+    for key in [key for key in _DB_CONNECTIONS if key[0] not in alive_threads]:
+        _DB_CONNECTIONS.pop(key).close()
+
+
+def get_db_connection(config):
+    """
+    Returns the calling thread's long-lived connection with optimized per-session settings.
+    The connection is opened and tuned on the first call in a thread and reused afterwards,
+    so the prepared statement cache stays warm across calls. Use it as a context manager
+    to commit (or roll back) a transaction, don't close it, see close_db_connections().
+    """
+
+    db_path = _get_queue_db_path(config)
+
+    connections = getattr(_DB_THREAD_LOCAL, "connections", None)
+
+    if connections is None:
+        connections = _DB_THREAD_LOCAL.connections = {}
+
+    conn = connections.get(db_path)
+
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = _open_db_connection(db_path, _get_timeseries_db_path(config))
+        connections[db_path] = conn
+
+        with _DB_CONNECTIONS_LOCK:
+            _prune_dead_thread_connections()
+
+            # A new thread can reuse the identifier of a finished one, replace its stale connection
+            stale_conn = _DB_CONNECTIONS.get((threading.get_ident(), db_path))
+
+            if stale_conn is not None:
+                stale_conn.close()
+
+            _DB_CONNECTIONS[(threading.get_ident(), db_path)] = conn
+
+    return conn
+
+
+def close_db_connections() -> None:
+    """
+    Closes all the long-lived database connections of all threads. Called on shutdown,
+    after the worker threads have stopped.
+
+    Returns:
+        None
+    """
+
+    with _DB_CONNECTIONS_LOCK:
+        for conn in _DB_CONNECTIONS.values():
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logging.error(f"Failed to close database connection: {e}")
+
+        _DB_CONNECTIONS.clear()
+
+    # Drop the calling thread's references as well, so it would open a fresh connection if needed
+    _DB_THREAD_LOCAL.connections = {}
+
+
+def _get_table_columns(cursor, table_name: str) -> List[str]:
+    """
+    Returns the column names of a database table, used for migrating older database files.
+
+    Args:
+        cursor: An open SQLite cursor.
+        table_name: Name of the table.
+    Returns:
+        A list of column names, empty if the table doesn't exist.
+    """
+
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _parse_rfid_timestamp(timestamp: Optional[str]) -> Optional[int]:
+    """
+    Converts the ISO timestamp of an RFID scan to the unix epoch seconds stored in rfid_event.ts.
+    Timestamps without a timezone are local time, like the ones the controller publishes.
+
+    Args:
+        timestamp: ISO timestamp, e.g. '2026-03-13T08:36:47'
+    Returns:
+        The unix epoch seconds, None if the timestamp isn't valid.
+    """
+
+    try:
+        return int(datetime.fromisoformat(timestamp).timestamp())
+
+    except (TypeError, ValueError):
+        return None
+
+
+def _migrate_legacy_rfid_events(cursor) -> None:
+    """
+    Copies the scans of an 'rfid_event' table created by an older version, which stored the
+    scan time as ISO text only, into the current table and drops the old one. Duplicate scans
+    are merged, a claimed copy is kept over an unclaimed one, and scans with an invalid
+    timestamp, which could never be paired, are dropped.
+
+    Args:
+        cursor: An open SQLite cursor, the old table is renamed to 'rfid_event_legacy'.
+    """
+
+    cursor.execute("""
+        SELECT id, tag, timestamp, claimed_by_session_id, created_at FROM rfid_event_legacy
+        ORDER BY claimed_by_session_id IS NULL, id
+    """)
+
+    rows = [
+        (row["id"], row["tag"], row["timestamp"], _parse_rfid_timestamp(row["timestamp"]), row["claimed_by_session_id"], row["created_at"])
+        for row in cursor.fetchall()
+    ]
+
+    cursor.executemany("""
+        INSERT OR IGNORE INTO rfid_event (id, tag, timestamp, ts, claimed_by_session_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [row for row in rows if row[3] is not None])
+
+    migrated_rows = cursor.execute("SELECT COUNT(*) FROM rfid_event").fetchone()[0]
+    cursor.execute("DROP TABLE rfid_event_legacy")
+
+    logging.info(f"Migrated 'rfid_event' table: {migrated_rows} scans with epoch timestamps, {len(rows) - migrated_rows} duplicate or invalid scans removed")
+
+
+def initialize_queue_db(config) -> None:
+    """
+    Initializes the SQLite database for the charging session queue.
+    Creates the 'charging_session' table if it does not already exist.
+
+    Args:
+        config: Dictionary containing configuration values, specifically 'AppSettings'.
+    Returns:
+        None
+    """
+
+    db_path = _get_queue_db_path(config)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    # Enable WAL mode for concurrent database writes
+    raw_conn = sqlite3.connect(db_path, timeout=20)
+
+    # Incremental auto-vacuum lets the retention job return free pages to the filesystem.
+    # Switching an existing database file over requires a one-time full VACUUM.
+    if raw_conn.execute("PRAGMA auto_vacuum;").fetchone()[0] != 2:
+        raw_conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+        raw_conn.execute("VACUUM;")
+        logging.info("Enabled incremental auto-vacuum for the SQLite queue database")
+
+    raw_conn.execute("PRAGMA journal_mode=WAL;")
+    raw_conn.commit()
+    raw_conn.close()
+
+    # Before the first connection attaches it
+    _initialize_timeseries_db(config)
+
+    with get_db_connection(config) as conn:
+        cursor = conn.cursor()
+
+        # 'charging_session' database table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS charging_session (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                charging_session_id TEXT NOT NULL,
+                device_uid TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                payload_deflate BLOB, -- pre-compressed payload, see compress_payload_prefix()
+                type TEXT NOT NULL, -- 'start' or 'end'
+                status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'sending', 'sent', 'failed', 'failed_unrecoverable'
+                attempts INTEGER DEFAULT 0,
+                last_attempt_at TEXT,
+                next_attempt_at TEXT, -- when a 'pending' or 'failed' row is due to be sent, lease expiry of a 'sending' row
+                created_at TEXT NOT NULL,
+                UNIQUE(charging_session_id, type)
+            )
+        """)
+
+        # Databases created by older versions don't have the retry scheduling column yet
+        if "next_attempt_at" not in _get_table_columns(cursor, "charging_session"):
+            cursor.execute("ALTER TABLE charging_session ADD COLUMN next_attempt_at TEXT")
+            cursor.execute("UPDATE charging_session SET next_attempt_at = created_at WHERE next_attempt_at IS NULL")
+
+            logging.info("Migrated 'charging_session' table: added 'next_attempt_at' column")
+
+        # Rows queued by older versions have no pre-compressed payload, the sender compresses them on the fly
+        if "payload_deflate" not in _get_table_columns(cursor, "charging_session"):
+            cursor.execute("ALTER TABLE charging_session ADD COLUMN payload_deflate BLOB")
+
+            logging.info("Migrated 'charging_session' table: added 'payload_deflate' column")
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_charging_session_id ON charging_session (charging_session_id);
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_charging_session_type ON charging_session (charging_session_id, type);
+        """)
+
+        # Partial index for the sender, only rows waiting to be sent (or leased by a sender lane) are indexed by their due time
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_charging_session_schedule ON charging_session (next_attempt_at, id)
+            WHERE status IN ('pending', 'failed', 'sending');
+        """)
+
+        # Databases created by older versions store the scan time as ISO text only, the table is rebuilt
+        rfid_columns = _get_table_columns(cursor, "rfid_event")
+
+        if rfid_columns and "ts" not in rfid_columns:
+            cursor.execute("DROP INDEX IF EXISTS idx_rfid_timestamp")
+            cursor.execute("ALTER TABLE rfid_event RENAME TO rfid_event_legacy")
+
+        # 'rfid_event' database table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rfid_event (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tag TEXT NOT NULL,
+                timestamp TEXT NOT NULL, -- the scan time as published by the controller
+                ts INTEGER NOT NULL, -- the scan time in unix epoch seconds, used for all lookups
+                claimed_by_session_id TEXT DEFAULT NULL,
+                created_at TEXT NOT NULL,
+                UNIQUE(tag, ts)
+            )
+        """)
+
+        if _get_table_columns(cursor, "rfid_event_legacy"):
+            _migrate_legacy_rfid_events(cursor)
+
+        # Covering index for the time range reads of the scan index and the retention
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rfid_ts ON rfid_event (ts, claimed_by_session_id, tag, timestamp);
+        """)
+
+        # 'device_status' database table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS device_status (
+                device_uid TEXT PRIMARY KEY,
+                status TEXT NOT NULL, -- 'connected', 'disconnected'
+                updated_at TEXT NOT NULL
+            )
+        """)
+
+        # 'controller_telemetry' database table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS controller_telemetry (
+                device_uid TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+
+        # 'telemetry_backlog' database table, pulses that couldn't be sent to EMM
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS telemetry_backlog (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                captured_at INTEGER NOT NULL, -- unix epoch seconds
+                resolution INTEGER NOT NULL, -- seconds covered by one row, grows as rows are downsampled
+                payload BLOB NOT NULL -- gzip compressed JSON of the controllers' pulses
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_telemetry_backlog_captured ON telemetry_backlog (captured_at);
+        """)
+
+    logging.info(f"Initialized SQLite queue database with WAL mode")
+
+
+def _initialize_timeseries_db(config) -> None:
+    """
+    Initializes the SQLite database of the energy time series, a separate file
+    attached to every queue database connection as the 'timeseries' schema.
+
+    Args:
+        config: Dictionary containing configuration values, specifically 'AppSettings'.
+    Returns:
+        None
+    """
+
+    raw_conn = sqlite3.connect(_get_timeseries_db_path(config), timeout=20)
+
+    # Set before the first table is created, so the retention job can return free pages to the filesystem
+    if raw_conn.execute("PRAGMA auto_vacuum;").fetchone()[0] != 2:
+        raw_conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+        raw_conn.execute("VACUUM;")
+
+    raw_conn.execute("PRAGMA journal_mode=WAL;")
+
+    with raw_conn:
+        cursor = raw_conn.cursor()
+
+        # Energy time series, every (device, metric) pair gets a small integer ID
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS timeseries_series (
+                id INTEGER PRIMARY KEY,
+                device_uid TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                UNIQUE (device_uid, metric)
+            )
+        """)
+
+        # Raw samples, kept for a short window only
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS timeseries_sample (
+                series_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL, -- unix epoch milliseconds
+                value REAL NOT NULL,
+                PRIMARY KEY (series_id, ts)
+            ) WITHOUT ROWID
+        """)
+
+        # Min/max/avg rollups, updated incrementally as samples are flushed
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS timeseries_rollup (
+                series_id INTEGER NOT NULL,
+                resolution INTEGER NOT NULL, -- bucket size in seconds
+                bucket INTEGER NOT NULL, -- unix epoch seconds of the bucket start
+                count INTEGER NOT NULL,
+                sum REAL NOT NULL,
+                min REAL NOT NULL,
+                max REAL NOT NULL,
+                PRIMARY KEY (series_id, resolution, bucket)
+            ) WITHOUT ROWID
+        """)
+
+    raw_conn.close()
+
+
+def save_rfid_event(config, tag: str, timestamp: str) -> Optional[Future]:
+    """
+    Stores every RFID scan in the in-memory RFID scan index, which wakes the sessions waiting
+    for a scan. The write is handed to the database writer, so the caller (the MQTT network
+    thread) never waits on the disk.
+
+    Returns:
+        A future resolved once the scan is committed, None if the scan was already stored.
+    """
+
+    return get_rfid_scan_index(config).add(tag, timestamp)
 
 
 def find_and_claim_rfid(config, session_id: str, start_ts: str):
     """
-    Finds the single unclaimed RFID tag closest to the start_timestamp 
-    within a window of -65 seconds to +65 seconds.
+    Finds the single unclaimed RFID tag closest to the start_timestamp 
+    within a window of -65 seconds to +65 seconds.
+    Never waits for a scan, see defer_rfid_pairing() for pairing with a scan that's yet to come.
+    """
+
+    return get_rfid_scan_index(config).claim(session_id, start_ts)
+
+
+def defer_rfid_pairing(config, session_id: str, start_ts: str, on_scan: Callable[[], None]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Claims the RFID tag closest to start_ts like find_and_claim_rfid(). If there's none yet,
+    the pairing is deferred: once a matching tag is scanned within [AppSettings] RfidPairingWaitSeconds,
+    on_scan() is called on the MQTT network thread and the tag is claimed with claim_deferred_rfid().
+    The caller never waits.
+
+    Args:
+        config: Dictionary containing configuration values
+        session_id: The charging session claiming the tag
+        start_ts: ISO timestamp the scan should be close to
+        on_scan: Called once a matching tag was scanned, it must not block
+    Returns:
+        Tuple of the tag and its timestamp if one was claimed right away, (None, None) otherwise
+    """
+
+    timeout = float(config["AppSettings"].get("RfidPairingWaitSeconds", 6))
+
+    return get_rfid_scan_index(config).claim_or_defer(session_id, start_ts, timeout, on_scan)
+
+
+def claim_deferred_rfid(config, session_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Claims the tag a deferred pairing was notified of, nothing if the pairing was cancelled.
+    """
+
+    return get_rfid_scan_index(config).claim_deferred(session_id)
+
+
+def get_claimed_rfid(config, session_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns the tag and its timestamp a session already claimed, (None, None) if it has none.
+    """
+
+    return get_rfid_scan_index(config).claimed_scan(session_id)
+
+
+def cancel_rfid_pairing(config, session_id: str) -> None:
+    """
+    Cancels the deferred RFID pairing of a session, if there's one.
+    """
+
+    get_rfid_scan_index(config).cancel_deferred(session_id)
+
+
+def add_to_queue(config, charging_session_id: str, device_uid: str, payload: Dict[str, Any], session_type: str) -> Future:
+    """
+    Adds a charging session event (start or end) to the SQLite queue.
+    If an entry with the same charging_session_id and type already exists,
+    its payload is updated, and its status is reset to 'pending' for re-transmission.
+    The session sender is notified through QUEUE_WAKEUP_EVENT once the item is committed.
+
+    Args:
+        config: Dictionary containing configuration values.
+        charging_session_id: The unique identifier for the charging session.
+        device_uid: The unique identifier of the charging device.
+        payload: A dictionary containing the full charging session data, which will be stored as a JSON string
+                 and as a pre-compressed deflate fragment.
+        session_type: The type of the session event, either 'start' or 'end'.
+    Returns:
+        A future resolved once the item is committed.
+    """
+    
+    # Convert payload dict to JSON string for storage, along with its compressed form for the sender
+    payload_json = json.dumps(payload)
+    payload_deflate = compress_payload_prefix(payload_json, select_compression_level(len(payload_json)))
+    current_time = datetime.now().isoformat()
+
+    def write(cursor) -> None:
+        # Check if a session with this charging_session_id and type already exists
+        # This is crucial to avoid duplicates when retrying `save_to_queue` due to other failures
+        cursor.execute("""
+            SELECT id FROM charging_session
+            WHERE charging_session_id = ? AND type = ?
+        """, (charging_session_id, session_type))
+
+        existing_entry = cursor.fetchone()
+
+        if existing_entry:
+            # If it exists, update it (e.g., if we are retrying an 'end' session that was already 'pending')
+            # For simplicity, we'll just update the payload and reset status to pending for re-transmission
+            cursor.execute("""
+                UPDATE charging_session
+                SET payload = ?, payload_deflate = ?, status = 'pending', attempts = 0, last_attempt_at = NULL, next_attempt_at = ?, created_at = ?
+                WHERE charging_session_id = ? AND type = ?
+            """, (payload_json, payload_deflate, current_time, current_time, charging_session_id, session_type))
+            logging.info(f"Updated existing charging session in queue: ID: {charging_session_id}, Type: {session_type}")
+        else:
+            # Otherwise, insert a new entry
+            cursor.execute("""
+                INSERT INTO charging_session (charging_session_id, device_uid, payload, payload_deflate, type, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (charging_session_id, device_uid, payload_json, payload_deflate, session_type, current_time, current_time))
+            logging.info(f"Added charging session to queue: ID: {charging_session_id}, Type: {session_type}")
+
+    future = submit_db_write(config, write)
+
+    # Wake up the sender only after the item is committed, so it's visible to the sender's query
+    future.add_done_callback(lambda _: QUEUE_WAKEUP_EVENT.set())
+
+    return future
+
+
+def _queue_row_to_item(row) -> Dict[str, Any]:
+    """
+    Converts a 'charging_session' row into a queued item dictionary.
+    The payload is passed on serialized, the sender splices it into the request without decoding it.
+
+    Args:
+        row: A sqlite3.Row from the 'charging_session' table.
+    Returns:
+        The queued item dictionary.
+    """
+
+    return {
+        "queue_db_id": row['id'],
+        "charging_session_id": row['charging_session_id'],
+        "device_uid": row['device_uid'],
+        "payload_json": row['payload'],
+        # Rows queued by older versions are compressed now
+        "payload_deflate": row['payload_deflate'] or compress_payload_prefix(row['payload']),
+        "type": row['type'],
+        "attempts": row['attempts'],
+        "last_attempt_at": row['last_attempt_at'],
+        "next_attempt_at": row['next_attempt_at'],
+        "created_at": row['created_at']
+    }
+
+
+def iter_pending_queue_pages(config, page_size: int = 50) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Lazily iterates over the charging session events that are either 'pending' or 'failed'
+    and whose next_attempt_at is due, including 'sending' rows whose lease has expired. The queue is read in pages using keyset pagination
+    on (next_attempt_at, id), so only one page of rows is held in memory. Rows added while the iteration is running
+    are picked up as well. A row is handed out at most once per iteration, so a row rescheduled during the pass
+    (e.g. deferred behind its predecessor) waits for the next pass even if it's due again before the pass ends.
+
+    Args:
+        config: Dictionary containing configuration values.
+        page_size: Number of rows fetched from the database per page.
+    Returns:
+        An iterator of pages, each a list of queued item dictionaries (see get_pending_queue_items).
+    """
+
+    last_attempt_at = ""
+    last_id = 0
+    handed_out: Set[int] = set()
+
+    while True:
+        # Re-evaluate the due time for every page so freshly queued rows are included
+        current_time = datetime.now().isoformat()
+
+        with get_db_connection(config) as conn:
+            cursor = conn.cursor()
+
+            # The ORDER BY is important to process older messages first.
+            cursor.execute("""
+                SELECT charging_session_id, device_uid, payload, payload_deflate, type, attempts, last_attempt_at, next_attempt_at, created_at, id
+                FROM charging_session
+                WHERE status IN ('pending', 'failed', 'sending')
+                  AND next_attempt_at <= ?
+                  AND (next_attempt_at > ? OR (next_attempt_at = ? AND id > ?))
+                ORDER BY next_attempt_at ASC, id ASC
+                LIMIT ?
+            """, (current_time, last_attempt_at, last_attempt_at, last_id, page_size))
+
+            rows = cursor.fetchall()
+
+        if rows:
+            last_attempt_at = rows[-1]['next_attempt_at']
+            last_id = rows[-1]['id']
+
+        # The connection is released before the rows are handed out, the sender may take a while per page
+        page = [_queue_row_to_item(row) for row in rows if row['id'] not in handed_out]
+        handed_out.update(item['queue_db_id'] for item in page)
+
+        if page:
+            yield page
+
+        if len(rows) < page_size:
+            return
+
+
+def iter_pending_queue_items(config, page_size: int = 50) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily iterates over the due charging session events one by one, see iter_pending_queue_pages().
+
+    Args:
+        config: Dictionary containing configuration values.
+        page_size: Number of rows fetched from the database per page.
+    Returns:
+        An iterator of queued item dictionaries (see get_pending_queue_items).
+    """
+
+    for page in iter_pending_queue_pages(config, page_size):
+        yield from page
+
+
+def get_seconds_until_next_attempt(config) -> Optional[float]:
+    """
+    Returns how long it takes until the next queued item is due to be sent.
+
+    Args:
+        config: Dictionary containing configuration values.
+    Returns:
+        Seconds until the earliest next_attempt_at (0 if an item is already due), None if the queue is empty.
+    """
+
+    with get_db_connection(config) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT MIN(next_attempt_at) AS next_attempt_at
+            FROM charging_session
+            WHERE status IN ('pending', 'failed', 'sending')
+        """)
+
+        row = cursor.fetchone()
+
+    if row is None or row['next_attempt_at'] is None:
+        return None
+
+    return max(0.0, (datetime.fromisoformat(row['next_attempt_at']) - datetime.now()).total_seconds())
+
+
+def get_pending_queue_items(config) -> List[Dict]:
+    """
+    Retrieves a list of all charging session events from the queue that are
+    either 'pending' or 'failed' and due to be sent.
+    Items are ordered by their creation time to ensure they are processed in order.
+    Prefer iter_pending_queue_items() for draining the queue, this loads the whole backlog into memory.
+
+    Args:
+        config: Dictionary containing configuration values.
+    Returns:
+        A list of dictionaries, where each dictionary represents a queued item
+        with its details (charging_session_id, device_uid, payload_json, payload_deflate, type,
+        attempts, last_attempt_at, next_attempt_at, created_at and queue_db_id). Returns an empty list if no items.
+    """
+
+    return list(iter_pending_queue_items(config))
+
+
+def claim_queue_items(config, queue_db_ids: List[int], lease_seconds: int) -> Set[int]:
+    """
+    Leases due queue items to the sender lanes by switching them to the 'sending' state, all in one write.
+    The lease expiry is stored in 'next_attempt_at', so an item whose lane never reported
+    back (e.g. the agent was restarted mid-send) becomes due again once the lease runs out.
+
+    Args:
+        config: Dictionary containing configuration values.
+        queue_db_ids: The internal SQLite primary keys of the queue items.
+        lease_seconds: How long the items stay reserved for the lanes.
+    Returns:
+        The IDs of the items that were claimed, items no longer due or claimed by someone else are left out.
+    """
+
+    if not queue_db_ids:
+        return set()
+
+    current_time = datetime.now()
+    lease_until = (current_time + timedelta(seconds=lease_seconds)).isoformat()
+
+    def write(cursor) -> Set[int]:
+        claimed = set()
+
+        for queue_db_id in queue_db_ids:
+            cursor.execute("""
+                UPDATE charging_session
+                SET status = 'sending', next_attempt_at = ?
+                WHERE id = ?
+                  AND status IN ('pending', 'failed', 'sending')
+                  AND next_attempt_at <= ?
+            """, (lease_until, queue_db_id, current_time.isoformat()))
+
+            if cursor.rowcount == 1:
+                claimed.add(queue_db_id)
+
+        return claimed
+
+    return submit_db_write(config, write).result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+
+
+def release_queue_items(config, queue_db_ids: List[int]) -> Future:
+    """
+    Ends the lease of queue items a sender lane didn't get to, so they're due again right away
+    instead of after the lease expires. Items the lane already marked as sent, failed or deferred are left alone.
+
+    Args:
+        config: Dictionary containing configuration values.
+        queue_db_ids: The internal SQLite primary keys of the queue items.
+    Returns:
+        A future resolved once the update is committed.
+    """
+
+    current_time = datetime.now().isoformat()
+
+    def write(cursor) -> None:
+        cursor.executemany("""
+            UPDATE charging_session
+            SET status = CASE WHEN attempts = 0 THEN 'pending' ELSE 'failed' END, next_attempt_at = ?
+            WHERE id = ? AND status = 'sending'
+        """, [(current_time, queue_db_id) for queue_db_id in queue_db_ids])
+
+    return submit_db_write(config, write)
+
+
+def defer_if_predecessor_unsent(config, queue_db_id: int, charging_session_id: str, session_type: str, ignore_ids: Tuple[int, ...] = ()) -> bool:
+    """
+    Keeps the events of one charging session in order (start, rfid, end). If an earlier event
+    of the same session hasn't been delivered yet, the item's lease is released and it's
+    rescheduled to be sent after its predecessor.
+
+    Args:
+        config: Dictionary containing configuration values.
+        queue_db_id: The internal SQLite primary key of the queue item.
+        charging_session_id: The charging session the item belongs to.
+        session_type: The type of the item ('start', 'rfid' or 'end').
+        ignore_ids: Queue IDs of predecessors that are sent in the same request, before this item.
+    Returns:
+        True if the item was deferred and must not be sent now, False otherwise.
+    """
+
+    earlier_types = [t for t, order in QUEUE_EVENT_ORDER.items() if order < QUEUE_EVENT_ORDER.get(session_type, 0)]
+
+    if not earlier_types:
+        return False
+
+    def write(cursor) -> bool:
+        cursor.execute(f"""
+            SELECT id, next_attempt_at FROM charging_session
+            WHERE charging_session_id = ?
+              AND type IN ({",".join("?" * len(earlier_types))})
+              AND status IN ('pending', 'failed', 'sending')
+        """, (charging_session_id, *earlier_types))
+
+        predecessors = [row for row in cursor.fetchall() if row['id'] not in ignore_ids]
+
+        if not predecessors:
+            return False
+
+        # Retry shortly after the predecessor is due, never in a tight loop
+        resume_at = max(
+            max(row['next_attempt_at'] for row in predecessors),
+            (datetime.now() + timedelta(seconds=1)).isoformat(),
+        )
+
+        cursor.execute("""
+            UPDATE charging_session
+            SET status = CASE WHEN attempts = 0 THEN 'pending' ELSE 'failed' END, next_attempt_at = ?
+            WHERE id = ?
+        """, (resume_at, queue_db_id))
+
+        return True
+
+    if not submit_db_write(config, write).result(timeout=DB_WRITE_TIMEOUT_SECONDS):
+        return False
+
+    logging.info(f"Deferred queued item (ID: {charging_session_id}, Type: {session_type}) until its preceding events are sent")
+
+    return True
+
+
+def _compute_next_attempt_at(config, attempts: int) -> str:
+    """
+    Computes when a failed queue item should be retried, using exponential backoff with jitter.
+    The delay doubles with every attempt up to RetryMaxSeconds, the jitter spreads the retries
+    so items that failed together don't hit EMM again at the same moment.
+
+    Args:
+        config: Dictionary containing configuration values, specifically 'AppSettings'.
+        attempts: The number of failed attempts including the current one.
+    Returns:
+        ISO timestamp of the next attempt.
+    """
+
+    base_delay = float(config["AppSettings"].get("RetryBaseSeconds", 30))
+    max_delay = float(config["AppSettings"].get("RetryMaxSeconds", 3600))
+
+    delay = min(max_delay, base_delay * (2 ** max(0, attempts - 1)))
+    delay = random.uniform(delay / 2, delay)
+
+    return (datetime.now() + timedelta(seconds=delay)).isoformat()
+
+
+def update_queue_item_status(config, queue_db_id: int, status: str, increment_attempts: bool = False) -> Future:
+    """
+    Updates the status of a specific item in the SQLite queue.
+    Optionally increments the 'attempts' count and updates 'last_attempt_at'.
+    A failed attempt also pushes the item's 'next_attempt_at' back, see _compute_next_attempt_at().
+
+    Args:
+        config: Dictionary containing configuration values.
+        queue_db_id: The internal SQLite primary key of the queue item to update.
+        status: The new status for the item ('pending', 'sent', 'failed').
+        increment_attempts: If True, the 'attempts' count will be increased by one.
+    Returns:
+        A future resolved once the update is committed.
+    """
+
+    current_time = datetime.now().isoformat()
+
+    def write(cursor) -> None:
+        if increment_attempts:
+            cursor.execute("SELECT attempts FROM charging_session WHERE id = ?", (queue_db_id,))
+            row = cursor.fetchone()
+
+            if row is None:
+                return
+
+            next_attempt_at = _compute_next_attempt_at(config, (row['attempts'] or 0) + 1)
+
+            cursor.execute("""
+                UPDATE charging_session
+                SET status = ?, attempts = attempts + 1, last_attempt_at = ?, next_attempt_at = ?
+                WHERE id = ?
+            """, (status, current_time, next_attempt_at, queue_db_id))
+        else:
+            cursor.execute("""
+                UPDATE charging_session
+                SET status = ?, last_attempt_at = ?
+                WHERE id = ?
+            """, (status, current_time, queue_db_id))
+
+    return submit_db_write(config, write)
+
+
+def get_active_session_from_queue(config, device_uid: str) -> Optional[Dict[str, Any]]:
+    """
+    Finds the most recent, unterminated charging session for a given device
+    by looking for the latest 'start' event in the queue.
+
+    Args:
+        config: Dictionary containing configuration values.
+        device_uid: The unique identifier of the charging device.
+    Returns:
+        A dictionary containing the 'charging_session_id' and the full 'payload'
+        of the active session if one is found, otherwise None.
+    """
+
+    try:
+        with get_db_connection(config) as conn:
+            cursor = conn.cursor()
+
+            # Find the last active charging session for a controller - latest session 'start' event that has no 'end' event
+            cursor.execute("""
+                SELECT cs.charging_session_id, cs.payload as start_payload,
+                        (SELECT payload FROM charging_session cr 
+                        WHERE cr.charging_session_id = cs.charging_session_id 
+                        AND cr.type = 'rfid' LIMIT 1) as rfid_payload
+                FROM charging_session cs
+                WHERE cs.device_uid = ?
+                  AND cs.type = 'start'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM charging_session ce
+                      WHERE ce.charging_session_id = cs.charging_session_id
+                        AND ce.type = 'end'
+                  )
+                ORDER BY cs.created_at DESC
+                LIMIT 1
+            """, (device_uid,))
+
+            row = cursor.fetchone()
+
+            if row:
+                charging_session_id = row['charging_session_id']
+                payload = json.loads(row['start_payload'])
+
+                # If a late RFID event was found (plug-in then scan) in the queue, merge it into our working payload
+                if row['rfid_payload']:
+                    rfid_data = json.loads(row['rfid_payload'])
+                    payload['rfidTag'] = rfid_data.get('rfidTag')
+                    payload['rfidTimestamp'] = rfid_data.get('rfidTimestamp')
+
+                return {
+                    "charging_session_id": charging_session_id,
+                    "payload": payload
+                }
+            
+            # Return None if no row was found
+            return None
+        
+    except Exception as e:
+        logging.error(f"Could not read active session for device {device_uid} from queue: {e}")
+        return None
+
+
+#######################################################
+############# END SQLITE QUEUE MANAGEMENT #############
+#######################################################
+
+################################################
+############# SQLITE SINGLE WRITER #############
+################################################
+
+import queue
+
+# A write command runs on the writer thread's cursor inside the group transaction
+WriteCommand = Callable[[sqlite3.Cursor], Any]
+
+# How long callers wait for their write to be committed before giving up
+DB_WRITE_TIMEOUT_SECONDS = 30
+
+
+class DatabaseWriter:
+    """
+    Performs all the agent's database writes on a single thread. Commands are taken from a queue
+    and committed in groups: the first command opens a transaction, the commands queued within
+    MaxGroupDelayMs (up to MaxGroupSize) join it, and one commit makes the whole group durable.
+    Every command runs inside its own savepoint, so a failing command doesn't affect the others.
+
+    Any error while committing a group fails all of the group's futures, the writer keeps running.
+    If the thread ends anyway, the writer is marked dead: the queued commands are failed and
+    submit() raises instead of queueing commands nobody will run.
+    """
+
+    def __init__(self, config, max_group_size: int = 100, max_group_delay: float = 0.005):
+        self._config = config
+        self._max_group_size = max_group_size
+        self._max_group_delay = max_group_delay
+        self._queue: "queue.Queue[Optional[Tuple[WriteCommand, Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="DB-Writer", daemon=True)
+
+        # Guards _running, so no command is queued after the queue was drained by a dying writer
+        self._state_lock = threading.Lock()
+        self._running = False
+
+    def start(self) -> None:
+        with self._state_lock:
+            self._running = True
+
+        self._thread.start()
+
+    @property
+    def is_running(self) -> bool:
+        """False once the writer thread stopped or died."""
+
+        return self._running
+
+    def submit(self, command: WriteCommand) -> Future:
+        """
+        Queues a write command. The returned future resolves with the command's return value
+        once its group is committed, or with the exception the command (or the commit) raised.
+
+        Raises:
+            RuntimeError: If the writer thread isn't running
+        """
+
+        future: Future = Future()
+
+        with self._state_lock:
+            if not self._running:
+                raise RuntimeError("The database writer is not running")
+
+            self._queue.put((command, future))
+
+        return future
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Commits the commands queued so far and stops the writer thread."""
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        try:
+            self._process_queue()
+
+        finally:
+            self._mark_dead()
+
+    def _process_queue(self) -> None:
+        stopping = False
+
+        while not stopping:
+            first_command = self._queue.get()
+
+            if first_command is None:
+                break
+
+            group = [first_command]
+
+            try:
+                deadline = time.monotonic() + self._max_group_delay
+
+                # Collect the commands that arrive shortly after the first one into the same transaction
+                while len(group) < self._max_group_size:
+                    try:
+                        command = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+
+                    if command is None:
+                        stopping = True
+                        break
+
+                    group.append(command)
+
+                self._commit_group(group)
+
+            except Exception as e:
+                logging.error(f"Database writer failed on a group of {len(group)} writes: {e}", exc_info=True)
+                self._fail_group(group, e)
+
+    def _mark_dead(self) -> None:
+        with self._state_lock:
+            self._running = False
+
+        # Fail whatever is still queued, its callers would otherwise wait forever
+        error = RuntimeError("The database writer stopped before running the command")
+        pending = []
+
+        while True:
+            try:
+                command = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if command is not None:
+                pending.append(command)
+
+        self._fail_group(pending, error)
+
+    @staticmethod
+    def _fail_group(group: List[Tuple[WriteCommand, Future]], error: BaseException) -> None:
+        for _, future in group:
+            if not future.done():
+                future.set_exception(error)
+
+    def _commit_group(self, group: List[Tuple[WriteCommand, Future]]) -> None:
+        conn = None
+        outcomes: List[Tuple[Future, Any, Optional[BaseException]]] = []
+
+        try:
+            conn = get_db_connection(self._config)
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+
+            for command, future in group:
+                cursor.execute("SAVEPOINT write_command")
+
+                try:
+                    outcomes.append((future, command(cursor), None))
+                    cursor.execute("RELEASE SAVEPOINT write_command")
+
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT write_command")
+                    cursor.execute("RELEASE SAVEPOINT write_command")
+                    outcomes.append((future, None, e))
+
+            conn.commit()
+
+        except Exception as e:
+            logging.error(f"Failed to commit a group of {len(group)} database writes: {e}")
+
+            try:
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+
+            except Exception as rollback_error:
+                logging.error(f"Failed to roll back the database writes: {rollback_error}")
+
+            self._fail_group(group, e)
+
+            return
+
+        # Resolve the futures only after the commit, callers waiting on them can rely on durability
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_DB_WRITER: Optional[DatabaseWriter] = None
+_DB_WRITER_LOCK = threading.Lock()
+
+
+def submit_db_write(config, command: WriteCommand) -> Future:
+    """
+    Queues a write command for the shared DatabaseWriter, starting the writer on first use.
+
+    Args:
+        config: Dictionary containing configuration values, specifically 'AppSettings'.
+        command: A function taking the writer's cursor, its return value resolves the future.
+    Returns:
+        A future that is resolved once the command is committed. Callers that need durability wait on it,
+        with a timeout of DB_WRITE_TIMEOUT_SECONDS.
+    """
+
+    global _DB_WRITER
+
+    with _DB_WRITER_LOCK:
+        # A writer whose thread died is replaced, the commands it failed were reported to their callers
+        if _DB_WRITER is not None and not _DB_WRITER.is_running:
+            logging.error("The database writer thread died, starting a new one")
+            _DB_WRITER = None
+
+        if _DB_WRITER is None:
+            _DB_WRITER = DatabaseWriter(
+                config,
+                max_group_size=int(config["AppSettings"].get("DbWriterMaxGroupSize", 100)),
+                max_group_delay=float(config["AppSettings"].get("DbWriterMaxGroupDelayMs", 5)) / 1000,
+            )
+            _DB_WRITER.start()
+
+        return _DB_WRITER.submit(command)
+
+
+def stop_db_writer(timeout: Optional[float] = 10) -> None:
+    """
+    Commits the pending writes and stops the shared DatabaseWriter. Called on shutdown.
+
+    Args:
+        timeout: Maximum number of seconds to wait for the pending writes.
+    Returns:
+        None
+    """
+
+    global _DB_WRITER
+
+    with _DB_WRITER_LOCK:
+        writer, _DB_WRITER = _DB_WRITER, None
+
+    if writer is not None:
+        writer.stop(timeout)
+
+
+def _log_write_error(description: str) -> Callable[[Future], None]:
+    """
+    Returns a future callback that logs a failed fire-and-forget write.
+
+    Args:
+        description: What the write was doing, used in the log message.
+    Returns:
+        The callback for Future.add_done_callback().
+    """
+
+    def callback(future: Future) -> None:
+        if future.exception() is not None:
+            logging.error(f"Could not {description} in database: {future.exception()}")
+
+    return callback
+
+
+####################################################
+############# END SQLITE SINGLE WRITER #############
+####################################################
+
+
+##################################################
+############# SQLITE QUEUE RETENTION #############
+##################################################
+
+import gzip
+
+# Queue rows in these states are never sent again and can be archived
+QUEUE_FINAL_STATUSES = ("sent", "failed_unrecoverable")
+
+
+def _get_db_file_size(db_path: str) -> int:
+    """
+    Returns the size of the database file including its WAL file.
+
+    Args:
+        db_path: The full path to the SQLite database file.
+    Returns:
+        The combined size in bytes.
+    """
+
+    size = 0
+
+    for path in (db_path, f"{db_path}-wal"):
+        if os.path.exists(path):
+            size += os.path.getsize(path)
+
+    return size
+
+
+def _get_db_used_bytes(cursor, schema: str = "main") -> int:
+    """
+    Returns the number of bytes occupied by live pages, excluding the free pages.
+
+    Args:
+        cursor: An open SQLite cursor.
+        schema: 'main' for the queue database, 'timeseries' for the attached energy time series.
+    Returns:
+        The used size of the database in bytes.
+    """
+
+    page_size = cursor.execute(f"PRAGMA {schema}.page_size").fetchone()[0]
+    page_count = cursor.execute(f"PRAGMA {schema}.page_count").fetchone()[0]
+    freelist_count = cursor.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+
+    return (page_count - freelist_count) * page_size
+
+
+# Tables whose size QueueMaxSizeMBytes limits, the telemetry backlog has its own quota
+QUEUE_SIZE_TABLES = ("charging_session", "rfid_event")
+
+# Approximate bytes a queue row takes beyond its payload, used when SQLite is built without dbstat
+QUEUE_ROW_OVERHEAD_BYTES = 160
+
+
+def _get_queue_data_bytes(cursor) -> int:
+    """
+    Returns the number of bytes occupied by the pages of the queue tables and their indexes.
+
+    Args:
+        cursor: An open SQLite cursor.
+    Returns:
+        The size of the queue data in bytes.
+    """
+
+    names = [
+        row[0] for row in cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE tbl_name IN ({', '.join('?' * len(QUEUE_SIZE_TABLES))})",
+            QUEUE_SIZE_TABLES
+        ).fetchall()
+    ]
+
+    try:
+        # The aggregate rows walk only the pages of the named table or index
+        return sum(
+            cursor.execute("SELECT pgsize FROM dbstat WHERE name = ? AND aggregate = TRUE", (name,)).fetchone()[0] or 0
+            for name in names
+        )
+
+    except sqlite3.OperationalError:
+        # SQLite builds without the dbstat table, estimated from the payload sizes
+        session_bytes = cursor.execute(f"""
+            SELECT COALESCE(SUM(LENGTH(payload) + COALESCE(LENGTH(payload_deflate), 0) + {QUEUE_ROW_OVERHEAD_BYTES}), 0)
+            FROM charging_session
+        """).fetchone()[0]
+        rfid_rows = cursor.execute("SELECT COUNT(*) FROM rfid_event").fetchone()[0]
+
+        return session_bytes + rfid_rows * QUEUE_ROW_OVERHEAD_BYTES
+
+
+def _find_finished_sessions(cursor, cutoff: Optional[str], limit: int) -> List[str]:
+    """
+    Finds the oldest charging sessions whose queue rows can all be removed.
+    A session qualifies when every one of its rows is in a final state and either
+    its 'end' event exists or a newer session was started on the same device, so the
+    removal can never resurrect an older 'start' as the device's active session.
+
+    Args:
+        cursor: An open SQLite cursor.
+        cutoff: ISO timestamp, only sessions whose rows are all older are returned. None disables the age check.
+        limit: Maximum number of sessions to return.
+    Returns:
+        A list of charging session IDs, oldest first.
+    """
+
+    cursor.execute(f"""
+        SELECT cs.charging_session_id
+        FROM charging_session cs
+        WHERE cs.type = 'start'
+          AND NOT EXISTS (
+              SELECT 1 FROM charging_session x
+              WHERE x.charging_session_id = cs.charging_session_id
+                AND (x.status NOT IN ({",".join("?" * len(QUEUE_FINAL_STATUSES))}) OR x.created_at >= ?)
+          )
+          AND (
+              EXISTS (
+                  SELECT 1 FROM charging_session ce
+                  WHERE ce.charging_session_id = cs.charging_session_id AND ce.type = 'end'
+              )
+              OR EXISTS (
+                  SELECT 1 FROM charging_session cn
+                  WHERE cn.device_uid = cs.device_uid AND cn.type = 'start' AND cn.created_at > cs.created_at
+              )
+          )
+        ORDER BY cs.created_at ASC
+        LIMIT ?
+    """, (*QUEUE_FINAL_STATUSES, cutoff or "9999", limit))
+
+    return [row['charging_session_id'] for row in cursor.fetchall()]
+
+
+def _write_archive_file(config, rows: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Writes the removed database rows into a new gzip compressed JSON lines archive file.
+    Called only after the delete was committed, so a rolled back delete never leaves an archive behind.
+    The file is written under a temporary name and renamed once complete.
+    Only the newest QueueArchiveMaxFiles archive files are kept.
+
+    Args:
+        config: Dictionary containing configuration values, specifically 'AppSettings'.
+        rows: The rows to archive, every row holds the source table name under the 'table' key.
+    Returns:
+        The path of the archive file, None if there was nothing to archive.
+    """
+
+    if not rows:
+        return None
+
+    archive_folder = config["AppSettings"].get(
+        "QueueArchiveFolder", os.path.join(config["AppSettings"]["FileFolder"], "archive")
+    )
+    max_files = int(config["AppSettings"].get("QueueArchiveMaxFiles", 30))
+
+    os.makedirs(archive_folder, exist_ok=True)
+
+    # Microseconds in the name, the chunked removal can write several archives within a second
+    archive_path = os.path.join(archive_folder, f"queue-archive-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.jsonl.gz")
+    temp_path = f"{archive_path}.tmp"
+
+    with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+        for row in rows:
+            file.write(json.dumps(row) + "\n")
+
+    os.replace(temp_path, archive_path)
+
+    # Remove the oldest archive files above the limit, the timestamped names sort chronologically
+    archive_files = sorted(f for f in os.listdir(archive_folder) if f.startswith("queue-archive-") and f.endswith(".jsonl.gz"))
+
+    for file_name in archive_files[:max(0, len(archive_files) - max_files)]:
+        os.remove(os.path.join(archive_folder, file_name))
+
+    return archive_path
+
+
+def _remove_sessions(cursor, session_ids: List[str], archive_rows: Optional[List[Dict[str, Any]]]) -> int:
+    """
+    Removes all queue rows of the given charging sessions, collecting them for the archive if enabled.
+
+    Args:
+        cursor: An open SQLite cursor.
+        session_ids: Charging session IDs to remove.
+        archive_rows: The removed rows are appended to this list, None if archiving is disabled.
+    Returns:
+        The number of deleted rows.
+    """
+
+    if not session_ids:
+        return 0
+
+    placeholders = ",".join("?" * len(session_ids))
+
+    if archive_rows is not None:
+        # The pre-compressed payload_deflate copy is left out, the archive keeps the JSON payload
+        cursor.execute(f"""
+            SELECT id, charging_session_id, device_uid, payload, type, status, attempts, last_attempt_at, next_attempt_at, created_at
+            FROM charging_session WHERE charging_session_id IN ({placeholders})
+        """, session_ids)
+        archive_rows.extend({"table": "charging_session", **dict(row)} for row in cursor.fetchall())
+
+    cursor.execute(f"DELETE FROM charging_session WHERE charging_session_id IN ({placeholders})", session_ids)
+
+    return cursor.rowcount
+
+
+def run_queue_retention(config) -> Dict[str, int]:
+    """
+    Removes old rows from the queue database and compacts the database file.
+    Finished charging sessions older than QueueRetentionDays and RFID scans older than
+    RfidRetentionDays are moved into compressed archive files (or just deleted when
+    QueueArchiveEnabled is off). If the charging sessions and RFID scans still take more than
+    QueueMaxSizeMBytes, the oldest finished sessions are removed regardless of their age. Free pages are returned to the
+    filesystem and the WAL is checkpointed only at quiet times, when no queued item is due.
+
+    Args:
+        config: Dictionary containing configuration values, specifically 'AppSettings'.
+    Returns:
+        A dictionary with the number of removed 'session_rows' and 'rfid_rows',
+        and the 'reclaimed_bytes' of the database and WAL files.
+    """
+
+    retention_days = float(config["AppSettings"].get("QueueRetentionDays", 30))
+    rfid_retention_days = float(config["AppSettings"].get("RfidRetentionDays", 7))
+    max_size_bytes = int(float(config["AppSettings"].get("QueueMaxSizeMBytes", 50)) * 1024 * 1024)
+    archive = config["AppSettings"].get("QueueArchiveEnabled", "true").lower() == "true"
+
+    db_path = _get_queue_db_path(config)
+    size_before = _get_db_file_size(db_path)
+
+    session_cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    rfid_cutoff = int((datetime.now() - timedelta(days=rfid_retention_days)).timestamp())
+
+    def remove_expired(cursor) -> Tuple[int, int, List[Dict[str, Any]]]:
+        archive_rows: Optional[List[Dict[str, Any]]] = [] if archive else None
+
+        # Remove the finished sessions past the retention period
+        session_ids = _find_finished_sessions(cursor, session_cutoff, limit=1000)
+        session_rows = _remove_sessions(cursor, session_ids, archive_rows)
+
+        # Remove the RFID scans past the retention period, they can't be paired anymore
+        if archive_rows is not None:
+            cursor.execute("SELECT * FROM rfid_event WHERE ts < ?", (rfid_cutoff,))
+            archive_rows.extend({"table": "rfid_event", **dict(row)} for row in cursor.fetchall())
+
+        cursor.execute("DELETE FROM rfid_event WHERE ts < ?", (rfid_cutoff,))
+
+        return session_rows, cursor.rowcount, archive_rows or []
+
+    def remove_oldest(cursor) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+        # Enforce the size limit by removing the oldest finished sessions first
+        if _get_queue_data_bytes(cursor) <= max_size_bytes:
+            return None
+
+        session_ids = _find_finished_sessions(cursor, None, limit=100)
+
+        if not session_ids:
+            logging.warning(f"Queue data exceeds {max_size_bytes} bytes but no finished sessions are left to remove")
+            return None
+
+        archive_rows: Optional[List[Dict[str, Any]]] = [] if archive else None
+
+        return _remove_sessions(cursor, session_ids, archive_rows), archive_rows or []
+
+    # The deletes go through the database writer in chunks, so the other writes aren't held up for long.
+    # The rows are archived once their delete is committed
+    removed_session_rows, removed_rfid_rows, archive_rows = submit_db_write(config, remove_expired).result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+    _write_archive_file(config, archive_rows)
+    get_rfid_scan_index(config).prune(datetime.now() - timedelta(days=rfid_retention_days))
+
+    while True:
+        removed = submit_db_write(config, remove_oldest).result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+
+        if removed is None:
+            break
+
+        removed_rows, archive_rows = removed
+        _write_archive_file(config, archive_rows)
+        removed_session_rows += removed_rows
+
+    # Compact only when the sender has nothing to do, so the maintenance doesn't delay deliveries
+    with get_db_connection(config) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT COUNT(*) FROM charging_session
+            WHERE status IN ('pending', 'failed', 'sending') AND next_attempt_at <= ?
+        """, (datetime.now().isoformat(),))
+
+        is_quiet = cursor.fetchone()[0] == 0
+
+    if is_quiet:
+        # The compaction can't run inside the writer's transactions, so it's done on this thread's connection.
+        # executescript() steps the statements until they're done, execute() would free only a single page
+        get_db_connection(config).executescript("""
+            PRAGMA incremental_vacuum;
+            PRAGMA wal_checkpoint(TRUNCATE);
+        """)
+
+    result = {
+        "session_rows": removed_session_rows,
+        "rfid_rows": removed_rfid_rows,
+        "reclaimed_bytes": max(0, size_before - _get_db_file_size(db_path)),
+    }
+
+    logging.info(
+        f"Queue retention finished: removed {result['session_rows']} session rows and {result['rfid_rows']} RFID rows, "
+        f"reclaimed {result['reclaimed_bytes']} bytes" + ("" if is_quiet else ", compaction postponed until the queue is idle")
+    )
+
+    return result
+
+######################################################
+############# END SQLITE QUEUE RETENTION #############
+######################################################
+
+
+#######################################################
+############# SQLITE TELEMETRY MANAGEMENT #############
+#######################################################
+
+
+def update_controller_telemetry(config, device_uid: str, payload_json: str) -> Future:
+    """
+    Persists the latest technical telemetry state for a charging controller into 
+    the local SQLite database. Utilizes a flexible JSON payload column to ensure 
+    data persistence remains compatible with future controller firmware updates 
+    without requiring database schema migrations.
+
+    Args:
+        config: Dictionary containing configuration values, specifically file paths.
+        device_uid: The unique identifier of the charging controller.
+        payload_json: A stringified JSON object containing the unified telemetry data.
+    Returns:
+        A future resolved once the telemetry is committed.
     """
-    
-    # Try to pair RFID up to 4 times (total wait: ~6 seconds)
-    for attempt in range(4):
-        with get_db_connection(config) as conn:
-            cursor = conn.cursor()
-            conn.execute("BEGIN IMMEDIATE")
 
-            # We use julianday() to calculate the absolute difference in time.
-            # This finds the 'nearest' scan regardless of if it was before or after.
-            cursor.execute("""
-                SELECT id, tag, timestamp,
-                ABS(julianday(timestamp) - julianday(?)) as time_diff
-                FROM rfid_event 
-                WHERE claimed_by_session_id IS NULL 
-                AND datetime(timestamp) >= datetime(?, '-65 seconds')
-                AND datetime(timestamp) <= datetime(?, '+65 seconds')
-                ORDER BY time_diff ASC LIMIT 1
-            """, (start_ts, start_ts, start_ts))
+    current_time = datetime.now().isoformat()
+
+    def write(cursor) -> None:
+        cursor.execute("""
+            INSERT OR REPLACE INTO controller_telemetry (device_uid, payload, updated_at)
+            VALUES (?, ?, ?)
+        """, (device_uid, payload_json, current_time))
+
+    future = submit_db_write(config, write)
+    future.add_done_callback(_log_write_error(f"save telemetry for {device_uid}"))
+
+    return future
+
+
+#######################################################
+############# SQLITE TELEMETRY MANAGEMENT #############
+#######################################################
+
+
+####################################################
+############# SQLITE TELEMETRY BACKLOG #############
+####################################################
+
+
+# Downsampling steps applied as the backlog fills up: (target resolution in seconds, fill ratio)
+TELEMETRY_BACKLOG_DOWNSAMPLING = [(60, 0.5), (900, 0.75)]
+
+# While the backlog stays above a step's fill ratio, the step runs again at most this often
+TELEMETRY_BACKLOG_COMPACT_INTERVAL_SECONDS = 60
+
+# Bytes stored in the backlog per database file, so an insert doesn't have to sum the table.
+# Only the database writer thread touches these, they need no lock
+_TELEMETRY_BACKLOG_BYTES: Dict[str, int] = {}
+_TELEMETRY_BACKLOG_COMPACTED_AT: Dict[Tuple[str, int], float] = {}
+
+
+def _get_telemetry_backlog_quota(config) -> int:
+    return int(float(config["AppSettings"].get("TelemetryBacklogMaxMBytes", 10)) * 1024 * 1024)
+
+
+def _get_telemetry_backlog_bytes(cursor) -> int:
+    cursor.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM telemetry_backlog")
+    return cursor.fetchone()[0]
+
+
+def _downsample_telemetry_backlog(cursor, target_resolution: int) -> int:
+    """
+    Merges the older half of the rows finer than target_resolution into one row per
+    target_resolution bucket, keeping the latest pulse of every controller in the bucket.
+    Returns the number of bytes the backlog shrank by.
+    """
+
+    cursor.execute(
+        "SELECT COUNT(*) FROM telemetry_backlog WHERE resolution < ?",
+        (target_resolution,)
+    )
+    older_half = cursor.fetchone()[0] // 2
+
+    if older_half == 0:
+        return 0
+
+    cursor.execute("""
+        SELECT id, captured_at, payload FROM telemetry_backlog
+        WHERE resolution < ?
+        ORDER BY captured_at, id
+        LIMIT ?
+    """, (target_resolution, older_half))
+
+    buckets: Dict[int, Dict[str, Any]] = {}
+    ids: List[int] = []
+    removed_bytes = 0
+
+    for row in cursor.fetchall():
+        bucket = buckets.setdefault(row["captured_at"] // target_resolution, {"captured_at": 0, "controllers": {}})
+        bucket["captured_at"] = row["captured_at"]
+        bucket["controllers"].update(json.loads(gzip.decompress(row["payload"])))
+        ids.append(row["id"])
+        removed_bytes += len(row["payload"])
+
+    merged_rows = [
+        (bucket["captured_at"], target_resolution, gzip.compress(json.dumps(bucket["controllers"]).encode("utf-8")))
+        for bucket in buckets.values()
+    ]
+
+    cursor.executemany("DELETE FROM telemetry_backlog WHERE id = ?", [(row_id,) for row_id in ids])
+    cursor.executemany("INSERT INTO telemetry_backlog (captured_at, resolution, payload) VALUES (?, ?, ?)", merged_rows)
+
+    return removed_bytes - sum(len(payload) for _, _, payload in merged_rows)
+
+
+def _compact_telemetry_backlog(cursor, db_path: str, previous_bytes: int, backlog_bytes: int, quota_bytes: int) -> int:
+    """
+    Keeps the backlog within its quota. The older raw pulses are downsampled to 1 minute
+    once the backlog is half full, the older 1 minute rows to 15 minutes at three quarters,
+    and the oldest rows are dropped only if it's still over the quota after that.
+    A step runs when an insert crosses its fill ratio, and while the backlog stays above it
+    at most every TELEMETRY_BACKLOG_COMPACT_INTERVAL_SECONDS, not on every insert.
+    Returns the size of the backlog in bytes after the compaction.
+    """
+
+    now = time.monotonic()
+
+    due_steps = [
+        target_resolution for target_resolution, fill_ratio in TELEMETRY_BACKLOG_DOWNSAMPLING
+        if backlog_bytes > quota_bytes * fill_ratio and (
+            previous_bytes <= quota_bytes * fill_ratio
+            or now - _TELEMETRY_BACKLOG_COMPACTED_AT.get((db_path, target_resolution), float("-inf")) >= TELEMETRY_BACKLOG_COMPACT_INTERVAL_SECONDS
+        )
+    ]
+
+    if due_steps:
+        # The tracked size only decides when to compact, the steps work with the stored one
+        backlog_bytes = _get_telemetry_backlog_bytes(cursor)
+
+    for target_resolution, fill_ratio in TELEMETRY_BACKLOG_DOWNSAMPLING:
+        if target_resolution in due_steps and backlog_bytes > quota_bytes * fill_ratio:
+            backlog_bytes -= _downsample_telemetry_backlog(cursor, target_resolution)
+            _TELEMETRY_BACKLOG_COMPACTED_AT[(db_path, target_resolution)] = now
+
+    excess_bytes = backlog_bytes - quota_bytes
+
+    if excess_bytes <= 0:
+        return backlog_bytes
+
+    cursor.execute("SELECT id, LENGTH(payload) AS size FROM telemetry_backlog ORDER BY captured_at, id")
+    drop_ids: List[int] = []
+
+    for row in cursor:
+        if excess_bytes <= 0:
+            break
+
+        drop_ids.append(row["id"])
+        excess_bytes -= row["size"]
+
+    cursor.executemany("DELETE FROM telemetry_backlog WHERE id = ?", [(row_id,) for row_id in drop_ids])
+    logging.warning(f"Telemetry backlog is over its quota, dropped the {len(drop_ids)} oldest rows")
+
+    return quota_bytes + excess_bytes
+
+
+def add_to_telemetry_backlog(config, captured_at: int, controllers: Dict[str, Any]) -> Future:
+    """
+    Stores a telemetry pulse that couldn't be delivered to EMM, compacting the backlog if needed.
+
+    Args:
+        config: Dictionary containing configuration values
+        captured_at: Unix epoch seconds the pulse was assembled at
+        controllers: The pulses of the controllers, keyed by device_uid
+    Returns:
+        A future resolved once the pulse is committed.
+    """
+
+    payload = gzip.compress(json.dumps(controllers).encode("utf-8"))
+    resolution = int(config["AppSettings"].get("TelemetryIntervalSeconds", 10))
+    quota_bytes = _get_telemetry_backlog_quota(config)
+    db_path = _get_queue_db_path(config)
+
+    def write(cursor) -> None:
+        # The stored size is summed once, then tracked as rows are added and removed
+        previous_bytes = _TELEMETRY_BACKLOG_BYTES.get(db_path)
+
+        if previous_bytes is None:
+            previous_bytes = _get_telemetry_backlog_bytes(cursor)
+
+        cursor.execute(
+            "INSERT INTO telemetry_backlog (captured_at, resolution, payload) VALUES (?, ?, ?)",
+            (captured_at, resolution, payload)
+        )
+
+        # Forget the tracked size until the compaction is done, a failed write leaves it to be summed again
+        _TELEMETRY_BACKLOG_BYTES.pop(db_path, None)
+        _TELEMETRY_BACKLOG_BYTES[db_path] = _compact_telemetry_backlog(
+            cursor, db_path, previous_bytes, previous_bytes + len(payload), quota_bytes
+        )
+
+    future = submit_db_write(config, write)
+    future.add_done_callback(_log_write_error("store telemetry pulse in the backlog"))
+
+    return future
+
+
+def get_telemetry_backlog_batch(config, max_rows: int) -> List[Dict[str, Any]]:
+    """
+    Reads the oldest pulses of the backlog.
+
+    Args:
+        config: Dictionary containing configuration values
+        max_rows: Maximum number of pulses to return
+    Returns:
+        A list of dicts with id, captured_at, resolution and controllers, oldest first
+    """
+
+    with get_db_connection(config) as conn:
+        rows = conn.execute("""
+            SELECT id, captured_at, resolution, payload FROM telemetry_backlog
+            ORDER BY captured_at, id
+            LIMIT ?
+        """, (max_rows,)).fetchall()
+
+    return [
+        {
+            "id": row["id"],
+            "captured_at": row["captured_at"],
+            "resolution": row["resolution"],
+            "controllers": json.loads(gzip.decompress(row["payload"])),
+        }
+        for row in rows
+    ]
+
+
+def remove_from_telemetry_backlog(config, ids: List[int]) -> Future:
+    """
+    Deletes the pulses EMM accepted from the backlog.
+
+    Args:
+        config: Dictionary containing configuration values
+        ids: Row IDs returned by get_telemetry_backlog_batch()
+    Returns:
+        A future resolved once the rows are deleted.
+    """
+
+    db_path = _get_queue_db_path(config)
+
+    def write(cursor) -> None:
+        backlog_bytes = _TELEMETRY_BACKLOG_BYTES.pop(db_path, None)
+
+        if backlog_bytes is not None and ids:
+            cursor.execute(
+                f"SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM telemetry_backlog WHERE id IN ({', '.join('?' * len(ids))})",
+                ids
+            )
+            backlog_bytes -= cursor.fetchone()[0]
+
+        cursor.executemany("DELETE FROM telemetry_backlog WHERE id = ?", [(row_id,) for row_id in ids])
+
+        if backlog_bytes is not None:
+            _TELEMETRY_BACKLOG_BYTES[db_path] = backlog_bytes
+
+    return submit_db_write(config, write)
+
+
+########################################################
+############# END SQLITE TELEMETRY BACKLOG #############
+########################################################
+
+
+#####################################################
+############# SQLITE ENERGY TIME SERIES #############
+#####################################################
+
+
+# Rollup bucket sizes in seconds and the config key of their retention in days
+TIMESERIES_ROLLUPS = [(60, "TimeSeriesMinuteRetentionDays", 1), (900, "TimeSeriesQuarterRetentionDays", 14), (3600, "TimeSeriesHourRetentionDays", 90)]
+
+# Energy keys that aren't measurements
+TIMESERIES_IGNORED_METRICS = {"timestamp", "meas_interval_sec"}
+
+
+class EnergyTimeSeriesBuffer:
+    """
+    Collects energy samples in memory and writes them to the time series tables in one
+    database command per flush. The rollups are aggregated in memory first, so each flush
+    does a single upsert per series and bucket instead of one per sample.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: List[Tuple[str, str, int, float]] = []  # (device_uid, metric, ts in ms, value)
+
+        # (device_uid, metric) -> series ID, only ever extended after a successful commit
+        self._series_ids: Dict[Tuple[str, str], int] = {}
+
+    def add(self, device_uid: str, energy: Dict[str, Any], ts: Optional[float] = None) -> None:
+        """
+        Buffer the numeric metrics of one flattened energy message.
+
+        Args:
+            device_uid: Charging controller ID
+            energy: The flattened energy data, e.g. {"u1": 230.1, ...}
+            ts: Unix epoch seconds of the sample, defaults to now
+        """
+
+        # Raw samples are keyed on milliseconds, so two messages within a second don't overwrite each other
+        ts_ms = int(round((time.time() if ts is None else ts) * 1000))
+
+        samples = [
+            (device_uid, metric, ts_ms, float(value))
+            for metric, value in energy.items()
+            if metric not in TIMESERIES_IGNORED_METRICS
+            and isinstance(value, (int, float)) and not isinstance(value, bool)
+        ]
+
+        with self._lock:
+            self._samples.extend(samples)
+
+    def flush(self, config) -> Optional[Future]:
+        """
+        Write the buffered samples and update the rollups.
+
+        Args:
+            config: Dictionary containing configuration values
+        Returns:
+            A future resolved once the samples are committed, None if nothing was buffered
+        """
+
+        with self._lock:
+            samples, self._samples = self._samples, []
+
+        if not samples:
+            return None
+
+        known_ids = dict(self._series_ids)
+
+        def write(cursor) -> Dict[Tuple[str, str], int]:
+            new_ids: Dict[Tuple[str, str], int] = {}
+
+            for key in {(device_uid, metric) for device_uid, metric, _, _ in samples}:
+                if key in known_ids:
+                    continue
+
+                cursor.execute("INSERT OR IGNORE INTO timeseries.timeseries_series (device_uid, metric) VALUES (?, ?)", key)
+                cursor.execute("SELECT id FROM timeseries.timeseries_series WHERE device_uid = ? AND metric = ?", key)
+                new_ids[key] = cursor.fetchone()[0]
+
+            series_ids = {**known_ids, **new_ids}
+            rollups: Dict[Tuple[int, int, int], List[float]] = {}
+
+            for device_uid, metric, ts_ms, value in samples:
+                series_id = series_ids[(device_uid, metric)]
+                ts = ts_ms // 1000
+
+                for resolution, _, _ in TIMESERIES_ROLLUPS:
+                    rollup = rollups.get((series_id, resolution, ts - ts % resolution))
+
+                    if rollup is None:
+                        rollups[(series_id, resolution, ts - ts % resolution)] = [1, value, value, value]
+                    else:
+                        rollup[0] += 1
+                        rollup[1] += value
+                        rollup[2] = min(rollup[2], value)
+                        rollup[3] = max(rollup[3], value)
+
+            cursor.executemany(
+                "INSERT OR REPLACE INTO timeseries.timeseries_sample (series_id, ts, value) VALUES (?, ?, ?)",
+                [(series_ids[(device_uid, metric)], ts_ms, value) for device_uid, metric, ts_ms, value in samples]
+            )
+
+            cursor.executemany("""
+                INSERT INTO timeseries.timeseries_rollup (series_id, resolution, bucket, count, sum, min, max)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (series_id, resolution, bucket) DO UPDATE SET
+                    count = count + excluded.count,
+                    sum = sum + excluded.sum,
+                    min = MIN(min, excluded.min),
+                    max = MAX(max, excluded.max)
+            """, [key + tuple(rollup) for key, rollup in rollups.items()])
+
+            return new_ids
+
+        def remember_series_ids(future: Future) -> None:
+            # IDs of a rolled back transaction must not be cached
+            if future.exception() is None:
+                self._series_ids.update(future.result())
+
+        future = submit_db_write(config, write)
+        future.add_done_callback(remember_series_ids)
+        future.add_done_callback(_log_write_error(f"store {len(samples)} energy samples"))
+
+        return future
+
+
+def get_energy_history(
+    config,
+    device_uid: str,
+    metric: str,
+    start_ts: int,
+    end_ts: int,
+    resolution: Optional[int] = None,
+    max_points: int = 1000,
+) -> Tuple[int, List[Tuple[int, float, float, float]]]:
+    """
+    Reads the history of one metric of a device.
+
+    Args:
+        config: Dictionary containing configuration values
+        device_uid: Charging controller ID
+        metric: Energy metric name, e.g. "u1"
+        start_ts: Unix epoch seconds, inclusive
+        end_ts: Unix epoch seconds, exclusive
+        resolution: 0 for raw samples, 60, 900 or 3600 for rollups, None picks the finest
+                    resolution that still covers the range with at most max_points points
+        max_points: Point limit used when picking the resolution
+    Returns:
+        The resolution used and a list of (ts, min, max, avg), raw samples have min = max = avg
+        and a fractional ts
+    """
+
+    if resolution is None:
+        raw_hours = float(config["AppSettings"].get("TimeSeriesRawRetentionHours", 2))
+        span = max(0, end_ts - start_ts)
+
+        if start_ts >= time.time() - raw_hours * 3600 and span / 10 <= max_points:
+            resolution = 0
+        else:
+            resolution = next(
+                (size for size, _, _ in TIMESERIES_ROLLUPS if span / size <= max_points),
+                TIMESERIES_ROLLUPS[-1][0]
+            )
+
+    with get_db_connection(config) as conn:
+        row = conn.execute(
+            "SELECT id FROM timeseries.timeseries_series WHERE device_uid = ? AND metric = ?",
+            (device_uid, metric)
+        ).fetchone()
+
+        if row is None:
+            return resolution, []
+
+        if resolution == 0:
+            rows = conn.execute("""
+                SELECT ts / 1000.0, value, value, value FROM timeseries.timeseries_sample
+                WHERE series_id = ? AND ts >= ? AND ts < ?
+                ORDER BY ts
+            """, (row["id"], start_ts * 1000, end_ts * 1000)).fetchall()
+
+        else:
+            rows = conn.execute("""
+                SELECT bucket, min, max, sum / count FROM timeseries.timeseries_rollup
+                WHERE series_id = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+                ORDER BY bucket
+            """, (row["id"], resolution, start_ts - start_ts % resolution, end_ts)).fetchall()
+
+    return resolution, [tuple(values) for values in rows]
+
+
+def _trim_energy_timeseries(cursor, max_size_bytes: int) -> int:
+    """
+    Deletes the oldest half of the finest non-empty tier until the time series database
+    fits its size limit, so the long-term rollups are the last to go.
+
+    Args:
+        cursor: An open SQLite cursor.
+        max_size_bytes: The limit of the used size of the time series database.
+    Returns:
+        The number of deleted rows.
+    """
+
+    tiers = [("timeseries_sample", "ts", "")] + [
+        ("timeseries_rollup", "bucket", f"AND resolution = {resolution}") for resolution, _, _ in TIMESERIES_ROLLUPS
+    ]
+    deleted = 0
+
+    for table, column, condition in tiers:
+        while _get_db_used_bytes(cursor, "timeseries") > max_size_bytes:
+            oldest, newest = cursor.execute(
+                f"SELECT MIN({column}), MAX({column}) FROM timeseries.{table} WHERE 1 {condition}"
+            ).fetchone()
+
+            if oldest is None:
+                break
+
+            cursor.execute(
+                f"DELETE FROM timeseries.{table} WHERE {column} <= ? {condition}",
+                ((oldest + newest) // 2,)
+            )
+            deleted += cursor.rowcount
+
+    return deleted
+
+
+def prune_energy_timeseries(config) -> int:
+    """
+    Deletes the raw samples and rollups older than their retention window, trims the oldest
+    data if the time series database still exceeds TimeSeriesMaxMBytes and returns the free
+    pages to the filesystem.
+
+    Args:
+        config: Dictionary containing configuration values
+    Returns:
+        The number of deleted rows.
+    """
+
+    now = int(time.time())
+    raw_cutoff = (now - int(float(config["AppSettings"].get("TimeSeriesRawRetentionHours", 2)) * 3600)) * 1000
+    max_size_bytes = int(float(config["AppSettings"].get("TimeSeriesMaxMBytes", 20)) * 1024 * 1024)
+    rollup_cutoffs = [
+        (resolution, now - int(float(config["AppSettings"].get(config_key, default_days)) * 86400))
+        for resolution, config_key, default_days in TIMESERIES_ROLLUPS
+    ]
+
+    def write(cursor) -> Tuple[int, int]:
+        series_ids = [row[0] for row in cursor.execute("SELECT id FROM timeseries.timeseries_series").fetchall()]
+        deleted = 0
+
+        # Deleting series by series keeps every delete a range scan of the primary key
+        for series_id in series_ids:
+            cursor.execute("DELETE FROM timeseries.timeseries_sample WHERE series_id = ? AND ts < ?", (series_id, raw_cutoff))
+            deleted += cursor.rowcount
+
+            for resolution, cutoff in rollup_cutoffs:
+                cursor.execute(
+                    "DELETE FROM timeseries.timeseries_rollup WHERE series_id = ? AND resolution = ? AND bucket < ?",
+                    (series_id, resolution, cutoff)
+                )
+                deleted += cursor.rowcount
+
+        return deleted, _trim_energy_timeseries(cursor, max_size_bytes)
+
+    deleted, trimmed = submit_db_write(config, write).result(timeout=DB_WRITE_TIMEOUT_SECONDS)
+
+    if trimmed:
+        logging.warning(f"Energy time series exceeds {max_size_bytes} bytes, removed {trimmed} of its oldest rows")
+
+    # The compaction can't run inside the writer's transactions
+    with get_db_connection(config) as conn:
+        conn.executescript("PRAGMA timeseries.incremental_vacuum; PRAGMA timeseries.wal_checkpoint(TRUNCATE);")
+
+    return deleted + trimmed
+
+
+#########################################################
+############# END SQLITE ENERGY TIME SERIES #############
+#########################################################
+
+
+##############################################
+############# DEVICE STATE STORE #############
+##############################################
+
+
+class DeviceStateStore:
+    """
+    In-memory connected/disconnected state of every charging controller.
+
+    The store is authoritative at runtime: it's loaded from the device_status table once,
+    reads never touch the disk and every transition is written through to the database
+    writer asynchronously. The writer applies the writes in submission order, so after
+    a restart the table holds the last state each device was set to before it.
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+        self._lock = threading.Lock()
+        self._states: Dict[str, Dict[str, str]] = {}
+        self._loaded = False
+
+    def load(self) -> None:
+        """
+        Load the persisted states from the database, replacing what's in memory.
+        """
+
+        with get_db_connection(self.config) as conn:
+            rows = conn.execute("SELECT device_uid, status, updated_at FROM device_status").fetchall()
+
+        with self._lock:
+            self._states = {row["device_uid"]: {"status": row["status"], "updated_at": row["updated_at"]} for row in rows}
+            self._loaded = True
+
+        logging.info(f"Loaded the last known state of {len(rows)} devices")
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+
+        try:
+            self.load()
+
+        except Exception as e:
+            logging.error(f"Could not load device states from database: {e}")
+
+            # Start empty rather than retrying the disk on every read
+            with self._lock:
+                self._loaded = True
+
+    def get(self, device_uid: str) -> Optional[str]:
+        """
+        The last known state of the device, 'connected' or 'disconnected', None if unknown.
+        """
+
+        self._ensure_loaded()
+
+        with self._lock:
+            entry = self._states.get(device_uid)
+
+        return entry["status"] if entry else None
+
+    def set(self, device_uid: str, state: str) -> Future:
+        """
+        Change the state in memory and persist it in the background.
+
+        Args:
+            device_uid: Charging controller ID
+            state: 'connected' or 'disconnected'
+        Returns:
+            A future resolved once the state is committed to the database.
+        """
+
+        self._ensure_loaded()
+
+        current_time = datetime.now().isoformat()
+
+        def write(cursor) -> None:
+            # Use INSERT OR REPLACE to create and optionally delete the existing record
+            cursor.execute("""
+                INSERT OR REPLACE INTO device_status (device_uid, status, updated_at)
+                VALUES (?, ?, ?)
+            """, (device_uid, state, current_time))
+
+        # Submitting under the lock keeps the database writes in the same order as the memory updates
+        with self._lock:
+            self._states[device_uid] = {"status": state, "updated_at": current_time}
+            future = submit_db_write(self.config, write)
 
-            row = cursor.fetchone()
+        future.add_done_callback(_log_write_error(f"persist state '{state}' of {device_uid}"))
 
-            if row:
-                diff_sec = round(row['time_diff'] * 86400, 2)
-                logging.info(f"RFID Match: {row['tag']} found for {session_id} (time difference: {diff_sec}s)")
-
-                # Mark this tag as used so the other charging point doesn't steal it
-                cursor.execute("""
-                    UPDATE rfid_event 
-                    SET claimed_by_session_id = ? 
-                    WHERE id = ? AND claimed_by_session_id IS NULL
-                """, (session_id, row['id']))
-
-                if cursor.rowcount == 1:
-                    conn.commit()
-                    return row['tag'], row['timestamp']
-            
-        # If we didn't find anything, wait 2 seconds before the next attempt, but only if we aren't on the last attempt.
-        if attempt < 3:
-            time.sleep(2)
-            
-    return None, None
+        return future
+
+
+_DEVICE_STATE_STORE: Optional[DeviceStateStore] = None
+_DEVICE_STATE_STORE_LOCK = threading.Lock()
 
 
-def add_to_queue(config, charging_session_id: str, device_uid: str, payload: Dict[str, Any], session_type: str) -> None:
+def get_device_state_store(config) -> DeviceStateStore:
     """
-    Adds a charging session event (start or end) to the SQLite queue.
-    If an entry with the same charging_session_id and type already exists,
-    its payload is updated, and its status is reset to 'pending' for re-transmission.
+    Return the process-wide device state store, creating it on first use.
 
     Args:
-        config: Dictionary containing configuration values.
-        charging_session_id: The unique identifier for the charging session.
-        device_uid: The unique identifier of the charging device.
-        payload: A dictionary containing the full charging session data, which will be stored as a JSON string.
-        session_type: The type of the session event, either 'start' or 'end'.
+        config: Dictionary containing configuration values
     Returns:
-        None
+        The shared DeviceStateStore
     """
-    
-    # Convert payload dict to JSON string for storage
-    payload_json = json.dumps(payload)
-    current_time = datetime.now().isoformat()
 
-    with get_db_connection(config) as conn:
-        cursor = conn.cursor()
-
-        # Check if a session with this charging_session_id and type already exists
-        # This is crucial to avoid duplicates when retrying `save_to_queue` due to other failures
-        cursor.execute("""
-            SELECT id FROM charging_session
-            WHERE charging_session_id = ? AND type = ?
-        """, (charging_session_id, session_type))
+    global _DEVICE_STATE_STORE
 
-        existing_entry = cursor.fetchone()
+    with _DEVICE_STATE_STORE_LOCK:
+        if _DEVICE_STATE_STORE is None:
+            _DEVICE_STATE_STORE = DeviceStateStore(config)
 
-        if existing_entry:
-            # If it exists, update it (e.g., if we are retrying an 'end' session that was already 'pending')
-            # For simplicity, we'll just update the payload and reset status to pending for re-transmission
-            cursor.execute("""
-                UPDATE charging_session
-                SET payload = ?, status = 'pending', attempts = 0, last_attempt_at = NULL, created_at = ?
-                WHERE charging_session_id = ? AND type = ?
-            """, (payload_json, current_time, charging_session_id, session_type))
-            logging.info(f"Updated existing charging session in queue: ID: {charging_session_id}, Type: {session_type}")
-        else:
-            # Otherwise, insert a new entry
-            cursor.execute("""
-                INSERT INTO charging_session (charging_session_id, device_uid, payload, type, created_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (charging_session_id, device_uid, payload_json, session_type, current_time))
-            logging.info(f"Added charging session to queue: ID: {charging_session_id}, Type: {session_type}")
+        return _DEVICE_STATE_STORE
 
 
-def get_pending_queue_items(config) -> List[Dict]:
+def load_device_states(config) -> None:
     """
-    Retrieves a list of all charging session events from the queue that are
-    either 'pending' or 'failed', regardless of the number of attempts.
-    Items are ordered by their creation time to ensure they are processed in order.
+    Load the persisted device states into memory, called once at startup after initialize_queue_db().
 
     Args:
-        config: Dictionary containing configuration values.
-    Returns:
-        A list of dictionaries, where each dictionary represents a queued item
-        with its details (charging_session_id, device_uid, payload, type,
-        attempts, last_attempt_at, and queue_db_id). Returns an empty list if no items.
+        config: Dictionary containing configuration values
     """
 
-    with get_db_connection(config) as conn:
-        cursor = conn.cursor()
+    get_device_state_store(config).load()
 
-        # Fetch items that are 'pending' or 'failed'. The attempt limit is removed.
-        # The ORDER BY is important to process older messages first.
-        cursor.execute("""
-            SELECT charging_session_id, device_uid, payload, type, attempts, last_attempt_at, id
-            FROM charging_session
-            WHERE status IN ('pending', 'failed')
-            ORDER BY created_at ASC
-        """)
 
-        rows = cursor.fetchall()
+##################################################
+############# END DEVICE STATE STORE #############
+##################################################
 
-    items = []
-    for row in rows:
-        try:
-            items.append({
-                "queue_db_id": row['id'],
-                "charging_session_id": row['charging_session_id'],
-                "device_uid": row['device_uid'],
-                "payload": json.loads(row['payload']), # Convert JSON string back to dict
-                "type": row['type'],
-                "attempts": row['attempts'],
-                "last_attempt_at": row['last_attempt_at']
-            })
-        except json.JSONDecodeError:
-            logging.error(f"Error decoding JSON payload for queue item: {row['id']}")
 
-    return items
+###########################################
+############# RFID SCAN INDEX #############
+###########################################
+
+
+import bisect
+
+# Scans within this many seconds of a session start can be paired with it
+RFID_PAIRING_WINDOW_SECONDS = 65
+
+# How long a deferred pairing stays open for the event worker that was told a scan arrived
+RFID_CLAIM_GRACE_SECONDS = 30
 
 
-def update_queue_item_status(config, queue_db_id: int, status: str, increment_attempts: bool = False) -> None:
+class RfidScanIndex:
     """
-    Updates the status of a specific item in the SQLite queue.
-    Optionally increments the 'attempts' count and updates 'last_attempt_at'.
+    In-memory index of the RFID scans, sorted by scan time, that pairs scans with charging sessions.
 
-    Args:
-        config: Dictionary containing configuration values.
-        queue_db_id: The internal SQLite primary key of the queue item to update.
-        status: The new status for the item ('pending', 'sent', 'failed').
-        increment_attempts: If True, the 'attempts' count will be increased by one.
-    Returns:
-        None
+    The index is authoritative at runtime: the unclaimed scans are loaded from the rfid_event
+    table once, the nearest scan is found by bisection and claimed under the index lock, so two
+    sessions can never claim the same scan. The table is only a durability log, new scans and
+    claims are written through to the database writer asynchronously.
+
+    A session without a matching scan yet can defer its pairing: add() notifies the deferred
+    session a new scan is nearest to, and the notified worker claims it with claim_deferred(),
+    so no thread waits for a scan to arrive and the thread adding scans never claims them.
+    Deferred pairings expire after their timeout. The scan a session claimed is kept, see claimed_scan().
     """
 
-    current_time = datetime.now().isoformat()
+    def __init__(self, config):
+        self.config = config
 
-    with get_db_connection(config) as conn:
-        cursor = conn.cursor()
+        self._lock = threading.Lock()
+        self._times: List[int] = []
+        self._scans: List[Tuple[str, str]] = []
+        self._seen: Set[Tuple[str, int]] = set()
+        self._deferred: Dict[str, Tuple[int, float, float, Callable[[], None]]] = {}
+        self._claims: Dict[str, Tuple[str, str, int]] = {}
+        self._notified: Set[str] = set()
+        self._loaded = False
 
-        if increment_attempts:
-            cursor.execute("""
-                UPDATE charging_session
-                SET status = ?, attempts = attempts + 1, last_attempt_at = ?
-                WHERE id = ?
-            """, (status, current_time, queue_db_id))
-        else:
-            cursor.execute("""
-                UPDATE charging_session
-                SET status = ?, last_attempt_at = ?
-                WHERE id = ?
-            """, (status, current_time, queue_db_id))
+    def _insert(self, tag: str, timestamp: str, scanned_at: int) -> int:
+        position = bisect.bisect_right(self._times, scanned_at)
+        self._times.insert(position, scanned_at)
+        self._scans.insert(position, (tag, timestamp))
 
+        return position
 
-def get_active_session_from_queue(config, device_uid: str) -> Optional[Dict[str, Any]]:
-    """
-    Finds the most recent, unterminated charging session for a given device
-    by looking for the latest 'start' event in the queue.
+    def load(self) -> None:
+        """
+        Load the scans from the database, replacing what's in memory.
+        """
 
-    Args:
-        config: Dictionary containing configuration values.
-        device_uid: The unique identifier of the charging device.
-    Returns:
-        A dictionary containing the 'charging_session_id' and the full 'payload'
-        of the active session if one is found, otherwise None.
-    """
+        with get_db_connection(self.config) as conn:
+            # Read in time order from the covering index, so the scans are appended already sorted
+            rows = conn.execute("SELECT ts, claimed_by_session_id, tag, timestamp FROM rfid_event ORDER BY ts").fetchall()
 
-    try:
-        with get_db_connection(config) as conn:
-            cursor = conn.cursor()
+        with self._lock:
+            self._times, self._scans, self._seen, self._claims = [], [], set(), {}
 
-            # Find the last active charging session for a controller - latest session 'start' event that has no 'end' event
+            for row in rows:
+                self._seen.add((row["tag"], row["ts"]))
+
+                if row["claimed_by_session_id"] is None:
+                    self._times.append(row["ts"])
+                    self._scans.append((row["tag"], row["timestamp"]))
+                else:
+                    self._claims[row["claimed_by_session_id"]] = (row["tag"], row["timestamp"], row["ts"])
+
+            self._loaded = True
+
+        logging.info(f"Loaded {len(self._scans)} unclaimed RFID scans")
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+
+        try:
+            self.load()
+
+        except Exception as e:
+            logging.error(f"Could not load RFID scans from database: {e}")
+
+            with self._lock:
+                self._loaded = True
+
+    def _expire_deferred(self) -> None:
+        now = time.monotonic()
+
+        for session_id in [session_id for session_id, deferred in self._deferred.items() if deferred[1] <= now]:
+            del self._deferred[session_id]
+            self._notified.discard(session_id)
+            logging.info(f"No RFID scan arrived in time to pair with {session_id}")
+
+    def _take(self, session_id: str, index: int, at: int) -> Tuple[str, str]:
+        # Called under the lock, removes the scan from the index and persists the claim
+        scanned_at = self._times.pop(index)
+        tag, timestamp = self._scans.pop(index)
+        self._claims[session_id] = (tag, timestamp, scanned_at)
+
+        def write(cursor) -> None:
             cursor.execute("""
-                SELECT cs.charging_session_id, cs.payload as start_payload,
-                        (SELECT payload FROM charging_session cr 
-                        WHERE cr.charging_session_id = cs.charging_session_id 
-                        AND cr.type = 'rfid' LIMIT 1) as rfid_payload
-                FROM charging_session cs
-                WHERE cs.device_uid = ?
-                  AND cs.type = 'start'
-                  AND NOT EXISTS (
-                      SELECT 1 FROM charging_session ce
-                      WHERE ce.charging_session_id = cs.charging_session_id
-                        AND ce.type = 'end'
-                  )
-                ORDER BY cs.created_at DESC
-                LIMIT 1
-            """, (device_uid,))
+                UPDATE rfid_event
+                SET claimed_by_session_id = ?
+                WHERE tag = ? AND ts = ? AND claimed_by_session_id IS NULL
+            """, (session_id, tag, scanned_at))
 
-            row = cursor.fetchone()
+        future = submit_db_write(self.config, write)
+        future.add_done_callback(_log_write_error(f"persist the claim of RFID scan {tag}"))
 
-            if row:
-                charging_session_id = row['charging_session_id']
-                payload = json.loads(row['start_payload'])
+        logging.info(f"RFID Match: {tag} found for {session_id} (time difference: {abs(scanned_at - at)}s)")
 
-                # If a late RFID event was found (plug-in then scan) in the queue, merge it into our working payload
-                if row['rfid_payload']:
-                    rfid_data = json.loads(row['rfid_payload'])
-                    payload['rfidTag'] = rfid_data.get('rfidTag')
-                    payload['rfidTimestamp'] = rfid_data.get('rfidTimestamp')
+        return tag, timestamp
 
-                return {
-                    "charging_session_id": charging_session_id,
-                    "payload": payload
-                }
-            
-            # Return None if no row was found
+    def add(self, tag: str, timestamp: str) -> Optional[Future]:
+        """
+        Add a scan to the index and persist it in the background. A scan that was already
+        seen, e.g. a retained MQTT message delivered again after a reconnect, is ignored.
+        If the scan matches a deferred pairing, the nearest deferred session's on_scan()
+        is called on this thread, the scan itself is left for that session to claim.
+
+        Args:
+            tag: The RFID tag
+            timestamp: ISO timestamp of the scan
+        Returns:
+            A future resolved once the scan is committed, None for a duplicate or invalid scan.
+        """
+
+        self._ensure_loaded()
+
+        scanned_at = _parse_rfid_timestamp(timestamp)
+        created_at = datetime.now().isoformat()
+
+        if scanned_at is None:
+            logging.warning(f"RFID scan {tag} has an invalid timestamp '{timestamp}', it can't be paired")
             return None
-        
-    except Exception as e:
-        logging.error(f"Could not read active session for device {device_uid} from queue: {e}")
-        return None
 
+        def write(cursor) -> None:
+            # The UNIQUE(tag, ts) constraint drops a scan that's already stored
+            cursor.execute(
+                "INSERT OR IGNORE INTO rfid_event (tag, timestamp, ts, created_at) VALUES (?, ?, ?, ?)",
+                (tag, timestamp, scanned_at, created_at)
+            )
 
-#######################################################
-############# END SQLITE QUEUE MANAGEMENT #############
-#######################################################
+        notified = None
 
+        # Submitting under the lock keeps the insert ahead of a claim of the same scan
+        with self._lock:
+            if (tag, scanned_at) in self._seen:
+                return None
 
-#######################################################
-############# SQLITE TELEMETRY MANAGEMENT #############
-#######################################################
+            self._seen.add((tag, scanned_at))
+            self._insert(tag, timestamp, scanned_at)
+
+            future = submit_db_write(self.config, write)
+
+            # Tell the deferred session the scan is nearest to, it claims the scan on its own worker.
+            # A session that was already told about a scan is skipped, the next one gets this scan.
+            self._expire_deferred()
+
+            matches = [
+                (abs(scanned_at - at), session_id)
+                for session_id, (at, _, window, _) in self._deferred.items()
+                if abs(scanned_at - at) <= window and session_id not in self._notified
+            ]
+
+            if matches:
+                notified = min(matches)[1]
+                self._notified.add(notified)
+                at, deadline, window, on_scan = self._deferred[notified]
+
+                # Keep the pairing open until the notified worker gets to claim the scan
+                self._deferred[notified] = (at, max(deadline, time.monotonic() + RFID_CLAIM_GRACE_SECONDS), window, on_scan)
+
+        future.add_done_callback(_log_write_error(f"save RFID scan {tag}"))
+        logging.info(f"Saved RFID scan: {tag} at {timestamp}")
+
+        if notified is not None:
+            try:
+                on_scan()
+
+            except Exception as e:
+                logging.error(f"Error handling the deferred RFID pairing of {notified}: {e}", exc_info=True)
+
+        return future
+
+    def _find_nearest(self, at: int, window: float) -> Optional[int]:
+        position = bisect.bisect_left(self._times, at)
+
+        # The nearest scan is right before or right at/after the time, an earlier one wins a tie
+        candidates = [index for index in (position - 1, position) if 0 <= index < len(self._times)]
+        nearest = min(candidates, key=lambda index: abs(self._times[index] - at), default=None)
+
+        if nearest is None or abs(self._times[nearest] - at) > window:
+            return None
+
+        return nearest
+
+    def claim(self, session_id: str, start_ts: str, window: float = RFID_PAIRING_WINDOW_SECONDS) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Claim the unclaimed scan nearest to start_ts within the pairing window.
+
+        Args:
+            session_id: The charging session claiming the scan
+            start_ts: ISO timestamp the scan should be close to
+            window: Maximum seconds between the scan and start_ts
+        Returns:
+            Tuple of the tag and its timestamp, (None, None) if no scan matched
+        """
+
+        return self.claim_or_defer(session_id, start_ts, timeout=0, window=window)
+
+    def claim_or_defer(
+        self,
+        session_id: str,
+        start_ts: str,
+        timeout: float,
+        on_scan: Optional[Callable[[], None]] = None,
+        window: float = RFID_PAIRING_WINDOW_SECONDS,
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Claim the unclaimed scan nearest to start_ts, or if there's none yet, defer the pairing:
+        once a matching scan is added within the timeout, on_scan() is called on the thread that
+        added it and the session claims the scan with claim_deferred(). A new deferral of the
+        same session replaces the previous one.
+
+        Args:
+            session_id: The charging session claiming the scan
+            start_ts: ISO timestamp the scan should be close to
+            timeout: Seconds the deferred pairing stays open, 0 to not defer
+            on_scan: Called once a matching scan was added, it must not block
+            window: Maximum seconds between the scan and start_ts
+        Returns:
+            Tuple of the tag and its timestamp if a scan was claimed now, (None, None) otherwise
+        """
+
+        self._ensure_loaded()
+
+        at = _parse_rfid_timestamp(start_ts)
+
+        if at is None:
+            logging.error(f"Can't pair an RFID scan with {session_id}, invalid timestamp '{start_ts}'")
+            return None, None
+
+        with self._lock:
+            self._deferred.pop(session_id, None)
+            self._notified.discard(session_id)
+            index = self._find_nearest(at, window)
+
+            if index is not None:
+                return self._take(session_id, index, at)
+
+            if timeout > 0 and on_scan is not None:
+                self._expire_deferred()
+                self._deferred[session_id] = (at, time.monotonic() + timeout, window, on_scan)
+
+        return None, None
+
+    def claim_deferred(self, session_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Claim the scan nearest to a deferred pairing's start, called after its on_scan().
+        Claims nothing if the pairing was cancelled or expired in the meantime; if another
+        session took the scan, the pairing stays open for the next one.
+
+        Args:
+            session_id: The charging session with the deferred pairing
+        Returns:
+            Tuple of the tag and its timestamp, (None, None) if nothing was claimed
+        """
+
+        with self._lock:
+            deferred = self._deferred.get(session_id)
+
+            if deferred is None:
+                return None, None
+
+            # The next matching scan notifies the session again if this one was taken by another
+            self._notified.discard(session_id)
+
+            at, _, window, _ = deferred
+            index = self._find_nearest(at, window)
+
+            if index is None:
+                return None, None
+
+            del self._deferred[session_id]
+
+            return self._take(session_id, index, at)
+
+    def claimed_scan(self, session_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        The scan a session already claimed.
 
+        Args:
+            session_id: The charging session
+        Returns:
+            Tuple of the tag and its timestamp, (None, None) if the session hasn't claimed one
+        """
 
-def update_controller_telemetry(config, device_uid: str, payload_json: str) -> None:
+        self._ensure_loaded()
+
+        with self._lock:
+            claim = self._claims.get(session_id)
+
+        return (claim[0], claim[1]) if claim else (None, None)
+
+    def cancel_deferred(self, session_id: str) -> None:
+        """
+        Drop the deferred pairing of a session, e.g. once the session ended.
+        A worker notified of a scan for it claims nothing afterwards.
+        """
+
+        with self._lock:
+            self._deferred.pop(session_id, None)
+            self._notified.discard(session_id)
+
+    def prune(self, before: datetime) -> None:
+        """
+        Forget the scans older than the RFID retention period, they can't be paired anymore.
+
+        Args:
+            before: Scans older than this are removed from memory
+        """
+
+        cutoff = int(before.timestamp())
+
+        with self._lock:
+            position = bisect.bisect_left(self._times, cutoff)
+            del self._times[:position]
+            del self._scans[:position]
+
+            self._claims = {session_id: claim for session_id, claim in self._claims.items() if claim[2] >= cutoff}
+
+            self._seen = {key for key in self._seen if key[1] >= cutoff}
+
+
+_RFID_SCAN_INDEX: Optional[RfidScanIndex] = None
+_RFID_SCAN_INDEX_LOCK = threading.Lock()
+
+
+def get_rfid_scan_index(config) -> RfidScanIndex:
     """
-    Persists the latest technical telemetry state for a charging controller into 
-    the local SQLite database. Utilizes a flexible JSON payload column to ensure 
-    data persistence remains compatible with future controller firmware updates 
-    without requiring database schema migrations.
+    Return the process-wide RFID scan index, creating it on first use.
 
     Args:
-        config: Dictionary containing configuration values, specifically file paths.
-        device_uid: The unique identifier of the charging controller.
-        payload_json: A stringified JSON object containing the unified telemetry data.
+        config: Dictionary containing configuration values
     Returns:
-        None
+        The shared RfidScanIndex
     """
 
-    current_time = datetime.now().isoformat()
+    global _RFID_SCAN_INDEX
 
-    with get_db_connection(config) as conn:
-        cursor = conn.cursor()
+    with _RFID_SCAN_INDEX_LOCK:
+        if _RFID_SCAN_INDEX is None:
+            _RFID_SCAN_INDEX = RfidScanIndex(config)
 
-        cursor.execute("""
-            INSERT OR REPLACE INTO controller_telemetry (device_uid, payload, updated_at)
-            VALUES (?, ?, ?)
-        """, (device_uid, payload_json, current_time))
+        return _RFID_SCAN_INDEX
 
 
-#######################################################
-############# SQLITE TELEMETRY MANAGEMENT #############
-#######################################################
+def load_rfid_scans(config) -> None:
+    """
+    Load the persisted RFID scans into memory, called once at startup after initialize_queue_db().
+
+    Args:
+        config: Dictionary containing configuration values
+    """
+
+    get_rfid_scan_index(config).load()
+
+
+###############################################
+############# END RFID SCAN INDEX #############
+###############################################
 
 
 #######################################################
@@ -669,30 +4611,17 @@ def update_controller_telemetry(config, device_uid: str, payload_json: str) -> N
 
 def get_last_known_controller_state(device_uid: str, config) -> Optional[str]:
     """
-    Gets the last known charging state of a charging controller from the database.
+    Gets the last known charging state of a charging controller from the in-memory device state store.
 
     Args:
         device_uid: Charging controller ID
         config: Dictionary containing configuration values
 
     Returns:
-        The last known charging state of the charging controller - 'connected' or 'disconnected' if successful, None if failed
+        The last known charging state of the charging controller - 'connected' or 'disconnected' if known, None otherwise
     """
 
-    try:
-        with get_db_connection(config) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT status FROM device_status WHERE device_uid = ?", (device_uid,))
-            result = cursor.fetchone()
-
-        if result:
-            return result['status']
-        
-        return None # No entry found for this device UID
-    
-    except Exception as e:
-        logging.error(f"Could not read last known state for {device_uid} from database: {e}")
-        return None
+    return get_device_state_store(config).get(device_uid)
 
 
 ###########################################################
@@ -707,7 +4636,8 @@ def get_last_known_controller_state(device_uid: str, config) -> Optional[str]:
 
 def set_last_known_state(device_uid: str, state: str, config) -> None:
     """
-    Sets the last known charging state of a charging controller in the database.
+    Sets the last known charging state of a charging controller.
+    The state is changed in memory right away, the database is updated in the background.
 
     Args:
         device_uid: Charging controller ID
@@ -722,22 +4652,9 @@ def set_last_known_state(device_uid: str, state: str, config) -> None:
         logging.warning(f"Incorrect device state provided for {device_uid}: {state}")
         return
 
-    current_time = datetime.now().isoformat()
-
-    try:
-        with get_db_connection(config) as conn:
-            cursor = conn.cursor()
-
-            # Use INSERT OR REPLACE to create and optionally delete the existing record
-            cursor.execute("""
-                INSERT OR REPLACE INTO device_status (device_uid, status, updated_at)
-                VALUES (?, ?, ?)
-            """, (device_uid, state, current_time))
-        
-        logging.info(f"Setting device state in DB: deviceUid: {device_uid}, state: {state}")
+    get_device_state_store(config).set(device_uid, state)
 
-    except Exception as e:
-        logging.error(f"Could not set last known state for {device_uid} in database: {e}")
+    logging.info(f"Setting device state: deviceUid: {device_uid}, state: {state}")
 
 
 ###########################################################